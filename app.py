@@ -4,11 +4,12 @@ import os
 
 import aws_cdk as cdk
 
-from pipeline.pipeline import PipelineStack
+from pipeline.pipeline import PipelineStack, deployed_logical_ids_required
 from sso.account_structure import AccountStructure
+from sso.config_validation import validate_permission_sets_config
 from sso.group_mappings import GroupMappings
 from sso.permission_sets import PermissionSets
-from utility.file_helpers import file_read_yaml
+from utility.file_helpers import file_read_records, file_read_yaml
 
 app = cdk.App()
 
@@ -41,12 +42,60 @@ for context_key in context_keys:
         raise ValueError(f"Must specify context parameter: {context_key}")
     properties[context_key] = context
 
+# Optional S3 URL (s3://bucket/prefix) of the org & group mappings snapshot store
+properties["snapshot_store"] = app.node.try_get_context("snapshot_store")
+
+# Optionally assign the permission sets of new Control Tower accounts ahead of the pipeline
+properties["fast_path_reconciler"] = app.node.try_get_context("fast_path_reconciler") in [
+    "true",
+    True,
+]
+
+# Optionally start the pipeline once per burst of Control Tower lifecycle events, after no event
+# arrived for this many minutes (requires snapshot_store)
+properties["event_quiet_window_minutes"] = app.node.try_get_context("event_quiet_window_minutes")
+
+# Optionally add the assignments of each stack as one included template ("template") or as one
+# custom resource per permission set ("batched") instead of a construct per assignment
+# ("construct", the default)
+properties["assignment_emitter"] = app.node.try_get_context("assignment_emitter") or "construct"
+
+# Optionally name new assignments by a short hash instead of their permission set, account and
+# group, which keeps the deployed assignments (deployed_logical_ids_file) under their legacy ids
+properties["compact_logical_ids"] = app.node.try_get_context("compact_logical_ids") in [
+    "true",
+    True,
+]
+
+# Keep the permission set ARN exports that CDK generated for the assignments stacks (shards)
+# deployed before the stable export names, until the shards have been deployed with those
+properties["legacy_permission_set_exports"] = app.node.try_get_context(
+    "legacy_permission_set_exports"
+) in ["true", True]
+
+deployed_logical_ids_file = app.node.try_get_context("deployed_logical_ids_file")
+if deployed_logical_ids_file is not None:
+    # The logical ids by stack name, each stage keeps the ids deployed in its own stacks
+    properties["deployed_logical_ids"] = {
+        stack_name: frozenset(logical_ids)
+        for stack_name, logical_ids in file_read_yaml(deployed_logical_ids_file).items()
+    }
+elif (
+    deployed_logical_ids_required(properties)
+    and app.node.try_get_context("accounts_file") is not None
+):
+    # Without the deployed ids deployed assignments could be replaced
+    raise ValueError("Must specify context parameter: deployed_logical_ids_file")
+
 content = file_read_yaml(properties["permission_sets_file"])
+errors = validate_permission_sets_config(content, properties["env_name"])
+if errors:
+    raise ValueError(f"Invalid {properties['permission_sets_file']}:\n" + "\n".join(errors))
 permission_sets = PermissionSets(content)
 
 accounts_file = app.node.try_get_context("accounts_file")
 if accounts_file is not None:
-    content = file_read_yaml(accounts_file)
+    content = file_read_records(accounts_file, "Accounts")
     account_structure = AccountStructure(content)
 else:
     # CDK is run (deploy/diff/ls) outside of pipeline (CodeBuild)
@@ -55,7 +104,7 @@ else:
 
 group_mappings_file = app.node.try_get_context("group_mappings_file")
 if group_mappings_file is not None:
-    content = file_read_yaml(group_mappings_file)
+    content = file_read_records(group_mappings_file, "sso_group_mappings")
     group_mappings = GroupMappings(properties["group_prefix"], content)
 else:
     # CDK is run (deploy/diff/ls) outside of pipeline (CodeBuild)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Time and measure memory of the CDK app phases for a synthetic organization.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.run_benchmarks --accounts 10000 --permission-sets 150 --output bench.json
+    python -m benchmarks.run_benchmarks --accounts 10000 --compare bench.json
+    python -m benchmarks.run_benchmarks --accounts 10000 --assignment-emitters construct template
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict
+
+import yaml
+
+from benchmarks.synthetic_org import generate_org
+
+
+def measure(results: Dict, name: str, func: Callable, trace_memory: bool = True):
+    """Run func and record its wall time and peak Python memory allocation under name.
+
+    Memory allocated by the jsii Node.js process isn't included in the Python peak.
+    """
+
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    peak_bytes = None
+    if trace_memory:
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    results[name] = {"seconds": round(seconds, 4), "python_peak_bytes": peak_bytes}
+    print(f"{name:28} {seconds:10.3f}s  {peak_bytes or 0:>14,} bytes", file=sys.stderr)
+
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    parameters: Dict, work_dir: str, trace_memory: bool = True, assignment_emitters=None
+) -> Dict:
+    # Imported here so that generating and loading is measured without CDK imported
+    from utility.file_helpers import file_read_yaml
+    from sso.account_structure import AccountStructure
+    from sso.assignment_plan import plan_assignments
+    from sso.group_mappings import GroupMappings
+    from sso.permission_sets import PermissionSets
+
+    results = {}
+    work_dir = Path(work_dir)
+
+    org = generate_org(**parameters)
+
+    # Write the files the same way as the pipeline's lookup scripts
+    permission_sets_file = work_dir / "sso-permission-sets.yaml"
+    accounts_file = work_dir / "accounts.yaml"
+    group_mappings_file = work_dir / "group-mappings.yaml"
+
+    permission_sets_file.write_text(yaml.safe_dump(org["permission_sets"], sort_keys=False))
+    accounts_file.write_text(json.dumps(org["accounts"], indent=2, default=str))
+    group_mappings_file.write_text(json.dumps(org["group_mappings"], indent=2, default=str))
+
+    def load():
+        return (
+            PermissionSets(file_read_yaml(str(permission_sets_file))),
+            AccountStructure(file_read_yaml(str(accounts_file))),
+            GroupMappings(org["group_prefix"], file_read_yaml(str(group_mappings_file))),
+        )
+
+    permission_sets, account_structure, group_mappings = measure(
+        results, "load", load, trace_memory
+    )
+
+    def resolve():
+        return sum(
+            len(plan_assignments(stage["permission_sets"], account_structure, group_mappings))
+            for stage in permission_sets.get_stages()
+        )
+
+    assignments = measure(results, "resolve_assignments", resolve, trace_memory)
+
+    import aws_cdk as cdk
+    from pipeline.stage import SSOStage
+
+    properties = {
+        "env_name": "bench",
+        "sso_instance_arn": "arn:aws:sso:::instance/ssoins-0123456789abcdef",
+    }
+
+    # The construct emitter keeps the phase names of earlier results for --compare
+    for emitter in assignment_emitters or ["construct"]:
+        suffix = "" if emitter == "construct" else f"[{emitter}]"
+        app = cdk.App(outdir=str(work_dir / f"cdk.out.{emitter}"))
+
+        def construct():
+            for index, stage in enumerate(permission_sets.get_stages()):
+                SSOStage(
+                    app,
+                    f"SSOStage{index}",
+                    properties=dict(
+                        properties, env_name=f"bench{index}", assignment_emitter=emitter
+                    ),
+                    account_structure=account_structure,
+                    group_mappings=group_mappings,
+                    permission_sets=stage["permission_sets"],
+                )
+
+        measure(results, f"construct_stacks{suffix}", construct, trace_memory)
+        measure(results, f"synth{suffix}", app.synth, trace_memory)
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "parameters": parameters,
+        "assignments": assignments,
+        "max_rss_kilobytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+
+
+def compare(current: Dict, previous: Dict) -> str:
+    lines = [f"{'phase':28} {'previous':>10} {'current':>10} {'ratio':>7}"]
+
+    for name, result in current["results"].items():
+        previous_result = previous["results"].get(name)
+        if previous_result is None:
+            continue
+
+        ratio = result["seconds"] / previous_result["seconds"] if previous_result["seconds"] else 0
+        lines.append(
+            f"{name:28} {previous_result['seconds']:10.3f} {result['seconds']:10.3f} {ratio:7.2f}"
+        )
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the CDK app on a synthetic org.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=3, help="OU tree depth below Root")
+    parser.add_argument("--fan-out", type=int, default=4, help="Sub-OUs per OU")
+    parser.add_argument("--permission-sets", type=int, default=20)
+    parser.add_argument("--recursive-ratio", type=float, default=0.5)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--stages", type=int, default=1)
+    parser.add_argument(
+        "--assignment-emitters",
+        nargs="+",
+        choices=["construct", "template"],
+        default=["construct"],
+        help="Construct and synth the stacks with each of these assignment emitters",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="Don't trace memory (faster)")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+    parser.add_argument("--compare", type=str, help="Compare with a previous results JSON file")
+    args = parser.parse_args()
+
+    parameters = {
+        "seed": args.seed,
+        "accounts": args.accounts,
+        "depth": args.depth,
+        "fan_out": args.fan_out,
+        "permission_sets": args.permission_sets,
+        "recursive_ratio": args.recursive_ratio,
+        "groups": args.groups,
+        "stages": args.stages,
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        benchmark = run_benchmarks(
+            parameters,
+            work_dir,
+            trace_memory=not args.no_memory,
+            assignment_emitters=args.assignment_emitters,
+        )
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(benchmark, file, indent=2)
+    else:
+        print(json.dumps(benchmark, indent=2))
+
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            print(compare(benchmark, json.load(file)), file=sys.stderr)
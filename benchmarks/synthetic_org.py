@@ -0,0 +1,107 @@
+import random
+from typing import Dict, List
+
+GROUP_PREFIX = "BENCH_SSO_"
+
+
+def generate_ou_paths(depth: int, fan_out: int) -> List[str]:
+    """All OU name paths of a tree with the given depth (below Root) and fan-out per OU"""
+
+    ou_paths = ["/Root"]
+    level = ["/Root"]
+
+    for depth_index in range(depth):
+        level = [
+            f"{parent}/OU{depth_index + 1}x{child}" for parent in level for child in range(fan_out)
+        ]
+        ou_paths.extend(level)
+
+    return ou_paths
+
+
+def generate_org(
+    seed: int = 1,
+    accounts: int = 1000,
+    depth: int = 3,
+    fan_out: int = 4,
+    permission_sets: int = 20,
+    recursive_ratio: float = 0.5,
+    groups: int = 50,
+    ou_assignments_per_permission_set: int = 2,
+    groups_per_permission_set: int = 2,
+    stages: int = 1,
+) -> Dict:
+    """Generate the permission sets, accounts and group mappings content of a synthetic organization.
+
+    The same arguments always generate the same organization.
+    """
+
+    rng = random.Random(seed)
+
+    ou_paths = generate_ou_paths(depth, fan_out)
+    ou_ids = {ou_path: f"ou-bnch-{index:08x}" for index, ou_path in enumerate(ou_paths)}
+
+    def id_path(ou_path: str) -> str:
+        segments = ou_path.split("/")[1:]
+        return "/r-bnch" + "".join(
+            "/" + ou_ids["/" + "/".join(segments[: index + 1])] for index in range(1, len(segments))
+        )
+
+    account_structure = {"Accounts": []}
+    for index in range(accounts):
+        account_id = f"{100000000000 + index}"
+        ou_path = rng.choice(ou_paths)
+        account_structure["Accounts"].append(
+            {
+                "Id": account_id,
+                "Arn": f"arn:aws:organizations::012345678901:account/o-bench/{account_id}",
+                "Email": f"aws{account_id}@example.com",
+                "Name": f"aws{account_id}@example.com",
+                "Status": "ACTIVE",
+                "JoinedMethod": "CREATED",
+                "JoinedTimestamp": "2022-01-01 00:00:00+00:00",
+                "name_path": ou_path,
+                "id_path": id_path(ou_path),
+            }
+        )
+
+    group_names = [f"Group{index}" for index in range(groups)]
+
+    group_mappings = {
+        "sso_group_mappings": [
+            {
+                "group_id": f"{index:010x}-12345678-1234-1234-1234-123456789012",
+                "group_name": f"{GROUP_PREFIX}{group_name}",
+            }
+            for index, group_name in enumerate(group_names)
+        ]
+    }
+
+    permission_sets_content = {
+        "stages": [{"name": f"Stage{index}", "permission_sets": []} for index in range(stages)]
+    }
+
+    for index in range(permission_sets):
+        permission_set = {
+            "permission_set_name": f"PermissionSet{index}",
+            "description": f"Synthetic permission set {index}",
+            "session_duration": "PT04H",
+            "aws_managed_policies": ["arn:aws:iam::aws:policy/job-function/ViewOnlyAccess"],
+            "ou_assignments": [
+                {"path": rng.choice(ou_paths), "recursive": rng.random() < recursive_ratio}
+                for _ in range(ou_assignments_per_permission_set)
+            ],
+            "group_assignments": [
+                {"name": group_name}
+                for group_name in rng.sample(group_names, min(groups_per_permission_set, groups))
+            ],
+        }
+
+        permission_sets_content["stages"][index % stages]["permission_sets"].append(permission_set)
+
+    return {
+        "group_prefix": GROUP_PREFIX,
+        "permission_sets": permission_sets_content,
+        "accounts": account_structure,
+        "group_mappings": group_mappings,
+    }
@@ -0,0 +1,77 @@
+import aws_cdk as cdk
+from aws_cdk import (
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_sqs as sqs,
+)
+from aws_cdk.aws_codepipeline import Pipeline
+from constructs import Construct
+
+from pipeline.fast_path import snapshot_store_statements
+from utility.cfn_helpers import stage_function_code
+
+# The oldest event of a continuous burst triggers the pipeline after this many quiet windows
+MAX_WAIT_QUIET_WINDOWS = 6
+
+
+class LifecycleEventCoalescer(Construct):
+    """SQS queue of Control Tower lifecycle events and a scheduled Lambda function that starts
+    the pipeline once per burst of events (see utility.event_coalescer)
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        properties: dict,
+        pipeline: Pipeline,
+        quiet_window: cdk.Duration,
+    ) -> None:
+        super().__init__(scope, construct_id)
+
+        if properties.get("snapshot_store") is None:
+            raise ValueError("The lifecycle event coalescer requires a snapshot_store")
+
+        self.queue = sqs.Queue(
+            self,
+            "Queue",
+            retention_period=cdk.Duration.days(4),
+            visibility_timeout=cdk.Duration.minutes(5),
+        )
+
+        function = lambda_.Function(
+            self,
+            "Function",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="utility.event_coalescer.lambda_handler",
+            code=lambda_.Code.from_asset(stage_function_code()),
+            timeout=cdk.Duration.minutes(1),
+            # A single consumer sees the whole burst
+            reserved_concurrent_executions=1,
+            environment={
+                "QUEUE_URL": self.queue.queue_url,
+                "PIPELINE_NAME": pipeline.pipeline_name,
+                "SNAPSHOT_STORE": properties["snapshot_store"],
+                "QUIET_WINDOW_SECONDS": str(quiet_window.to_seconds()),
+                "MAX_WAIT_SECONDS": str(quiet_window.to_seconds() * MAX_WAIT_QUIET_WINDOWS),
+            },
+        )
+
+        self.queue.grant_consume_messages(function)
+
+        for statement in [
+            iam.PolicyStatement(
+                actions=["codepipeline:StartPipelineExecution"], resources=[pipeline.pipeline_arn]
+            ),
+        ] + snapshot_store_statements(properties["snapshot_store"]):
+            function.add_to_role_policy(statement)
+
+        events.Rule(
+            self,
+            "Schedule",
+            description="Start the pipeline once the Control Tower lifecycle events are quiet",
+            schedule=events.Schedule.rate(cdk.Duration.minutes(1)),
+            targets=[targets.LambdaFunction(function)],
+        )
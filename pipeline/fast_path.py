@@ -0,0 +1,108 @@
+from typing import List
+
+import aws_cdk as cdk
+from aws_cdk import (
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+)
+from constructs import Construct
+
+from sso.group_mappings import GroupMappings
+from sso.permission_sets import PermissionSets
+from sso.sso_admin import ACCOUNT_ASSIGNMENT_IAM_ACTIONS
+from utility.cfn_helpers import stage_function_code
+
+
+def snapshot_store_statements(snapshot_store: str) -> List[iam.PolicyStatement]:
+    """Get the policy statements to read and write the snapshots of an s3://bucket/prefix store"""
+
+    bucket, _, prefix = snapshot_store[len("s3://") :].partition("/")
+    objects = f"{prefix.strip('/')}/*" if prefix.strip("/") else "*"
+
+    return [
+        iam.PolicyStatement(
+            actions=["s3:GetObject", "s3:PutObject"],
+            resources=[f"arn:aws:s3:::{bucket}/{objects}"],
+        ),
+        iam.PolicyStatement(actions=["s3:ListBucket"], resources=[f"arn:aws:s3:::{bucket}"]),
+    ]
+
+
+class FastPathReconciler(Construct):
+    """Lambda function that assigns the permission sets of accounts enrolled by Control Tower
+    as soon as the account is created, ahead of the pipeline (see sso.fast_path)
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        properties: dict,
+        group_mappings: GroupMappings,
+        permission_sets: PermissionSets,
+    ) -> None:
+        super().__init__(scope, construct_id)
+
+        if properties.get("snapshot_store") is None:
+            raise ValueError("The fast path reconciler requires a snapshot_store")
+
+        config = {
+            "env_name": properties["env_name"],
+            "sso_instance_arn": properties["sso_instance_arn"],
+            "group_prefix": properties["group_prefix"],
+            "group_mappings": {"sso_group_mappings": group_mappings.group_mappings},
+            "stages": [
+                {"name": stage["name"], "permission_sets": stage["permission_sets"]}
+                for stage in permission_sets.get_stages()
+            ],
+        }
+
+        self.function = lambda_.Function(
+            self,
+            "Function",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="sso.fast_path.lambda_handler",
+            code=lambda_.Code.from_asset(stage_function_code(config)),
+            timeout=cdk.Duration.minutes(5),
+            # Serialize invocations so that the recorded assignments aren't overwritten
+            reserved_concurrent_executions=1,
+            environment={"SNAPSHOT_STORE": properties["snapshot_store"]},
+        )
+
+        for statement in [
+            iam.PolicyStatement(
+                actions=[
+                    "organizations:DescribeOrganizationalUnit",
+                    "organizations:ListParents",
+                    "organizations:ListRoots",
+                ],
+                resources=["*"],
+            ),
+            iam.PolicyStatement(
+                actions=[
+                    "sso:ListPermissionSets",
+                    "sso:DescribePermissionSet",
+                    "sso:ListAccountAssignments",
+                    "sso:CreateAccountAssignment",
+                    "sso:DescribeAccountAssignmentCreationStatus",
+                ]
+                + ACCOUNT_ASSIGNMENT_IAM_ACTIONS,
+                resources=["*"],
+            ),
+        ] + snapshot_store_statements(properties["snapshot_store"]):
+            self.function.add_to_role_policy(statement)
+
+        # Control Tower emits the lifecycle (service) events when the account is ready
+        events.Rule(
+            self,
+            "AccountLifecycleEventRule",
+            description="Assign permission sets to accounts enrolled by Control Tower",
+            event_pattern=events.EventPattern(
+                source=["aws.controltower"],
+                detail_type=["AWS Service Event via CloudTrail"],
+                detail={"eventName": ["CreateManagedAccount", "UpdateManagedAccount"]},
+            ),
+            targets=[targets.LambdaFunction(self.function)],
+        )
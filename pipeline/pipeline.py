@@ -1,4 +1,3 @@
-from unicodedata import name
 import aws_cdk as cdk
 
 from aws_cdk import (
@@ -9,15 +8,27 @@ from aws_cdk import (
     aws_events_targets as targets,
 )
 
+from pipeline.event_coalescer import LifecycleEventCoalescer
+from pipeline.fast_path import FastPathReconciler
 from pipeline.stage import SSOStage
 from sso.account_structure import AccountStructure
 from sso.group_mappings import GroupMappings
-from sso.permission_sets import PermissionSets
+from sso.permission_sets import PermissionSets, sso_stage_ids
+from sso.sso_admin import ACCOUNT_ASSIGNMENT_IAM_ACTIONS
 
 # Note that there is an original and a modern version of CDK pipelines
 # as per https://github.com/aws/aws-cdk/blob/master/packages/@aws-cdk/pipelines/ORIGINAL_API.md
 
 
+def deployed_logical_ids_required(properties: dict) -> bool:
+    """Whether the synth needs the logical ids of the deployed assignments: compact logical ids
+    keep the ids of the deployed assignments, and the batched emitter must not replace them
+    """
+    return bool(properties.get("compact_logical_ids")) or (
+        properties.get("assignment_emitter") == "batched"
+    )
+
+
 class PipelineStack(cdk.Stack):
     def __init__(
         self,
@@ -38,20 +49,68 @@ class PipelineStack(cdk.Stack):
             connection_arn=properties["codestar_connection_arn"],
         )
 
+        # Reuse org & group mappings snapshots between pipeline executions when configured
+        snapshot_store_option = ""
+        snapshot_store_context = ""
+        if properties.get("snapshot_store") is not None:
+            snapshot_store_option = f" --snapshot-store {properties['snapshot_store']}"
+            snapshot_store_context = f" -c snapshot_store={properties['snapshot_store']}"
+
+        fast_path_context = ""
+        if properties.get("fast_path_reconciler"):
+            fast_path_context = " -c fast_path_reconciler=true"
+
+        assignment_emitter_context = ""
+        if properties.get("assignment_emitter", "construct") != "construct":
+            assignment_emitter_context = (
+                f" -c assignment_emitter={properties['assignment_emitter']}"
+            )
+
+        # Look up the deployed assignments first, see deployed_logical_ids_required
+        deployed_logical_ids_commands = []
+        deployed_logical_ids_context = ""
+        if deployed_logical_ids_required(properties):
+            deployed_logical_ids_commands.append(
+                f"scripts/get-deployed-logical-ids.py {properties['env_name']}"
+                f" {properties['permission_sets_file']}"
+                f" >deployed-logical-ids.json"
+            )
+            deployed_logical_ids_context = " -c deployed_logical_ids_file=deployed-logical-ids.json"
+
+        compact_logical_ids_context = ""
+        if properties.get("compact_logical_ids"):
+            compact_logical_ids_context = " -c compact_logical_ids=true"
+
+        legacy_exports_context = ""
+        if properties.get("legacy_permission_set_exports"):
+            legacy_exports_context = " -c legacy_permission_set_exports=true"
+
+        event_coalescer_context = ""
+        if properties.get("event_quiet_window_minutes") is not None:
+            event_coalescer_context = (
+                f" -c event_quiet_window_minutes={properties['event_quiet_window_minutes']}"
+            )
+
         synth_action = pipelines.ShellStep(
             "Synth",
             input=pipeline_input,
+            # The execution that skip-unchanged-plan.py stops when the plans are unchanged
+            env={"PIPELINE_EXECUTION_ID": "#{codepipeline.PipelineExecutionId}"},
             commands=[
                 f"pip install -r requirements.txt",
-                f"npm install -g aws-cdk@2.x",
                 f"export PYTHONPATH=$PWD",
-                f"scripts/get-org-hierarchy.py >accounts.yaml",
-                f"scripts/get-sso-group-mappings.py"
+                # Fail fast on configuration errors, before any AWS lookups
+                f"scripts/validate-config.py {properties['permission_sets_file']}"
+                f" --env-name {properties['env_name']}",
+                f"npm install -g aws-cdk@2.x",
+                f"scripts/get-org-hierarchy.py{snapshot_store_option} >accounts.yaml",
+                f"scripts/get-sso-group-mappings.py{snapshot_store_option}"
                 f" {properties['group_prefix']}"
                 f" {properties['identity_store']}"
                 f" {properties['permission_sets_file']}"
                 f" $AWS_REGION"
                 f" >group-mappings.yaml",
+                *deployed_logical_ids_commands,
                 f"cdk synth"
                 f" -c env_name={properties['env_name']}"
                 f" -c group_prefix={properties['group_prefix']}"
@@ -62,7 +121,16 @@ class PipelineStack(cdk.Stack):
                 f" -c sso_instance_arn={properties['sso_instance_arn']}"
                 f" -c accounts_file=accounts.yaml"
                 f" -c group_mappings_file=group-mappings.yaml"
-                f" -c identity_store={properties['identity_store']}",
+                f" -c identity_store={properties['identity_store']}"
+                f"{snapshot_store_context}"
+                f"{fast_path_context}"
+                f"{event_coalescer_context}"
+                f"{assignment_emitter_context}"
+                f"{compact_logical_ids_context}"
+                f"{deployed_logical_ids_context}"
+                f"{legacy_exports_context}",
+                f"scripts/report-template-footprint.py cdk.out",
+                f"scripts/skip-unchanged-plan.py cdk.out",
             ],
         )
 
@@ -70,50 +138,125 @@ class PipelineStack(cdk.Stack):
             self,
             f"SSOPipeline{properties['env_name']}",
             cross_account_keys=True,
-            code_build_defaults=self.__codebuild_default_options(),
+            code_build_defaults=self.__codebuild_default_options(properties),
             synth=synth_action,
             self_mutation=True,
         )
 
-        for stage in permission_sets.get_stages():
-            pipeline.add_stage(
-                SSOStage(
+        stage_indexes = {
+            stage["name"]: stage_index
+            for stage_index, stage in enumerate(permission_sets.get_stages())
+        }
+
+        for wave_index, wave_stages in enumerate(permission_sets.get_waves()):
+            # Independent stages of the same wave are deployed in parallel
+            if len(wave_stages) > 1:
+                wave = pipeline.add_wave(f"SSOWave{wave_index}")
+            else:
+                wave = pipeline
+
+            for stage in wave_stages:
+                stage_id, stack_name = sso_stage_ids(
+                    stage_indexes[stage["name"]], stage, properties["env_name"]
+                )
+
+                sso_stage = SSOStage(
                     self,
-                    f"SSOStage",
+                    stage_id,
                     properties=properties,
                     account_structure=account_structure,
                     group_mappings=group_mappings,
                     permission_sets=stage["permission_sets"],
-                ),
-            )
+                    max_resources_per_stack=stage.get("max_resources_per_stack"),
+                    max_template_bytes_per_stack=stage.get("max_template_bytes_per_stack"),
+                    deployment_wave_size=stage.get("deployment_wave_size"),
+                    stack_name=stack_name,
+                )
+
+                # Release the assignments of the fast path reconciler that the stage creates
+                # right before it deploys, so that Cloudformation can create them
+                pre = []
+                if properties.get("fast_path_reconciler"):
+                    pre.append(
+                        pipelines.ShellStep(
+                            f"ReleaseFastPathAssignments{stage_id}",
+                            input=pipeline_input,
+                            additional_inputs={"cdk.out": synth_action},
+                            commands=[
+                                f"pip install -r requirements.txt",
+                                f"export PYTHONPATH=$PWD",
+                                f"scripts/release-fast-path-assignments.py"
+                                f" {properties['sso_instance_arn']}"
+                                f" {properties['env_name']}"
+                                f" cdk.out/{sso_stage.artifact_id}"
+                                f" --snapshot-store {properties['snapshot_store']}",
+                            ],
+                        )
+                    )
+
+                wave.add_stage(sso_stage, pre=pre)
 
         # Build pipeline to make available for event rule target
         pipeline.build_pipeline()
 
+        lifecycle_event_names = [
+            "CreateManagedAccount",
+            "UpdateManagedAccount",
+            "RegisterOrganizationalUnit",
+            "DeregisterOrganizationalUnit",
+        ]
+
+        if properties.get("event_quiet_window_minutes") is None:
+            lifecycle_event_pattern = events.EventPattern(
+                source=["aws.controltower"],
+                detail_type=["AWS API Call via CloudTrail"],
+                detail={
+                    "eventSource": ["controltower.amazonaws.com"],
+                    "eventName": lifecycle_event_names,
+                },
+            )
+        else:
+            # The lifecycle (service) events identify the affected OUs, so that only those are
+            # re-walked by the coalesced pipeline execution
+            lifecycle_event_pattern = events.EventPattern(
+                source=["aws.controltower"],
+                detail_type=["AWS Service Event via CloudTrail"],
+                detail={"eventName": lifecycle_event_names},
+            )
+
         ct_lifecycle_event_rule = events.Rule(
             self,
             f"ControlTowerLifecycleEventRule",
             description="Capture Control Tower Lifecycle Events",
             rule_name=f"ControlTowerLifecycleEvents-{properties['env_name']}",
             enabled=True,
-            event_pattern=events.EventPattern(
-                source=["aws.controltower"],
-                detail_type=["AWS API Call via CloudTrail"],
-                detail={
-                    "eventSource": ["controltower.amazonaws.com"],
-                    "eventName": [
-                        "CreateManagedAccount",
-                        "UpdateManagedAccount",
-                        "RegisterOrganizationalUnit",
-                        "DeregisterOrganizationalUnit",
-                    ],
-                },
-            ),
+            event_pattern=lifecycle_event_pattern,
         )
 
-        ct_lifecycle_event_rule.add_target(targets.CodePipeline(pipeline=pipeline.pipeline))
+        if properties.get("event_quiet_window_minutes") is None:
+            ct_lifecycle_event_rule.add_target(targets.CodePipeline(pipeline=pipeline.pipeline))
+        else:
+            # Start the pipeline once per burst of lifecycle events
+            coalescer = LifecycleEventCoalescer(
+                self,
+                "LifecycleEventCoalescer",
+                properties=properties,
+                pipeline=pipeline.pipeline,
+                quiet_window=cdk.Duration.minutes(int(properties["event_quiet_window_minutes"])),
+            )
+            ct_lifecycle_event_rule.add_target(targets.SqsQueue(coalescer.queue))
+
+        # Optionally assign the permission sets of new accounts ahead of the pipeline
+        if properties.get("fast_path_reconciler"):
+            FastPathReconciler(
+                self,
+                "FastPathReconciler",
+                properties=properties,
+                group_mappings=group_mappings,
+                permission_sets=permission_sets,
+            )
 
-    def __codebuild_default_options(self) -> pipelines.CodeBuildOptions:
+    def __codebuild_default_options(self, properties: dict) -> pipelines.CodeBuildOptions:
         """Create CodeBuild defaults for Amazon Linux 2 (version 3)
         with required AWS Organizations permissions to do lookups
         """
@@ -146,8 +289,74 @@ class PipelineStack(cdk.Stack):
                 ],
                 resources=["*"],
             ),
+            iam.PolicyStatement(
+                sid="SkipUnchangedPlan",
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "cloudformation:DescribeStacks",
+                    "codepipeline:GetPipelineExecution",
+                    "codepipeline:ListPipelineExecutions",
+                    "codepipeline:StopPipelineExecution",
+                ],
+                resources=["*"],
+            ),
         ]
 
+        if deployed_logical_ids_required(properties):
+            role_policy.append(
+                iam.PolicyStatement(
+                    sid="DeployedLogicalIds",
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "cloudformation:DescribeStacks",
+                        "cloudformation:ListStackResources",
+                    ],
+                    resources=["*"],
+                )
+            )
+
+        if properties.get("fast_path_reconciler"):
+            role_policy.append(
+                iam.PolicyStatement(
+                    sid="ReleaseFastPathAssignments",
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "sso:ListAccountAssignments",
+                        "sso:DeleteAccountAssignment",
+                        "sso:DescribeAccountAssignmentDeletionStatus",
+                    ]
+                    + ACCOUNT_ASSIGNMENT_IAM_ACTIONS,
+                    resources=["*"],
+                )
+            )
+
+        if properties.get("snapshot_store") is not None:
+            bucket, _, prefix = properties["snapshot_store"][len("s3://") :].partition("/")
+            objects = f"{prefix.strip('/')}/*" if prefix.strip("/") else "*"
+
+            role_policy.append(
+                iam.PolicyStatement(
+                    sid="SnapshotStore",
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "s3:GetObject",
+                        "s3:PutObject",
+                        "s3:DeleteObject",
+                    ],
+                    resources=[f"arn:aws:s3:::{bucket}/{objects}"],
+                )
+            )
+            role_policy.append(
+                iam.PolicyStatement(
+                    sid="SnapshotStoreList",
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "s3:ListBucket",
+                    ],
+                    resources=[f"arn:aws:s3:::{bucket}"],
+                )
+            )
+
         # TODO: Fix for Node.js 16 support when available
         # https://github.com/aws/aws-codebuild-docker-images/issues/490
         # https://github.com/aws/aws-cdk/issues/20960
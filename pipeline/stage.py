@@ -1,9 +1,11 @@
 import aws_cdk as cdk
-from sso.permission_sets import PermissionSets
+from sso.permission_sets import PermissionSets, is_stage_stack_name
 
+from sso.assignments_stack import AssignmentsStack
 from sso.permission_sets_stack import PermissionSetsStack
 from sso.account_structure import AccountStructure
 from sso.group_mappings import GroupMappings
+from sso.sharding import DEFAULT_MAX_RESOURCES_PER_STACK, DEFAULT_MAX_TEMPLATE_BYTES_PER_STACK
 
 
 class SSOStage(cdk.Stage):
@@ -18,9 +20,29 @@ class SSOStage(cdk.Stage):
         account_structure: AccountStructure,
         group_mappings: GroupMappings,
         permission_sets: PermissionSets,
+        max_resources_per_stack: int = None,
+        max_template_bytes_per_stack: int = None,
+        deployment_wave_size: int = None,
+        stack_name: str = None,
     ):
         super().__init__(scope, id, env=env, outdir=outdir)
 
+        stack_name = stack_name or f"sso-permission-sets-{properties['env_name']}"
+
+        # The deployed assignment logical ids by stack name, the assignments keep their logical
+        # ids within the stacks of this stage only
+        properties = dict(
+            properties,
+            deployed_logical_ids=frozenset(
+                logical_id
+                for deployed_stack_name, logical_ids in properties.get(
+                    "deployed_logical_ids", {}
+                ).items()
+                if is_stage_stack_name(stack_name, deployed_stack_name)
+                for logical_id in logical_ids
+            ),
+        )
+
         permission_sets_stack = PermissionSetsStack(
             self,
             f"PermissionSetsStack",
@@ -29,5 +51,35 @@ class SSOStage(cdk.Stage):
             account_structure=account_structure,
             group_mappings=group_mappings,
             permission_sets=permission_sets,
-            stack_name=f"sso-permission-sets-{properties['env_name']}",
+            max_resources_per_stack=max_resources_per_stack or DEFAULT_MAX_RESOURCES_PER_STACK,
+            max_template_bytes_per_stack=max_template_bytes_per_stack
+            or DEFAULT_MAX_TEMPLATE_BYTES_PER_STACK,
+            deployment_wave_size=deployment_wave_size,
+            stack_name=stack_name,
         )
+
+        # Assignments that don't fit in the permission sets stack go to further stacks
+        previous_stack = permission_sets_stack
+
+        for shard_index, assignments in enumerate(permission_sets_stack.assignments_by_shard):
+            if shard_index == 0:
+                continue
+
+            assignments_stack = AssignmentsStack(
+                self,
+                f"AssignmentsStack{shard_index}",
+                env=cdk.Environment(account=self.account, region=self.region),
+                properties=properties,
+                permission_set_arns=permission_sets_stack.permission_set_arn_imports,
+                assignments=assignments,
+                deployment_wave_size=deployment_wave_size,
+                plan_hash=permission_sets_stack.plan_hash,
+                stack_name=f"{stack_name}-{shard_index}",
+            )
+
+            # Imports by export name don't add the dependency on the permission sets stack.
+            # Deploy the stacks one after the other: when the shard count grows, assignments move
+            # from the earlier stacks to the new one, which must only create them once the earlier
+            # stacks have deleted them. It also keeps the deployment waves from being multiplied.
+            assignments_stack.add_dependency(previous_stack)
+            previous_stack = assignments_stack
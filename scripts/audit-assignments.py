@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+
+from utility.aws_clients import ClientFactory
+from utility.file_helpers import file_read_records, file_read_yaml
+
+from sso.account_structure import AccountStructure
+from sso.assignment_audit import audit_assignments, plan_desired_assignments
+from sso.group_mappings import GroupMappings
+from sso.permission_sets import PermissionSets
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Diff the planned SSO assignments against the live Identity Center assignments."
+    )
+    parser.add_argument("sso_instance_arn", type=str, help="The AWS SSO instance ARN")
+    parser.add_argument("env_name", type=str, help="The environment name")
+    parser.add_argument("group_prefix", type=str, help="The Group Prefix used in the directory")
+    parser.add_argument("permission_sets_file", type=str, help="The SSO permission sets file")
+    parser.add_argument("accounts_file", type=str, help="The accounts file (get-org-hierarchy.py)")
+    parser.add_argument(
+        "group_mappings_file", type=str, help="The group mappings file (get-sso-group-mappings.py)"
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=8,
+        help="The maximum number of concurrent SSO Admin list requests",
+    )
+    parser.add_argument(
+        "--fail-on-drift",
+        action="store_true",
+        help="Exit with status 2 when assignments are missing or unexpected",
+    )
+    args = parser.parse_args()
+
+    permission_sets = PermissionSets(file_read_yaml(args.permission_sets_file))
+    account_structure = AccountStructure(file_read_records(args.accounts_file, "Accounts"))
+    group_mappings = GroupMappings(
+        args.group_prefix, file_read_records(args.group_mappings_file, "sso_group_mappings")
+    )
+
+    client_factory = ClientFactory(max_workers=args.parallelism)
+
+    audit = audit_assignments(
+        client_factory.client("sso-admin"),
+        args.sso_instance_arn,
+        args.env_name,
+        plan_desired_assignments(permission_sets.get_stages(), account_structure, group_mappings),
+        group_mappings,
+        parallelism=args.parallelism,
+    )
+
+    print(f"AWS API calls: {client_factory.metrics_summary()}", file=sys.stderr)
+    print(json.dumps(audit, indent=2))
+
+    if args.fail_on_drift and (audit["missing"] or audit["unexpected"]):
+        sys.exit(2)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+from sso.permission_sets import PermissionSets, is_stage_stack_name, sso_stage_ids
+from utility.aws_clients import ClientFactory
+from utility.file_helpers import file_read_yaml
+
+ASSIGNMENT_RESOURCE_TYPE = "AWS::SSO::Assignment"
+
+
+def permission_sets_stack_names(
+    cfn_client, env_name: str, permission_sets: PermissionSets
+) -> List[str]:
+    """Get the names of the deployed permission sets & assignments stacks of the stages of an
+    environment
+    """
+
+    stage_stack_names = [
+        sso_stage_ids(stage_index, stage, env_name)[1]
+        for stage_index, stage in enumerate(permission_sets.get_stages())
+    ]
+    stack_names = []
+
+    for page in cfn_client.get_paginator("describe_stacks").paginate():
+        for stack in page["Stacks"]:
+            stack_name = stack["StackName"]
+            if any(
+                is_stage_stack_name(stage_stack_name, stack_name)
+                for stage_stack_name in stage_stack_names
+            ):
+                stack_names.append(stack_name)
+
+    return sorted(stack_names)
+
+
+def deployed_assignment_logical_ids(
+    cfn_client, env_name: str, permission_sets: PermissionSets
+) -> Dict[str, List[str]]:
+    """Get the logical ids of the deployed assignments of an environment by stack name"""
+
+    logical_ids = {}
+
+    for stack_name in permission_sets_stack_names(cfn_client, env_name, permission_sets):
+        paginator = cfn_client.get_paginator("list_stack_resources")
+        for page in paginator.paginate(StackName=stack_name):
+            for resource in page["StackResourceSummaries"]:
+                if resource["ResourceType"] == ASSIGNMENT_RESOURCE_TYPE:
+                    logical_ids.setdefault(stack_name, []).append(resource["LogicalResourceId"])
+
+    return {stack_name: sorted(ids) for stack_name, ids in sorted(logical_ids.items())}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Get the logical ids of the deployed assignments of an environment by stack,"
+        " which keep their ids when compact logical ids are enabled."
+    )
+    parser.add_argument("env_name", type=str, help="The environment name")
+    parser.add_argument(
+        "permission_sets_file", type=str, help="The permission sets configuration file"
+    )
+    args = parser.parse_args()
+
+    client_factory = ClientFactory(max_workers=1)
+
+    logical_ids = deployed_assignment_logical_ids(
+        client_factory.client("cloudformation"),
+        args.env_name,
+        PermissionSets(file_read_yaml(args.permission_sets_file)),
+    )
+
+    print(
+        f"Found {sum(len(ids) for ids in logical_ids.values())} deployed assignment(s)"
+        f" in {len(logical_ids)} stack(s)",
+        file=sys.stderr,
+    )
+    print(json.dumps(logical_ids, indent=2))
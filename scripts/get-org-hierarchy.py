@@ -1,13 +1,42 @@
 #!/usr/bin/env python3
 
-import boto3
+import argparse
 import json
+import sys
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from utility.aws_clients import ClientFactory, with_backoff
+from utility.event_coalescer import (
+    CONSUMED_EVENT_BATCHES_KEY,
+    LIFECYCLE_EVENT_STATUS_KEYS,
+    pending_lifecycle_events,
+)
+from utility.file_helpers import ACCOUNT_FIELDS, write_ndjson
+from utility.snapshot_store import SnapshotStore, snapshot_store_from_url
+
+ORG_SNAPSHOT_NAME = "org"
 
 
 class Org:
+    def __init__(self, org_client=None):
+        # AWS Organizations is global, hence region of us-east-1
+        self.org_client = org_client or ClientFactory().client(
+            "organizations", region_name="us-east-1"
+        )
+
+        # Number of AWS Organizations API requests (pages) made
+        self.api_calls = 0
+        self.__api_calls_lock = threading.Lock()
 
-    # AWS Organizations is global, hence region of us-east-1
-    org_client = boto3.client(service_name="organizations", region_name="us-east-1")
+    def __count_api_call(self):
+        with self.__api_calls_lock:
+            self.api_calls += 1
 
     def list_accounts(self):
         paginator = self.org_client.get_paginator("list_accounts")
@@ -16,8 +45,9 @@ class Org:
         accounts = []
 
         for page in page_iterator:
+            self.__count_api_call()
             for account in page["Accounts"]:
-                print(account)
+                print(account, file=sys.stderr)
                 accounts.append(account)
 
         return accounts
@@ -29,6 +59,7 @@ class Org:
         roots = []
 
         for page in page_iterator:
+            self.__count_api_call()
             for root in page["Roots"]:
                 roots.append(root)
 
@@ -41,6 +72,7 @@ class Org:
         ous = []
 
         for page in page_iterator:
+            self.__count_api_call()
             for ou in page["OrganizationalUnits"]:
                 ous.append(ou)
 
@@ -53,6 +85,7 @@ class Org:
         accounts = []
 
         for page in page_iterator:
+            self.__count_api_call()
             for account in page["Accounts"]:
                 accounts.append(account)
 
@@ -116,9 +149,353 @@ class Org:
 
         return org
 
+    def get_org_hierarchy_concurrent(self, parallelism: int = 8):
+        """Get the same org hierarchy as get_org_hierarchy but list the OUs concurrently.
+
+        The OU table of the organization (see get_org_table) is walked with a bounded number of
+        concurrent OU listings, after which the hierarchy is assembled depth-first in the same
+        order as the serial walk.
+        """
+
+        return self.org_from_table(self.get_org_table(parallelism=parallelism))
+
+    def iter_org_accounts(self, parallelism: int = 8):
+        """Yield the accounts of the org hierarchy with their name and id paths as they're listed.
+
+        The accounts of each OU are yielded as soon as the OU is listed (see iter_ous) instead of
+        being assembled in memory, in the order the OUs are listed rather than depth-first.
+        """
+
+        # There is only ever one OU root - at least for now
+        root = with_backoff(self.list_roots)[0]
+
+        for ou, accounts, _ in self.iter_ous(
+            [{"Id": root["Id"], "name_path": "/" + root["Name"], "id_path": "/" + root["Id"]}],
+            parallelism=parallelism,
+        ):
+            for account in accounts:
+                account["name_path"] = ou["name_path"]
+                account["id_path"] = ou["id_path"]
+                yield account
+
+    def get_org_table(self, parallelism: int = 8) -> dict:
+        """Get the OU table of the whole organization"""
+
+        # There is only ever one OU root - at least for now
+        root = with_backoff(self.list_roots)[0]
+
+        ous = {root["Id"]: {"name_path": "/" + root["Name"], "id_path": "/" + root["Id"]}}
+
+        self.walk_ou_table(ous, [root["Id"]], parallelism=parallelism)
+
+        return {"root_id": root["Id"], "ous": ous}
+
+    def refresh_org_table(self, org_table: dict, ou_ids, parallelism: int = 8) -> dict:
+        """Re-walk the subtrees of the given OUs of a previous OU table.
+
+        Accounts found in the re-walked subtrees are removed from the OUs they were previously in,
+        so that accounts moved into a re-walked OU aren't duplicated.
+        """
+
+        ous = org_table["ous"]
+
+        # Only walk the top-most of nested OUs
+        ou_ids = [
+            ou_id
+            for ou_id in ou_ids
+            if not any(
+                other_ou_id in ous[ou_id]["id_path"].split("/")[:-1] for other_ou_id in ou_ids
+            )
+        ]
+
+        refreshed_ou_ids = set()
+
+        for ou_id in ou_ids:
+            for subtree_ou_id in self.__subtree_ou_ids(ous, ou_id):
+                refreshed_ou_ids.add(subtree_ou_id)
+                if subtree_ou_id != ou_id:
+                    del ous[subtree_ou_id]
+
+            ous[ou_id] = {"name_path": ous[ou_id]["name_path"], "id_path": ous[ou_id]["id_path"]}
+
+        self.walk_ou_table(ous, ou_ids, parallelism=parallelism)
+
+        refreshed_account_ids = set()
+
+        for ou_id in ou_ids:
+            for subtree_ou_id in self.__subtree_ou_ids(ous, ou_id):
+                refreshed_ou_ids.add(subtree_ou_id)
+                refreshed_account_ids.update(
+                    account["Id"] for account in ous[subtree_ou_id]["accounts"]
+                )
+
+        for ou_id, ou in ous.items():
+            if ou_id not in refreshed_ou_ids:
+                ou["accounts"] = [
+                    account
+                    for account in ou["accounts"]
+                    if account["Id"] not in refreshed_account_ids
+                ]
+
+        return org_table
+
+    def walk_ou_table(self, ous: dict, ou_ids, parallelism: int = 8):
+        """Add the accounts and sub-OUs of the given OUs, and recursively of their sub-OUs, to the
+        OU table. The given OUs must already be in the OU table with their paths.
+        """
+
+        for ou, accounts, sub_ous in self.iter_ous(
+            [
+                {
+                    "Id": ou_id,
+                    "name_path": ous[ou_id]["name_path"],
+                    "id_path": ous[ou_id]["id_path"],
+                }
+                for ou_id in ou_ids
+            ],
+            parallelism=parallelism,
+        ):
+            table_ou = ous[ou["Id"]]
+
+            table_ou["ous"] = []
+            for sub_ou in sub_ous:
+                ous[sub_ou["Id"]] = {"name_path": sub_ou["name_path"], "id_path": sub_ou["id_path"]}
+                table_ou["ous"].append(sub_ou["Id"])
+
+            table_ou["accounts"] = accounts
+
+    def iter_ous(
+        self, ous: List[Dict], parallelism: int = 8
+    ) -> Iterator[Tuple[Dict, List[Dict], List[Dict]]]:
+        """Walk the subtrees of the given OUs (with their Id, name_path and id_path) concurrently
+        and yield each OU with its accounts and sub-OUs (with their paths) once they're listed.
+
+        At most parallelism OUs are listed at a time, and no further OU is listed until the listed
+        OUs are yielded, so that only the accounts of those OUs are held in memory however wide
+        the OU tree is. OUs are yielded in the order they're listed.
+        """
+
+        pending = deque(ous)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < parallelism:
+                    ou = pending.popleft()
+                    in_flight[executor.submit(self.__list_ou_children, ou["Id"])] = ou
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    ou = in_flight.pop(future)
+                    accounts, sub_ous = future.result()
+
+                    sub_ous = [
+                        {
+                            "Id": sub_ou["Id"],
+                            "name_path": f"{ou['name_path']}/{sub_ou['Name']}",
+                            "id_path": f"{ou['id_path']}/{sub_ou['Id']}",
+                        }
+                        for sub_ou in sub_ous
+                    ]
+                    pending.extend(sub_ous)
+
+                    yield ou, accounts, sub_ous
+
+    def __list_ou_children(self, ou_id: str) -> Tuple[List[Dict], List[Dict]]:
+        return (
+            with_backoff(self.list_accounts_for_parent, ou_id),
+            with_backoff(self.list_organizational_units_for_parent, ou_id),
+        )
+
+    def __subtree_ou_ids(self, ous: dict, ou_id: str):
+        ou_stack = [ou_id]
+
+        while ou_stack:
+            ou_id = ou_stack.pop()
+            yield ou_id
+            ou_stack.extend(reversed(ous[ou_id].get("ous", [])))
+
+    def org_from_table(self, org_table: dict) -> dict:
+        ous = org_table["ous"]
+
+        org = {}
+        org["Accounts"] = []
+
+        # Depth-first over the OU table for the same account order as the serial walk
+        for ou_id in self.__subtree_ou_ids(ous, org_table["root_id"]):
+            for account in ous[ou_id]["accounts"]:
+                account["name_path"] = ous[ou_id]["name_path"]
+                account["id_path"] = ous[ou_id]["id_path"]
+                org["Accounts"].append(account)
+
+        return org
+
+
+def lifecycle_event_ou_ids(events) -> Optional[set]:
+    """Get the ids of the OUs affected by Control Tower lifecycle events.
+
+    Returns None if any of the events doesn't identify an OU.
+    """
+
+    ou_ids = set()
+
+    for event in events:
+        service_event_details = event.get("detail", {}).get("serviceEventDetails", {})
+
+        status = next(
+            (
+                service_event_details[status_key]
+                for status_key in LIFECYCLE_EVENT_STATUS_KEYS
+                if status_key in service_event_details
+            ),
+            None,
+        )
+
+        if status is None or "organizationalUnit" not in status:
+            return None
+
+        ou_ids.add(status["organizationalUnit"]["organizationalUnitId"])
+
+    return ou_ids
+
+
+def get_org_table_from_snapshot(
+    org: Org,
+    store: SnapshotStore,
+    events,
+    full_refresh_seconds: float,
+    parallelism: int = 8,
+    consumed_event_batches: List[str] = None,
+) -> dict:
+    """Get the OU table by refreshing the OU subtrees affected by the events in the latest snapshot.
+
+    Falls back to a full walk of the organization when there's no snapshot, the last full walk is
+    older than full_refresh_seconds, there are no events (the pipeline may have been started for
+    an event that wasn't coalesced, e.g. without the event coalescer) or the events can't be
+    mapped to OUs in the snapshot.
+
+    The snapshot is stored with the consumed_event_batches, the lifecycle event batch versions
+    whose events were given, or keeps those of the previous snapshot when they're not given.
+    """
+
+    now = datetime.now(timezone.utc)
+    previous = store.get_latest(ORG_SNAPSHOT_NAME)
+    org_table = None
+
+    if previous is not None:
+        last_full_refresh = datetime.fromisoformat(previous.data["full_refresh"])
+        ou_ids = lifecycle_event_ou_ids(events)
+
+        if (
+            (now - last_full_refresh).total_seconds() < full_refresh_seconds
+            and ou_ids
+            and all(ou_id in previous.data["ous"] for ou_id in ou_ids)
+        ):
+            try:
+                org_table = org.refresh_org_table(previous.data, ou_ids, parallelism=parallelism)
+            except ClientError as error:
+                # E.g. an OU in the snapshot has since been deleted
+                print(f"Falling back to full refresh: {error}", file=sys.stderr)
+
+    if org_table is None:
+        org_table = org.get_org_table(parallelism=parallelism)
+        org_table["full_refresh"] = now.isoformat()
+
+    if consumed_event_batches is not None:
+        org_table[CONSUMED_EVENT_BATCHES_KEY] = sorted(consumed_event_batches)
+    elif previous is not None and CONSUMED_EVENT_BATCHES_KEY in previous.data:
+        org_table[CONSUMED_EVENT_BATCHES_KEY] = previous.data[CONSUMED_EVENT_BATCHES_KEY]
+
+    store.put(ORG_SNAPSHOT_NAME, org_table, now=now)
+
+    return org_table
+
 
 if __name__ == "__main__":
-    org = Org()
 
-    accounts = org.get_org_hierarchy()
-    print(json.dumps(accounts, indent=2, default=str))
+    parser = argparse.ArgumentParser(
+        description="Get AWS Organizations accounts with their OU name and id paths."
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=8,
+        help="The maximum number of concurrent AWS Organizations requests (1 lists serially)",
+    )
+    parser.add_argument(
+        "--snapshot-store",
+        type=str,
+        help="Reuse and update the org snapshot in this s3://bucket/prefix or directory",
+    )
+    parser.add_argument(
+        "--event-file",
+        type=str,
+        help="JSON file with the Control Tower lifecycle event(s) whose OUs should be re-walked"
+        " (defaults to the events coalesced in the snapshot store since the last run)",
+    )
+    parser.add_argument(
+        "--full-refresh-hours",
+        type=float,
+        default=24,
+        help="Walk the whole organization if the snapshot's last full walk is older than this",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="Output format, ndjson writes only the fields the CDK app needs, one record per line",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write each account as NDJSON as soon as it's listed (implies --format ndjson)",
+    )
+    args = parser.parse_args()
+
+    if args.stream and args.snapshot_store is not None:
+        parser.error("--stream can't be combined with --snapshot-store")
+
+    client_factory = ClientFactory(max_workers=args.parallelism)
+    org = Org(client_factory.client("organizations", region_name="us-east-1"))
+
+    if args.stream:
+        write_ndjson(
+            org.iter_org_accounts(parallelism=args.parallelism), ACCOUNT_FIELDS, flush=True
+        )
+        print(f"AWS API calls: {client_factory.metrics_summary()}", file=sys.stderr)
+        sys.exit(0)
+
+    if args.snapshot_store is not None:
+        store = snapshot_store_from_url(args.snapshot_store)
+        consumed_event_batches = None
+
+        if args.event_file is not None:
+            with open(args.event_file, "r") as file:
+                events = json.load(file)
+            if isinstance(events, dict):
+                events = [events]
+        else:
+            # Storing the org snapshot with the listed batches marks their events as consumed
+            events, consumed_event_batches = pending_lifecycle_events(store, ORG_SNAPSHOT_NAME)
+
+        org_table = get_org_table_from_snapshot(
+            org,
+            store,
+            events,
+            full_refresh_seconds=args.full_refresh_hours * 3600,
+            parallelism=args.parallelism,
+            consumed_event_batches=consumed_event_batches,
+        )
+        accounts = org.org_from_table(org_table)
+    elif args.parallelism > 1:
+        accounts = org.get_org_hierarchy_concurrent(parallelism=args.parallelism)
+    else:
+        accounts = org.get_org_hierarchy()
+
+    print(f"AWS API calls: {client_factory.metrics_summary()}", file=sys.stderr)
+
+    if args.format == "ndjson":
+        write_ndjson(accounts["Accounts"], ACCOUNT_FIELDS)
+    else:
+        print(json.dumps(accounts, indent=2, default=str))
@@ -1,26 +1,103 @@
 #!/usr/bin/env python3
 
-import boto3
 import json
-from typing import Dict
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
 import argparse
-from utility.file_helpers import file_read_yaml
+from utility.aws_clients import ClientFactory, with_backoff
+from utility.file_helpers import GROUP_MAPPING_FIELDS, file_read_yaml, write_ndjson
+from utility.snapshot_store import SnapshotStore, snapshot_store_from_url
 
+from sso.group_mappings import UnresolvedGroupsError
 from sso.permission_sets import PermissionSets
 
+GROUP_MAPPINGS_SNAPSHOT_NAME = "group-mappings"
 
-def list_identitystore_group(is_client, identity_store: str, display_name: str) -> Dict:
+
+def list_identitystore_group(is_client, identity_store: str, display_name: str) -> Optional[Dict]:
+    """Look up a group by display name. Returns None if there's no such group."""
 
     group_response = is_client.list_groups(
         IdentityStoreId=identity_store,
         Filters=[{"AttributePath": "DisplayName", "AttributeValue": f"{display_name}"}],
     )
 
-    for group in group_response["Groups"]:
-        if group["DisplayName"] == f"{display_name}":
-            return group
-        else:
-            raise ValueError("Unable to find group in identity store: " + f"{group}")
+    return next(
+        (group for group in group_response["Groups"] if group["DisplayName"] == display_name),
+        None,
+    )
+
+
+def list_identitystore_groups_by_prefix(
+    is_client, identity_store: str, group_prefix: str
+) -> Dict[str, Dict]:
+    """List all groups of the identity store and return the groups with the prefix by display name"""
+
+    paginator = is_client.get_paginator("list_groups")
+    page_iterator = paginator.paginate(IdentityStoreId=identity_store)
+
+    groups = {}
+
+    for page in page_iterator:
+        for group in page["Groups"]:
+            if group["DisplayName"].startswith(group_prefix):
+                groups[group["DisplayName"]] = group
+
+    return groups
+
+
+def resolve_identitystore_groups(
+    is_client,
+    identity_store: str,
+    group_prefix: str,
+    group_names: Iterable[str],
+    parallelism: int = 8,
+    sweep_threshold: int = 50,
+) -> Dict[str, Dict]:
+    """Resolve group names (without prefix) to their identity store groups.
+
+    Up to sweep_threshold groups are looked up concurrently by display name, while more groups are
+    resolved from a single paginated listing of all groups in the identity store.
+
+    Raises UnresolvedGroupsError listing every group that doesn't exist in the identity store.
+    """
+
+    group_names_by_display_name = {
+        f"{group_prefix}{group_name}": group_name for group_name in sorted(set(group_names))
+    }
+
+    if len(group_names_by_display_name) > sweep_threshold:
+        groups = with_backoff(
+            list_identitystore_groups_by_prefix, is_client, identity_store, group_prefix
+        )
+    else:
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            groups = dict(
+                zip(
+                    group_names_by_display_name,
+                    executor.map(
+                        lambda display_name: with_backoff(
+                            list_identitystore_group, is_client, identity_store, display_name
+                        ),
+                        group_names_by_display_name,
+                    ),
+                )
+            )
+
+    unresolved = [
+        group_name
+        for display_name, group_name in group_names_by_display_name.items()
+        if groups.get(display_name) is None
+    ]
+    if unresolved:
+        raise UnresolvedGroupsError(unresolved)
+
+    return {
+        group_name: groups[display_name]
+        for display_name, group_name in group_names_by_display_name.items()
+    }
 
 
 def get_sso_group_mappings(
@@ -28,7 +105,21 @@ def get_sso_group_mappings(
     group_prefix: str,
     identity_store: str,
     permission_sets: PermissionSets,
+    previous_group_mappings: Dict = None,
+    parallelism: int = 8,
+    sweep_threshold: int = 50,
 ) -> Dict:
+    """Look up the identity store group of every group assigned in the permission sets.
+
+    Groups found in previous_group_mappings (by prefixed group name) are reused without a lookup.
+    """
+
+    previous_group_ids = {}
+    if previous_group_mappings is not None:
+        previous_group_ids = {
+            mapping["group_name"]: mapping["group_id"]
+            for mapping in previous_group_mappings["sso_group_mappings"]
+        }
 
     # Use set to de-duplicate groups
     group_names = set()
@@ -38,21 +129,89 @@ def get_sso_group_mappings(
             for group in permission_set["group_assignments"]:
                 group_names.add(group["name"])
 
+    is_groups = resolve_identitystore_groups(
+        is_client,
+        identity_store,
+        group_prefix,
+        [
+            group_name
+            for group_name in group_names
+            if f"{group_prefix}{group_name}" not in previous_group_ids
+        ],
+        parallelism=parallelism,
+        sweep_threshold=sweep_threshold,
+    )
+
     group_mappings = []
 
-    for group_name in group_names:
+    for group_name in sorted(group_names):
 
         display_name = f"{group_prefix}{group_name}"
 
-        is_group = list_identitystore_group(is_client, identity_store, display_name)
+        if group_name in is_groups:
+            group_id = is_groups[group_name]["GroupId"]
+        else:
+            group_id = previous_group_ids[display_name]
 
-        group_mappings.append(
-            {"group_id": is_group["GroupId"], "group_name": is_group["DisplayName"]}
-        )
+        group_mappings.append({"group_id": group_id, "group_name": display_name})
 
     return {"sso_group_mappings": group_mappings}
 
 
+def get_sso_group_mappings_from_snapshot(
+    is_client,
+    group_prefix: str,
+    identity_store: str,
+    permission_sets: PermissionSets,
+    store: SnapshotStore,
+    full_refresh_seconds: float,
+    parallelism: int = 8,
+    sweep_threshold: int = 50,
+) -> Dict:
+    """Get the group mappings, only looking up groups that aren't in the latest snapshot.
+
+    All groups are looked up when there's no snapshot for the identity store or the snapshot's
+    last full lookup is older than full_refresh_seconds.
+    """
+
+    now = datetime.now(timezone.utc)
+    previous = store.get_latest(GROUP_MAPPINGS_SNAPSHOT_NAME)
+
+    previous_group_mappings = None
+    full_refresh = now
+
+    if (
+        previous is not None
+        and previous.data["identity_store"] == identity_store
+        and (now - datetime.fromisoformat(previous.data["full_refresh"])).total_seconds()
+        < full_refresh_seconds
+    ):
+        previous_group_mappings = previous.data
+        full_refresh = datetime.fromisoformat(previous.data["full_refresh"])
+
+    group_mappings = get_sso_group_mappings(
+        is_client=is_client,
+        group_prefix=group_prefix,
+        identity_store=identity_store,
+        permission_sets=permission_sets,
+        previous_group_mappings=previous_group_mappings,
+        parallelism=parallelism,
+        sweep_threshold=sweep_threshold,
+    )
+
+    store.put(
+        GROUP_MAPPINGS_SNAPSHOT_NAME,
+        {
+            "identity_store": identity_store,
+            "full_refresh": full_refresh.isoformat(),
+            "sso_group_mappings": group_mappings["sso_group_mappings"],
+        },
+        now=now,
+    )
+
+    return group_mappings
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(
@@ -62,18 +221,67 @@ if __name__ == "__main__":
     parser.add_argument("identity_store", type=str, help="The AWS identity store id")
     parser.add_argument("permission_sets_file", type=str, help="The SSO permission sets file")
     parser.add_argument("aws_region", type=str, help="The AWS region of the identity store")
+    parser.add_argument(
+        "--snapshot-store",
+        type=str,
+        help="Reuse and update the group mappings snapshot in this s3://bucket/prefix or directory",
+    )
+    parser.add_argument(
+        "--full-refresh-hours",
+        type=float,
+        default=24,
+        help="Look up all groups if the snapshot's last full lookup is older than this",
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=8,
+        help="The maximum number of concurrent identity store group lookups",
+    )
+    parser.add_argument(
+        "--sweep-threshold",
+        type=int,
+        default=50,
+        help="List all identity store groups instead of looking up more than this many groups",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="Output format, ndjson writes only the fields the CDK app needs, one record per line",
+    )
     args = parser.parse_args()
 
-    is_client = boto3.client(service_name="identitystore", region_name=args.aws_region)
+    client_factory = ClientFactory(max_workers=args.parallelism)
+    is_client = client_factory.client("identitystore", region_name=args.aws_region)
 
     content = file_read_yaml(args.permission_sets_file)
     permission_sets = PermissionSets(content)
 
-    group_mappings = get_sso_group_mappings(
-        is_client=is_client,
-        group_prefix=args.group_prefix,
-        identity_store=args.identity_store,
-        permission_sets=permission_sets,
-    )
+    if args.snapshot_store is not None:
+        group_mappings = get_sso_group_mappings_from_snapshot(
+            is_client=is_client,
+            group_prefix=args.group_prefix,
+            identity_store=args.identity_store,
+            permission_sets=permission_sets,
+            store=snapshot_store_from_url(args.snapshot_store),
+            full_refresh_seconds=args.full_refresh_hours * 3600,
+            parallelism=args.parallelism,
+            sweep_threshold=args.sweep_threshold,
+        )
+    else:
+        group_mappings = get_sso_group_mappings(
+            is_client=is_client,
+            group_prefix=args.group_prefix,
+            identity_store=args.identity_store,
+            permission_sets=permission_sets,
+            parallelism=args.parallelism,
+            sweep_threshold=args.sweep_threshold,
+        )
+
+    print(f"AWS API calls: {client_factory.metrics_summary()}", file=sys.stderr)
 
-    print(json.dumps(group_mappings, indent=2, default=str))
+    if args.format == "ndjson":
+        write_ndjson(group_mappings["sso_group_mappings"], GROUP_MAPPING_FIELDS)
+    else:
+        print(json.dumps(group_mappings, indent=2, default=str))
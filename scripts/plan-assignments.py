@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+from typing import Dict, List
+
+from utility.file_helpers import file_read_records, file_read_yaml
+
+from sso.account_structure import AccountStructure
+from sso.assignment_plan import plan_assignments
+from sso.group_mappings import GroupMappings
+from sso.permission_sets import PermissionSets
+
+TABLE_COLUMNS = ["stage", "permission_set_name", "account_id", "group_name", "group_id"]
+
+
+def plan_stages(
+    permission_sets: PermissionSets,
+    account_structure: AccountStructure,
+    group_mappings: GroupMappings,
+    stage_names: List[str] = None,
+) -> List[Dict]:
+    """Resolve the assignments of each (or each of the named) stages, sorted for review"""
+
+    stages = []
+
+    for stage in permission_sets.get_stages():
+        if stage_names and stage["name"] not in stage_names:
+            continue
+
+        assignments = plan_assignments(stage["permission_sets"], account_structure, group_mappings)
+
+        stages.append(
+            {
+                "name": stage["name"],
+                "permission_sets": [
+                    permission_set["permission_set_name"]
+                    for permission_set in stage["permission_sets"]
+                ],
+                "assignments": [assignment._asdict() for assignment in sorted(assignments)],
+            }
+        )
+
+    return stages
+
+
+def format_table(stages: List[Dict]) -> str:
+    rows = [TABLE_COLUMNS]
+
+    for stage in stages:
+        for assignment in stage["assignments"]:
+            rows.append([stage["name"]] + [assignment[column] for column in TABLE_COLUMNS[1:]])
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(TABLE_COLUMNS))]
+
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows
+    )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Print the SSO assignments the CDK app would create, without synthesizing it."
+    )
+    parser.add_argument("group_prefix", type=str, help="The Group Prefix used in the directory")
+    parser.add_argument("permission_sets_file", type=str, help="The SSO permission sets file")
+    parser.add_argument("accounts_file", type=str, help="The accounts file (get-org-hierarchy.py)")
+    parser.add_argument(
+        "group_mappings_file", type=str, help="The group mappings file (get-sso-group-mappings.py)"
+    )
+    parser.add_argument(
+        "--stage", action="append", dest="stages", help="Only plan this stage (repeatable)"
+    )
+    parser.add_argument("--format", choices=["json", "table"], default="table")
+    args = parser.parse_args()
+
+    permission_sets = PermissionSets(file_read_yaml(args.permission_sets_file))
+    account_structure = AccountStructure(file_read_records(args.accounts_file, "Accounts"))
+    group_mappings = GroupMappings(
+        args.group_prefix, file_read_records(args.group_mappings_file, "sso_group_mappings")
+    )
+
+    stages = plan_stages(permission_sets, account_structure, group_mappings, args.stages)
+
+    if args.format == "json":
+        print(json.dumps({"stages": stages}, indent=2))
+    else:
+        print(format_table(stages))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from sso.fast_path import release_fast_path_assignments
+from utility.aws_clients import ClientFactory
+from utility.snapshot_store import snapshot_store_from_url
+from utility.template_footprint import iter_assembly_templates
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Delete the assignments created by the fast path reconciler that a stage"
+        " creates, before deploying the stage."
+    )
+    parser.add_argument("sso_instance_arn", type=str, help="The AWS SSO instance ARN")
+    parser.add_argument("env_name", type=str, help="The environment name")
+    parser.add_argument(
+        "stage_assembly",
+        type=str,
+        help="The cloud assembly directory of the stage, e.g. cdk.out/assembly-SSOStage",
+    )
+    parser.add_argument(
+        "--snapshot-store",
+        type=str,
+        required=True,
+        help="The s3://bucket/prefix or directory the reconciler records its assignments in",
+    )
+    args = parser.parse_args()
+
+    client_factory = ClientFactory(max_workers=1)
+
+    released = release_fast_path_assignments(
+        client_factory.client("sso-admin"),
+        args.sso_instance_arn,
+        args.env_name,
+        snapshot_store_from_url(args.snapshot_store),
+        (template for _, template in iter_assembly_templates(args.stage_assembly)),
+    )
+
+    print(f"Released {len(released)} fast path assignment(s)", file=sys.stderr)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+
+from utility.template_footprint import (
+    DEFAULT_WARN_TEMPLATE_BYTES,
+    assembly_footprints,
+    footprint_warnings,
+    format_footprint_report,
+)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Report the template bytes of the synthesized stacks by resource type and"
+        " permission set."
+    )
+    parser.add_argument("cdk_out", type=str, help="The synthesized cloud assembly directory")
+    parser.add_argument(
+        "--warn-bytes",
+        type=int,
+        default=DEFAULT_WARN_TEMPLATE_BYTES,
+        help="Warn about the stacks whose template is larger than this",
+    )
+    parser.add_argument(
+        "--fail-on-warning", action="store_true", help="Exit with status 2 when there are warnings"
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Largest resource types & permission sets"
+    )
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    args = parser.parse_args()
+
+    footprints = assembly_footprints(args.cdk_out)
+
+    if args.format == "json":
+        print(json.dumps(footprints, indent=2))
+    else:
+        print(format_footprint_report(footprints, top=args.top))
+
+    warnings = footprint_warnings(footprints, args.warn_bytes)
+    for stack_name, template_bytes in warnings.items():
+        print(
+            f"WARNING: {stack_name} template is {template_bytes:,} bytes,"
+            f" more than {args.warn_bytes:,} bytes",
+            file=sys.stderr,
+        )
+
+    if warnings and args.fail_on_warning:
+        sys.exit(2)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Optional
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+from utility.template_footprint import iter_assembly_templates
+
+PLAN_HASH_OUTPUT = "PlanHash"
+
+
+def synthesized_plan_hashes(cdk_out: str) -> Dict[str, str]:
+    """Get the plan hash of every synthesized stack with a plan hash output by stack name,
+    including the stacks of nested (stage) cloud assemblies.
+
+    Each stack of a stage outputs the stage's plan hash, so that a stack that failed to deploy is
+    compared by its own deployed plan hash.
+    """
+
+    plan_hashes = {}
+
+    for stack_name, template in iter_assembly_templates(cdk_out):
+        output = template.get("Outputs", {}).get(PLAN_HASH_OUTPUT)
+        if output is not None:
+            plan_hashes[stack_name] = output["Value"]
+
+    return plan_hashes
+
+
+def deployed_plan_hash(cfn_client, stack_name: str) -> Optional[str]:
+    try:
+        stacks = cfn_client.describe_stacks(StackName=stack_name)["Stacks"]
+    except ClientError:
+        # The stack doesn't exist (yet)
+        return None
+
+    for output in stacks[0].get("Outputs", []):
+        if output["OutputKey"] == PLAN_HASH_OUTPUT:
+            return output["OutputValue"]
+
+    return None
+
+
+def changed_stacks(cfn_client, plan_hashes: Dict[str, str]) -> Dict[str, Dict]:
+    changed = {}
+
+    for stack_name, plan_hash in sorted(plan_hashes.items()):
+        deployed = deployed_plan_hash(cfn_client, stack_name)
+        if deployed != plan_hash:
+            changed[stack_name] = {"deployed": deployed, "synthesized": plan_hash}
+
+    return changed
+
+
+def last_succeeded_execution(cp_client, pipeline_name: str) -> Optional[Dict]:
+    paginator = cp_client.get_paginator("list_pipeline_executions")
+
+    for page in paginator.paginate(pipelineName=pipeline_name):
+        for execution in page["pipelineExecutionSummaries"]:
+            if execution["status"] == "Succeeded":
+                return execution
+
+    return None
+
+
+def source_revisions(revisions) -> list:
+    return sorted(revision["revisionId"] for revision in revisions)
+
+
+def skip_unchanged_plan(
+    cfn_client, cp_client, pipeline_name: str, pipeline_execution_id: str, cdk_out: str
+) -> bool:
+    """Stop the pipeline execution (the one running this synth) when neither the source revision nor the plan
+    hash of any stage changed since the last successful execution.
+
+    The source revision must be unchanged too, as code changes can change the pipeline and the
+    stacks without changing the resolved plan.
+    """
+
+    plan_hashes = synthesized_plan_hashes(cdk_out)
+    if not plan_hashes:
+        print("No plan hashes synthesized", file=sys.stderr)
+        return False
+
+    changed = changed_stacks(cfn_client, plan_hashes)
+    if changed:
+        print(f"Changed plans: {json.dumps(changed, indent=2)}", file=sys.stderr)
+        return False
+
+    # Another execution may be in progress too, e.g. a newer commit in the source stage
+    execution = cp_client.get_pipeline_execution(
+        pipelineName=pipeline_name, pipelineExecutionId=pipeline_execution_id
+    )["pipelineExecution"]
+    last_succeeded = last_succeeded_execution(cp_client, pipeline_name)
+
+    if last_succeeded is None:
+        print("No successful pipeline execution found", file=sys.stderr)
+        return False
+
+    if source_revisions(execution["artifactRevisions"]) != source_revisions(
+        last_succeeded["sourceRevisions"]
+    ):
+        print("Source revision changed since the last successful execution", file=sys.stderr)
+        return False
+
+    print(
+        f"Plans of {len(plan_hashes)} stack(s) unchanged, stopping pipeline execution"
+        f" {execution['pipelineExecutionId']}",
+        file=sys.stderr,
+    )
+
+    cp_client.stop_pipeline_execution(
+        pipelineName=pipeline_name,
+        pipelineExecutionId=execution["pipelineExecutionId"],
+        abandon=True,
+        reason="Resolved SSO permission sets and assignments plan unchanged",
+    )
+
+    return True
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Stop the pipeline execution when the synthesized plans are already deployed."
+    )
+    parser.add_argument("cdk_out", type=str, help="The synthesized cloud assembly directory")
+    args = parser.parse_args()
+
+    # CodeBuild started by CodePipeline is initiated by "codepipeline/<pipeline name>"
+    # and the pipeline passes its execution id in PIPELINE_EXECUTION_ID
+    initiator = os.environ.get("CODEBUILD_INITIATOR", "")
+    pipeline_execution_id = os.environ.get("PIPELINE_EXECUTION_ID")
+    if not initiator.startswith("codepipeline/") or not pipeline_execution_id:
+        print("Not running in a pipeline, not skipping", file=sys.stderr)
+        sys.exit(0)
+
+    try:
+        skip_unchanged_plan(
+            boto3.client("cloudformation"),
+            boto3.client("codepipeline"),
+            initiator[len("codepipeline/") :],
+            pipeline_execution_id,
+            args.cdk_out,
+        )
+    except (BotoCoreError, ClientError, KeyError) as error:
+        # Never fail the build, deploying unchanged stacks is merely slower
+        print(f"Unable to determine whether plans changed: {error}", file=sys.stderr)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+import yaml
+
+from sso.config_validation import validate_permission_sets_config
+from utility.file_helpers import file_read_yaml
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Validate the permission sets configuration and report all errors at once."
+    )
+    parser.add_argument(
+        "permission_sets_file", type=str, help="The permission sets configuration file"
+    )
+    parser.add_argument(
+        "--env-name", type=str, help="The environment name, to check the permission set names"
+    )
+    args = parser.parse_args()
+
+    try:
+        config = file_read_yaml(args.permission_sets_file)
+    except (OSError, yaml.YAMLError) as error:
+        print(f"{args.permission_sets_file}: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    errors = validate_permission_sets_config(config, args.env_name)
+
+    for error in errors:
+        print(f"{args.permission_sets_file}: {error}", file=sys.stderr)
+
+    if errors:
+        print(f"{len(errors)} error(s) in {args.permission_sets_file}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{args.permission_sets_file} is valid", file=sys.stderr)
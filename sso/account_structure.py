@@ -1,3 +1,24 @@
+import fnmatch
+from functools import lru_cache
+from typing import AbstractSet, Dict, Iterable, List, Tuple
+
+# Characters that make an OU path segment a glob pattern (fnmatch)
+GLOB_CHARACTERS = "*?["
+
+# Segment that matches any number of OU path segments, including none
+ANY_SEGMENTS = "**"
+
+
+def is_ou_path_pattern(path: str) -> bool:
+    return any(character in path for character in GLOB_CHARACTERS)
+
+
+@lru_cache(maxsize=None)
+def compile_ou_path_pattern(pattern: str) -> Tuple[Tuple[str, bool], ...]:
+    """Split an OU path pattern into its segments, each flagged as a glob or a literal name"""
+    return tuple((segment, is_ou_path_pattern(segment)) for segment in pattern.split("/")[1:])
+
+
 class AccountStructure:
 
     __account_structure = None
@@ -5,6 +26,26 @@ class AccountStructure:
     def __init__(self, account_structure: dict):
         self.__account_structure = account_structure
 
+        # Index accounts once by exact OU name path and by OU path segments
+        # so that OU assignments don't need to scan every account in the org
+        self.__accounts_by_path = {}
+        self.__path_tree = {}
+
+        for account in self.accounts:
+            name_path = account["name_path"]
+
+            if name_path not in self.__accounts_by_path:
+                self.__accounts_by_path[name_path] = []
+
+                node = self.__path_tree
+                for segment in name_path.split("/")[1:]:
+                    node = node.setdefault(segment, {})
+
+            self.__accounts_by_path[name_path].append(account)
+
+        # OU path pattern matches, as the same patterns are used by many permission sets
+        self.__ou_path_matches = {}
+
     @property
     def account_structure(self) -> dict:
         return self.__account_structure
@@ -12,3 +53,119 @@ class AccountStructure:
     @property
     def accounts(self) -> dict:
         return self.__account_structure["Accounts"]
+
+    def accounts_under(
+        self, path: str, recursive: bool = False, excluded: AbstractSet[str] = frozenset()
+    ) -> List[Dict]:
+        """Return the accounts in the OU path and, if recursive, all of its sub-OUs except for
+        the excluded OU paths (and their sub-OUs).
+
+        Accounts are returned in the same order as in the account structure for each OU,
+        with the OU itself first followed by its sub-OUs depth-first.
+        """
+        if not recursive:
+            return list(self.__accounts_by_path.get(path, []))
+
+        node = self.__path_tree
+        for segment in path.split("/")[1:]:
+            node = node.get(segment)
+            if node is None:
+                return []
+
+        accounts = []
+        stack = [(path, node)]
+
+        while stack:
+            node_path, node = stack.pop()
+            accounts.extend(self.__accounts_by_path.get(node_path, []))
+            for segment in reversed(list(node)):
+                sub_path = f"{node_path}/{segment}"
+                if sub_path not in excluded:
+                    stack.append((sub_path, node[segment]))
+
+        return accounts
+
+    def match_ou_paths(self, pattern: str) -> List[str]:
+        """Return the sorted OU paths with accounts (or sub-OUs with accounts) that match an OU
+        path pattern.
+
+        A segment is a literal OU name or an fnmatch glob of one OU name (e.g. `*`, `Prod*`),
+        and `**` matches any number of OUs. Literal segments are looked up, so the cost is
+        proportional to the OUs the pattern visits rather than to the accounts.
+        """
+        if pattern not in self.__ou_path_matches:
+            self.__ou_path_matches[pattern] = self.__match_ou_paths(pattern)
+
+        return list(self.__ou_path_matches[pattern])
+
+    def __match_ou_paths(self, pattern: str) -> List[str]:
+        segments = compile_ou_path_pattern(pattern)
+        matches = []
+        visited = set()
+
+        # Depth-first over (OU path, node, index of the next pattern segment)
+        stack = [("", self.__path_tree, 0)]
+
+        while stack:
+            node_path, node, index = stack.pop()
+            if (node_path, index) in visited:
+                continue
+            visited.add((node_path, index))
+
+            if index == len(segments):
+                matches.append(node_path)
+                continue
+
+            segment, is_glob = segments[index]
+            candidates = []
+
+            if segment == ANY_SEGMENTS:
+                # Match no further OU, or one more OU with the same pattern segment
+                candidates = [(f"{node_path}/{name}", node[name], index) for name in node]
+                candidates.append((node_path, node, index + 1))
+            elif is_glob:
+                candidates = [
+                    (f"{node_path}/{name}", node[name], index + 1)
+                    for name in node
+                    if fnmatch.fnmatchcase(name, segment)
+                ]
+            elif segment in node:
+                candidates = [(f"{node_path}/{segment}", node[segment], index + 1)]
+
+            stack.extend(reversed(candidates))
+
+        # Each OU before its sub-OUs
+        return sorted(set(matches), key=lambda path: path.split("/"))
+
+    def accounts_matching(
+        self, pattern: str, recursive: bool = False, exclude: Iterable[str] = ()
+    ) -> List[Dict]:
+        """Return the accounts in the OUs that match an OU path pattern and, if recursive, all of
+        their sub-OUs, except for the OUs that match an exclude pattern and all of their sub-OUs.
+
+        Accounts are returned once, in the order of accounts_under for each matching OU.
+        """
+        if not is_ou_path_pattern(pattern) and not exclude:
+            return self.accounts_under(pattern, recursive)
+
+        excluded = {
+            path for exclude_pattern in exclude for path in self.match_ou_paths(exclude_pattern)
+        }
+
+        accounts = []
+        included = set()
+
+        # Matching OUs are sorted with each OU before its sub-OUs, so the sub-OUs of an included
+        # or excluded OU are skipped without listing their accounts twice
+        for path in self.match_ou_paths(pattern):
+            segments = path.split("/")
+            path_and_ancestors = {
+                "/".join(segments[:length]) for length in range(2, len(segments) + 1)
+            }
+            if path_and_ancestors & excluded or (recursive and path_and_ancestors & included):
+                continue
+
+            included.add(path)
+            accounts.extend(self.accounts_under(path, recursive, excluded))
+
+        return accounts
@@ -0,0 +1,154 @@
+"""Drift audit of the planned assignments against the live Identity Center assignments"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from sso.account_structure import AccountStructure
+from sso.assignment_plan import Assignment, plan_assignments
+from sso.group_mappings import GroupMappings
+from sso.sso_admin import (
+    list_account_assignments,
+    permission_set_arns_by_name,
+    provisioned_account_ids,
+)
+
+
+def plan_desired_assignments(
+    stages: List[Dict], account_structure: AccountStructure, group_mappings: GroupMappings
+) -> List[Assignment]:
+    """Plan the assignments of all stages"""
+
+    assignments = set()
+
+    for stage in stages:
+        assignments.update(
+            plan_assignments(stage["permission_sets"], account_structure, group_mappings)
+        )
+
+    return sorted(assignments)
+
+
+def audit_assignments(
+    sso_admin_client,
+    instance_arn: str,
+    env_name: str,
+    desired: List[Assignment],
+    group_mappings: GroupMappings,
+    parallelism: int = 8,
+) -> dict:
+    """Diff the desired assignments against the live assignments of the environment's permission
+    sets.
+
+    The live assignments are listed concurrently per (permission set, account) for the accounts
+    with desired assignments and the accounts each permission set is provisioned to, so that
+    assignments added outside of the pipeline are found too.
+    """
+
+    permission_set_arns = permission_set_arns_by_name(sso_admin_client, instance_arn, env_name)
+
+    group_names = {
+        mapping["group_id"]: mapping["group_name"][len(group_mappings.prefix) :]
+        for mapping in group_mappings.group_mappings
+        if mapping["group_name"].startswith(group_mappings.prefix)
+    }
+
+    desired_by_target = defaultdict(set)
+    for assignment in desired:
+        desired_by_target[(assignment.permission_set_name, assignment.account_id)].add(assignment)
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        provisioned = dict(
+            zip(
+                permission_set_arns,
+                executor.map(
+                    lambda permission_set_arn: provisioned_account_ids(
+                        sso_admin_client, instance_arn, permission_set_arn
+                    ),
+                    permission_set_arns.values(),
+                ),
+            )
+        )
+
+        targets = sorted(
+            {target for target in desired_by_target if target[0] in permission_set_arns}
+            | {
+                (permission_set_name, account_id)
+                for permission_set_name, account_ids in provisioned.items()
+                for account_id in account_ids
+            }
+        )
+
+        actual = executor.map(
+            lambda target: list_account_assignments(
+                sso_admin_client, instance_arn, permission_set_arns[target[0]], target[1]
+            ),
+            targets,
+        )
+
+        missing = [
+            assignment
+            for target, assignments in desired_by_target.items()
+            if target[0] not in permission_set_arns
+            for assignment in assignments
+        ]
+        unexpected = []
+        actual_count = 0
+
+        for (permission_set_name, account_id), account_assignments in zip(targets, actual):
+            actual_count += len(account_assignments)
+            desired_group_ids = {
+                assignment.group_id: assignment
+                for assignment in desired_by_target.get((permission_set_name, account_id), [])
+            }
+
+            actual_group_ids = set()
+            for account_assignment in account_assignments:
+                if (
+                    account_assignment["PrincipalType"] == "GROUP"
+                    and account_assignment["PrincipalId"] in desired_group_ids
+                ):
+                    actual_group_ids.add(account_assignment["PrincipalId"])
+                else:
+                    unexpected.append(
+                        {
+                            "permission_set_name": permission_set_name,
+                            "account_id": account_id,
+                            "principal_type": account_assignment["PrincipalType"],
+                            "principal_id": account_assignment["PrincipalId"],
+                            "group_name": group_names.get(account_assignment["PrincipalId"]),
+                        }
+                    )
+
+            missing.extend(
+                assignment
+                for group_id, assignment in desired_group_ids.items()
+                if group_id not in actual_group_ids
+            )
+
+    return {
+        "summary": {
+            "desired": len(desired),
+            "actual": actual_count,
+            "missing": len(missing),
+            "unexpected": len(unexpected),
+            "targets_checked": len(targets),
+        },
+        "permission_sets_not_deployed": sorted(
+            {
+                assignment.permission_set_name
+                for assignment in desired
+                if assignment.permission_set_name not in permission_set_arns
+            }
+        ),
+        "missing": [assignment._asdict() for assignment in sorted(missing)],
+        "unexpected": sorted(
+            unexpected,
+            key=lambda item: (
+                item["permission_set_name"],
+                item["account_id"],
+                item["principal_type"],
+                item["principal_id"],
+            ),
+        ),
+    }
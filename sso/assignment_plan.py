@@ -0,0 +1,127 @@
+import hashlib
+import json
+from typing import Dict, List, NamedTuple, Tuple
+
+from sso.account_structure import AccountStructure
+from sso.group_mappings import GroupMappings
+
+
+class Assignment(NamedTuple):
+    """An SSO assignment of a permission set to an identity store group in an AWS account.
+
+    Tuples are compact and hashable and sort by permission set, account and group.
+    """
+
+    permission_set_name: str
+    account_id: str
+    group_name: str
+    group_id: str
+
+
+def resolve_permission_set_assignments(
+    permission_set: dict, account_structure: AccountStructure
+) -> List[Tuple[str, str]]:
+    """Resolve the OU and account assignments of a permission set to de-duplicated and sorted
+    (account id, group name) pairs
+    """
+
+    # Accounts and group assignments can overlap and are de-duplicated on insert
+    accounts_groups_mappings = set()
+
+    # Add Permission Set OU assignments with account lookups (optionally recursive). The path
+    # and exclude patterns may have globs, see AccountStructure.match_ou_paths
+    if permission_set.get("ou_assignments") is not None:
+        for ou_assignment in permission_set["ou_assignments"]:
+
+            ou_path = ou_assignment["path"]
+            ou_recursive = ou_assignment.get("recursive", False)
+            ou_exclude = ou_assignment.get("exclude") or []
+
+            for path in [ou_path] + ou_exclude:
+                if not path.startswith("/"):
+                    raise ValueError(f"OU path must start with a /: {path}")
+
+                if path.endswith("/"):
+                    raise ValueError(f"OU path must not end with a /: {path}")
+
+            # Path segments are matched so that '/Root/Dev'(/...) doesn't match
+            # '/Root/Development' too
+            ou_accounts = account_structure.accounts_matching(ou_path, ou_recursive, ou_exclude)
+
+            for group_assignment in permission_set["group_assignments"]:
+
+                for account in ou_accounts:
+                    accounts_groups_mappings.add((account["Id"], group_assignment["name"]))
+
+    # Add Permission Set direct accounts assignments
+    if permission_set.get("account_assignments") is not None:
+        for account_assignment in permission_set["account_assignments"]:
+            for group_assignment in permission_set["group_assignments"]:
+
+                accounts_groups_mappings.add((account_assignment, group_assignment["name"]))
+
+    return sorted(accounts_groups_mappings)
+
+
+def plan_assignments(
+    permission_sets: List[Dict],
+    account_structure: AccountStructure,
+    group_mappings: GroupMappings,
+) -> List[Assignment]:
+    """Resolve the permission sets of a stage to SSO assignments by permission set name,
+    AWS account id and identity store group name & id, sorted in permission set order
+    """
+
+    accounts_groups_mappings = [
+        resolve_permission_set_assignments(permission_set, account_structure)
+        for permission_set in permission_sets
+    ]
+
+    # Resolve all identity store groups of the stage in one go, so that a missing group fails
+    # with every missing group of the stage
+    group_mappings_by_name = group_mappings.resolve_many(
+        {group_name for mappings in accounts_groups_mappings for _, group_name in mappings}
+    )
+
+    assignments = []
+
+    for permission_set, mappings in zip(permission_sets, accounts_groups_mappings):
+        for account_id, group_name in mappings:
+            assignments.append(
+                Assignment(
+                    permission_set["permission_set_name"],
+                    account_id,
+                    group_name,
+                    group_mappings_by_name[group_name]["group_id"],
+                )
+            )
+
+    return assignments
+
+
+def plan_hash(permission_sets: List[Dict], assignments: List[Assignment], properties: dict) -> str:
+    """Canonical content hash of a resolved plan: the permission set definitions (including inline
+    policy documents), the assignments and the SSO instance and environment they're deployed to
+    """
+
+    inline_policy_documents = {}
+    for permission_set in permission_sets:
+        if "inline_policy_document_file" in permission_set:
+            with open(permission_set["inline_policy_document_file"], "r") as file:
+                inline_policy_documents[permission_set["permission_set_name"]] = file.read()
+
+    plan = {
+        "env_name": properties["env_name"],
+        "sso_instance_arn": properties["sso_instance_arn"],
+        "permission_sets": permission_sets,
+        "inline_policy_documents": inline_policy_documents,
+        "assignments": [assignment._asdict() for assignment in sorted(assignments)],
+    }
+
+    # Batched assignments are different resources, while the other emitters' templates are equal
+    if properties.get("assignment_emitter") == "batched":
+        plan["assignment_emitter"] = "batched"
+
+    return hashlib.sha256(
+        json.dumps(plan, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    ).hexdigest()
@@ -0,0 +1,432 @@
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from typing import AbstractSet, Dict, List, Tuple
+
+import aws_cdk as cdk
+import aws_cdk.aws_iam as iam
+import aws_cdk.aws_lambda as lambda_
+import aws_cdk.aws_sso as sso
+import aws_cdk.cloudformation_include as cfn_inc
+import aws_cdk.custom_resources as cr
+from constructs import Construct
+from sso.assignment_plan import Assignment
+from sso.batched_assignments import encode_assignments
+from sso.sso_admin import ACCOUNT_ASSIGNMENT_IAM_ACTIONS
+from utility.cfn_helpers import stage_function_code
+
+# Create an sso.CfnAssignment construct per assignment, include all assignments of a stack as
+# one generated template (which saves the Python to jsii round-trips of each construct) or
+# create one custom resource with all assignments per permission set (see sso.batched_assignments)
+ASSIGNMENT_EMITTERS = ["construct", "template", "batched"]
+
+# Maximum size of the properties of a batched assignments custom resource. An update request
+# carries the old and new properties, which must fit in an asynchronous Lambda invocation (256KB)
+MAX_BATCHED_PROPERTIES_BYTES = 100_000
+
+# Resources of the batched assignments provider (functions, roles, policies and the waiter
+# state machine)
+BATCHED_PROVIDER_RESOURCES = 17
+
+# Maximum duration of the creation, update or deletion of a batched assignments resource
+BATCHED_ASSIGNMENTS_TIMEOUT = cdk.Duration.hours(2)
+
+# Hex digits of the compact assignment ids (48 bits)
+COMPACT_ID_HASH_LENGTH = 12
+
+# Context set by the CDK CLI to add the construct path metadata to each resource
+PATH_METADATA_CONTEXT = "aws:cdk:enable-path-metadata"
+
+
+def assignment_construct_id(env_name: str, assignment: Assignment) -> str:
+    # Each SSO assignment resource name needs to be unique
+    return (
+        f"{assignment.permission_set_name}-{assignment.account_id}"
+        f"-{env_name}{assignment.group_name}"
+    )
+
+
+def compact_assignment_construct_id(assignment: Assignment) -> str:
+    """A short id that is stable for the permission set, account and group of an assignment"""
+    key = f"{assignment.permission_set_name}|{assignment.account_id}|{assignment.group_name}"
+    return "A" + hashlib.sha256(key.encode()).hexdigest()[:COMPACT_ID_HASH_LENGTH]
+
+
+def assignment_construct_ids(
+    env_name: str,
+    assignments: List[Assignment],
+    compact: bool = False,
+    deployed_logical_ids: AbstractSet[str] = frozenset(),
+) -> List[Tuple[str, Assignment]]:
+    """Pair each assignment with its construct id.
+
+    Compact ids apply to new assignments only: an assignment that is deployed with the logical id
+    of its legacy construct id keeps it, as a changed logical id replaces the assignment.
+    """
+    construct_ids = []
+
+    for assignment in assignments:
+        construct_id = assignment_construct_id(env_name, assignment)
+        if compact and logical_id(construct_id) not in deployed_logical_ids:
+            construct_id = compact_assignment_construct_id(assignment)
+        construct_ids.append((construct_id, assignment))
+
+    if len({construct_id for construct_id, _ in construct_ids}) != len(construct_ids):
+        raise ValueError("Assignment construct ids aren't unique")
+
+    return construct_ids
+
+
+def add_plan_hash_output(stack: cdk.Stack, plan_hash: str) -> cdk.CfnOutput:
+    """Output the plan hash of the stage, which the pipeline compares to the deployed plan hash of
+    each of the stage's stacks to skip unchanged deployments
+    """
+    return cdk.CfnOutput(
+        stack,
+        "PlanHash",
+        value=plan_hash,
+        description="Content hash of the resolved permission sets and assignments",
+    )
+
+
+def create_assignment(
+    scope: cdk.Stack,
+    construct_id: str,
+    instance_arn: str,
+    permission_set_arn: str,
+    assignment: Assignment,
+) -> sso.CfnAssignment:
+    return sso.CfnAssignment(
+        scope,
+        construct_id,
+        instance_arn=instance_arn,
+        permission_set_arn=permission_set_arn,
+        principal_id=assignment.group_id,
+        principal_type="GROUP",
+        target_id=assignment.account_id,
+        target_type="AWS_ACCOUNT",
+    )
+
+
+def chain_deployment_waves(assignments: List[sso.CfnAssignment], deployment_wave_size: int):
+    """Make each assignment depend on the assignment deployment_wave_size before it.
+
+    CloudFormation then creates the assignments in deployment_wave_size parallel chains,
+    which keeps the number of concurrent SSO Admin calls below its throttling limit.
+    """
+    for index in range(deployment_wave_size, len(assignments)):
+        assignments[index].add_dependency(assignments[index - deployment_wave_size])
+
+
+def logical_id(construct_id: str) -> str:
+    """The logical id of a resource construct in the root of a stack"""
+    return "".join(c for c in construct_id if c.isalnum())
+
+
+def assignment_resources(
+    stack_path: str,
+    instance_arn: str,
+    assignments: List[Tuple[str, Assignment]],
+    deployment_wave_size: int = None,
+    path_metadata: bool = False,
+) -> Dict[str, dict]:
+    """Build the assignment resources of a template that are equivalent to the sso.CfnAssignment
+    constructs of create_assignment and chain_deployment_waves.
+
+    The permission set ARNs are referenced as parameters named by permission_set_arn_parameter.
+    """
+    resources = {}
+    logical_ids = [logical_id(construct_id) for construct_id, _ in assignments]
+
+    for index, (construct_id, assignment) in enumerate(assignments):
+        resource = {
+            "Type": "AWS::SSO::Assignment",
+            "Properties": {
+                "InstanceArn": instance_arn,
+                "PermissionSetArn": {
+                    "Ref": permission_set_arn_parameter(assignment.permission_set_name)
+                },
+                "PrincipalId": assignment.group_id,
+                "PrincipalType": "GROUP",
+                "TargetId": assignment.account_id,
+                "TargetType": "AWS_ACCOUNT",
+            },
+        }
+
+        if deployment_wave_size and index >= deployment_wave_size:
+            resource["DependsOn"] = [logical_ids[index - deployment_wave_size]]
+
+        if path_metadata:
+            resource["Metadata"] = {"aws:cdk:path": f"{stack_path}/{construct_id}"}
+
+        resources[logical_ids[index]] = resource
+
+    return resources
+
+
+def permission_set_arn_parameter(permission_set_name: str) -> str:
+    return f"PermissionSetArn{logical_id(permission_set_name)}"
+
+
+def permission_set_arn_export_name(stack_name: str, permission_set_name: str) -> str:
+    """The stable export name of a permission set ARN that the assignments stacks import"""
+    return f"{stack_name}:{logical_id(permission_set_name)}PermissionSetArn"
+
+
+def include_assignments(
+    stack: cdk.Stack,
+    instance_arn: str,
+    permission_set_arns: Dict[str, str],
+    assignments: List[Tuple[str, Assignment]],
+    deployment_wave_size: int = None,
+) -> cfn_inc.CfnInclude:
+    """Add the assignments to a stack by including a generated template in a single call"""
+
+    permission_set_names = sorted({assignment.permission_set_name for _, assignment in assignments})
+
+    template = {
+        "Parameters": {
+            permission_set_arn_parameter(name): {"Type": "String"} for name in permission_set_names
+        },
+        "Resources": assignment_resources(
+            stack.node.path,
+            instance_arn,
+            assignments,
+            deployment_wave_size,
+            path_metadata=stack.node.try_get_context(PATH_METADATA_CONTEXT) in [True, "true"],
+        ),
+    }
+
+    with tempfile.TemporaryDirectory(prefix="assignments-") as template_dir:
+        template_file = Path(template_dir) / "assignments.template.json"
+        template_file.write_text(json.dumps(template))
+
+        return cfn_inc.CfnInclude(
+            stack,
+            "Assignments",
+            template_file=str(template_file),
+            parameters={
+                permission_set_arn_parameter(name): permission_set_arns[name]
+                for name in permission_set_names
+            },
+        )
+
+
+def add_assignments(
+    stack: cdk.Stack,
+    instance_arn: str,
+    permission_set_arns: Dict[str, str],
+    assignments: List[Tuple[str, Assignment]],
+    deployment_wave_size: int = None,
+    emitter: str = "construct",
+):
+    """Add the assignments (by construct id) to a stack with one of the ASSIGNMENT_EMITTERS"""
+
+    if emitter not in ASSIGNMENT_EMITTERS:
+        raise ValueError(
+            f"Unknown assignment emitter {emitter}, expected one of {ASSIGNMENT_EMITTERS}"
+        )
+
+    if emitter == "batched":
+        raise ValueError("Batched assignments are created per permission set, not per stack")
+
+    if not assignments:
+        return
+
+    if emitter == "template":
+        include_assignments(
+            stack, instance_arn, permission_set_arns, assignments, deployment_wave_size
+        )
+        return
+
+    cfn_assignments = [
+        create_assignment(
+            stack,
+            construct_id,
+            instance_arn,
+            permission_set_arns[assignment.permission_set_name],
+            assignment,
+        )
+        for construct_id, assignment in assignments
+    ]
+
+    if deployment_wave_size:
+        chain_deployment_waves(cfn_assignments, deployment_wave_size)
+
+
+class BatchedAssignmentsProvider(Construct):
+    """Custom resource provider of the batched assignments of the permission sets of a stack.
+
+    The assignments are applied by an asynchronous completion handler, in batches that each fit in
+    one invocation, for up to BATCHED_ASSIGNMENTS_TIMEOUT.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str) -> None:
+        super().__init__(scope, construct_id)
+
+        on_event_function = lambda_.Function(
+            self,
+            "Function",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="sso.batched_assignments.on_event",
+            code=lambda_.Code.from_asset(stage_function_code()),
+            timeout=cdk.Duration.minutes(1),
+        )
+
+        is_complete_function = lambda_.Function(
+            self,
+            "IsCompleteFunction",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="sso.batched_assignments.is_complete",
+            code=lambda_.Code.from_asset(stage_function_code()),
+            timeout=cdk.Duration.minutes(15),
+        )
+
+        is_complete_function.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=[
+                    "sso:CreateAccountAssignment",
+                    "sso:DeleteAccountAssignment",
+                    "sso:DescribeAccountAssignmentCreationStatus",
+                    "sso:DescribeAccountAssignmentDeletionStatus",
+                    "sso:ListAccountAssignmentsForPrincipal",
+                ]
+                + ACCOUNT_ASSIGNMENT_IAM_ACTIONS,
+                resources=["*"],
+            )
+        )
+
+        self.provider = cr.Provider(
+            self,
+            "Provider",
+            on_event_handler=on_event_function,
+            is_complete_handler=is_complete_function,
+            query_interval=cdk.Duration.seconds(30),
+            total_timeout=BATCHED_ASSIGNMENTS_TIMEOUT,
+        )
+
+    @property
+    def service_token(self) -> str:
+        return self.provider.service_token
+
+
+def batched_assignments_properties(
+    instance_arn: str, permission_set_arn: str, assignments: List[Assignment]
+) -> dict:
+    return {
+        "InstanceArn": instance_arn,
+        "PermissionSetArn": permission_set_arn,
+        "Assignments": encode_assignments(assignments),
+    }
+
+
+def batched_assignments_template_bytes(
+    permission_set_name: str, instance_arn: str, assignments: List[Assignment]
+) -> int:
+    """Estimate the size of a batched assignments resource in a synthesized template and check
+    that its properties stay within MAX_BATCHED_PROPERTIES_BYTES
+    """
+    properties_bytes = len(
+        json.dumps(batched_assignments_properties(instance_arn, "", assignments), indent=1)
+    )
+
+    if properties_bytes > MAX_BATCHED_PROPERTIES_BYTES:
+        raise ValueError(
+            f"The batched assignments of {permission_set_name} ({properties_bytes} bytes) exceed"
+            f" {MAX_BATCHED_PROPERTIES_BYTES} bytes, use the construct assignment emitter instead"
+        )
+
+    # The resource type, the service token and permission set ARN (GetAtt) and path metadata
+    return properties_bytes + 400
+
+
+def create_batched_assignments(
+    scope: Construct,
+    construct_id: str,
+    service_token: str,
+    instance_arn: str,
+    permission_set_arn: str,
+    assignments: List[Assignment],
+) -> cdk.CustomResource:
+    return cdk.CustomResource(
+        scope,
+        construct_id,
+        service_token=service_token,
+        resource_type="Custom::SSOAssignments",
+        properties=batched_assignments_properties(instance_arn, permission_set_arn, assignments),
+    )
+
+
+def assignment_template_bytes(
+    construct_id: str, instance_arn: str, assignment: Assignment, depends_on: bool = False
+) -> int:
+    """Estimate the size of an assignment resource in a synthesized (indented) template.
+
+    The permission set ARN is estimated as a cross-stack import, which is longer than a GetAtt.
+    A deployment wave dependency is estimated with the assignment's own logical id.
+    """
+    resource_id = logical_id(construct_id)
+
+    resource = {
+        resource_id: {
+            "Type": "AWS::SSO::Assignment",
+            "Properties": {
+                "InstanceArn": instance_arn,
+                "PermissionSetArn": {
+                    "Fn::ImportValue": permission_set_arn_export_name(
+                        "sso-permission-sets-env-name", assignment.permission_set_name
+                    )
+                },
+                "PrincipalId": assignment.group_id,
+                "PrincipalType": "GROUP",
+                "TargetId": assignment.account_id,
+                "TargetType": "AWS_ACCOUNT",
+            },
+            "Metadata": {"aws:cdk:path": f"SSOStage/PermissionSetsStack/{construct_id}/Resource"},
+        }
+    }
+
+    if depends_on:
+        resource[resource_id]["DependsOn"] = [resource_id]
+
+    return len(json.dumps(resource, indent=1))
+
+
+class AssignmentsStack(cdk.Stack):
+    """Generate AWS SSO Account Assignments for permission sets of another stack.
+
+    Used for the assignments that don't fit within the CloudFormation limits of the stack of the
+    permission sets themselves.
+    """
+
+    def __init__(
+        self,
+        scope: cdk.App,
+        construct_id: str,
+        properties: dict,
+        permission_set_arns: Dict[str, str],
+        assignments: List[Assignment],
+        deployment_wave_size: int = None,
+        plan_hash: str = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # A stack that failed to deploy keeps its previous plan hash, so it's deployed again
+        if plan_hash is not None:
+            add_plan_hash_output(self, plan_hash)
+
+        add_assignments(
+            self,
+            properties["sso_instance_arn"],
+            permission_set_arns,
+            assignment_construct_ids(
+                properties["env_name"],
+                assignments,
+                compact=properties.get("compact_logical_ids", False),
+                deployed_logical_ids=properties.get("deployed_logical_ids", frozenset()),
+            ),
+            deployment_wave_size,
+            emitter=properties.get("assignment_emitter", "construct"),
+        )
@@ -0,0 +1,225 @@
+"""Custom resource handler that owns all assignments of a permission set as one resource.
+
+The resource properties hold the account ids of each group, compactly encoded. Updates only
+create and delete the (account, group) pairs that changed, concurrently and rate limited.
+
+The pairs are applied by the completion handler of the provider's asynchronous waiter, at most
+MAX_REQUESTS_PER_INVOCATION per invocation, so that no invocation runs into the Lambda timeout.
+Each invocation looks up which of the changed pairs are still to be applied, so it resumes where
+the previous one stopped.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AbstractSet, Dict, Iterable, Set, Tuple
+
+from botocore.exceptions import ClientError
+
+from sso.assignment_plan import Assignment
+from sso.sso_admin import create_account_assignment, delete_account_assignment
+from utility.aws_clients import ClientFactory
+
+# Concurrent SSO Admin requests of the handler, rate limited by the client factory
+DEFAULT_PARALLELISM = 8
+
+# Number of failed requests listed in the error of a failed update
+MAX_REPORTED_FAILURES = 5
+
+# Account assignment requests applied per completion handler invocation. At the ~8 requests/s
+# the handler sustains, these take about 4 minutes, well within the 15 minute Lambda timeout
+MAX_REQUESTS_PER_INVOCATION = 2_000
+
+
+def encode_assignments(assignments: Iterable[Assignment]) -> Dict[str, str]:
+    """Encode assignments as the comma separated, sorted account ids by group id"""
+
+    account_ids = {}
+    for assignment in assignments:
+        account_ids.setdefault(assignment.group_id, set()).add(assignment.account_id)
+
+    return {group_id: ",".join(sorted(account_ids[group_id])) for group_id in sorted(account_ids)}
+
+
+def decode_assignments(properties: dict) -> Set[Tuple[str, str]]:
+    """Decode the (account id, group id) pairs of resource properties"""
+
+    return {
+        (account_id, group_id)
+        for group_id, account_ids in properties.get("Assignments", {}).items()
+        for account_id in account_ids.split(",")
+        if account_id
+    }
+
+
+def apply_assignments(
+    sso_admin_client,
+    instance_arn: str,
+    permission_set_arn: str,
+    create: Set[Tuple[str, str]],
+    delete: Set[Tuple[str, str]],
+    parallelism: int = DEFAULT_PARALLELISM,
+):
+    """Create and then delete (account id, group id) pairs of a permission set concurrently.
+
+    Deleting an assignment that no longer exists succeeds, so that a rollback of a partially
+    applied update converges. Raises RuntimeError when any request failed.
+    """
+
+    def assignment(pair: Tuple[str, str]) -> Assignment:
+        return Assignment(
+            permission_set_name="", account_id=pair[0], group_name="", group_id=pair[1]
+        )
+
+    def create_pair(pair: Tuple[str, str]):
+        create_account_assignment(
+            sso_admin_client, instance_arn, permission_set_arn, assignment(pair)
+        )
+
+    def delete_pair(pair: Tuple[str, str]):
+        try:
+            delete_account_assignment(
+                sso_admin_client, instance_arn, permission_set_arn, assignment(pair)
+            )
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
+
+    failures = []
+
+    def apply(action: str, request, pair: Tuple[str, str]):
+        try:
+            request(pair)
+        except (ClientError, RuntimeError) as error:
+            failures.append(f"{action} {pair[0]}/{pair[1]}: {error}")
+
+    # Create first, so that a group moving between accounts doesn't lose access in between
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        list(executor.map(lambda pair: apply("create", create_pair, pair), sorted(create)))
+
+    if not failures:
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            list(executor.map(lambda pair: apply("delete", delete_pair, pair), sorted(delete)))
+
+    if failures:
+        raise RuntimeError(
+            f"{len(failures)} account assignment request(s) failed: "
+            + "; ".join(sorted(failures)[:MAX_REPORTED_FAILURES])
+        )
+
+
+def assignment_delta(event: dict) -> Tuple[Set, Set, Set]:
+    """Get the desired (account id, group id) pairs of a custom resource event and the pairs to
+    create and delete
+    """
+
+    properties = event["ResourceProperties"]
+    desired = decode_assignments(properties)
+
+    if event["RequestType"] == "Create":
+        return desired, desired, set()
+
+    if event["RequestType"] == "Update":
+        old_properties = event["OldResourceProperties"]
+        if old_properties["PermissionSetArn"] != properties["PermissionSetArn"]:
+            # A new physical id, CloudFormation deletes the assignments of the old one
+            return desired, desired, set()
+
+        current = decode_assignments(old_properties)
+        return desired, desired - current, current - desired
+
+    return desired, set(), desired
+
+
+def deployed_pairs(
+    sso_admin_client, instance_arn: str, permission_set_arn: str, group_ids: AbstractSet[str]
+) -> Set[Tuple[str, str]]:
+    """Get the (account id, group id) pairs of the permission set's assignments of the groups"""
+
+    pairs = set()
+
+    for group_id in sorted(group_ids):
+        paginator = sso_admin_client.get_paginator("list_account_assignments_for_principal")
+        for page in paginator.paginate(
+            InstanceArn=instance_arn, PrincipalId=group_id, PrincipalType="GROUP"
+        ):
+            for account_assignment in page["AccountAssignments"]:
+                if account_assignment["PermissionSetArn"] == permission_set_arn:
+                    pairs.add((account_assignment["AccountId"], group_id))
+
+    return pairs
+
+
+def handle_event(event: dict) -> dict:
+    """Accept a CloudFormation custom resource (provider framework) event, which
+    handle_is_complete then applies
+    """
+
+    properties = event["ResourceProperties"]
+    desired, create, delete = assignment_delta(event)
+
+    print(
+        f"{event['RequestType']} {properties['PermissionSetArn']}: create {len(create)},"
+        f" delete {len(delete)} of {len(desired)} assignment(s)"
+    )
+
+    return {"PhysicalResourceId": f"{properties['PermissionSetArn']}/assignments"}
+
+
+def handle_is_complete(
+    event: dict,
+    sso_admin_client,
+    parallelism: int = DEFAULT_PARALLELISM,
+    max_requests: int = MAX_REQUESTS_PER_INVOCATION,
+) -> dict:
+    """Apply up to max_requests of the remaining assignment changes of a custom resource event
+    and report whether all of them are applied
+    """
+
+    properties = event["ResourceProperties"]
+    instance_arn = properties["InstanceArn"]
+    permission_set_arn = properties["PermissionSetArn"]
+    desired, create, delete = assignment_delta(event)
+
+    deployed = deployed_pairs(
+        sso_admin_client,
+        instance_arn,
+        permission_set_arn,
+        {group_id for _, group_id in create | delete},
+    )
+    remaining_create, remaining_delete = create - deployed, delete & deployed
+
+    # Create first, so that a group moving between accounts doesn't lose access in between
+    if remaining_create:
+        batch = set(sorted(remaining_create)[:max_requests])
+        apply_assignments(
+            sso_admin_client, instance_arn, permission_set_arn, batch, set(), parallelism
+        )
+        complete = batch == remaining_create and not remaining_delete
+    else:
+        batch = set(sorted(remaining_delete)[:max_requests])
+        apply_assignments(
+            sso_admin_client, instance_arn, permission_set_arn, set(), batch, parallelism
+        )
+        complete = batch == remaining_delete
+
+    print(
+        f"{event['RequestType']} {permission_set_arn}: applied {len(batch)} of"
+        f" {len(remaining_create)} remaining creation(s) and {len(remaining_delete)} remaining"
+        f" deletion(s)"
+    )
+
+    if not complete:
+        return {"IsComplete": False}
+
+    return {"IsComplete": True, "Data": {"Assignments": str(len(desired))}}
+
+
+def on_event(event, context):
+    return handle_event(event)
+
+
+def is_complete(event, context):
+    parallelism = int(os.environ.get("PARALLELISM", DEFAULT_PARALLELISM))
+    client_factory = ClientFactory(max_workers=parallelism)
+
+    return handle_is_complete(event, client_factory.client("sso-admin"), parallelism)
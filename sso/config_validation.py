@@ -0,0 +1,307 @@
+"""Preflight validation of the permission sets configuration file.
+
+Checks the structure and cross-field rules of the whole configuration and collects every error,
+before the pipeline looks up the organization and identity store groups. Doesn't depend on the
+CDK, so that it runs in milliseconds.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from sso.account_structure import ANY_SEGMENTS
+from sso.permission_sets import colliding_stage_ids
+from utility.policy_loader import PolicyLoader
+
+# Fields by name with their type and whether they're required
+STAGE_FIELDS = {
+    "name": (str, True),
+    "permission_sets": (list, True),
+    "depends_on": (list, False),
+    "wave": (int, False),
+    "max_resources_per_stack": (int, False),
+    "max_template_bytes_per_stack": (int, False),
+    "deployment_wave_size": (int, False),
+}
+
+PERMISSION_SET_FIELDS = {
+    "permission_set_name": (str, True),
+    "description": (str, False),
+    "session_duration": (str, False),
+    "relayStateType": (str, False),
+    "aws_managed_policies": (list, False),
+    "inline_policy_document_file": (str, False),
+    "ou_assignments": (list, False),
+    "account_assignments": (list, False),
+    "group_assignments": (list, True),
+}
+
+OU_ASSIGNMENT_FIELDS = {
+    "path": (str, True),
+    "recursive": (bool, False),
+    "exclude": (list, False),
+}
+
+GROUP_ASSIGNMENT_FIELDS = {
+    "name": (str, True),
+}
+
+# AWS SSO permission set limits, the name includes the "<env_name>-" prefix
+PERMISSION_SET_NAME_PATTERN = re.compile(r"^[\w+=,.@-]+$")
+MAX_PERMISSION_SET_NAME_LENGTH = 32
+MAX_DESCRIPTION_LENGTH = 700
+SESSION_DURATION_PATTERN = re.compile(r"^PT(?:(\d+)H)?(?:(\d+)M)?$")
+MIN_SESSION_DURATION_MINUTES = 60
+MAX_SESSION_DURATION_MINUTES = 12 * 60
+
+ACCOUNT_ID_PATTERN = re.compile(r"^\d{12}$")
+MANAGED_POLICY_ARN_PATTERN = re.compile(r"^arn:aws[\w-]*:iam::aws:policy/.+$")
+
+
+def validate_fields(value, fields: Dict[str, Tuple[type, bool]], location: str) -> List[str]:
+    """Validate a mapping against its fields: required, known and of the expected type"""
+
+    if not isinstance(value, dict):
+        return [f"{location}: must be a mapping"]
+
+    errors = []
+
+    for field, (field_type, required) in fields.items():
+        if field not in value:
+            if required:
+                errors.append(f"{location}.{field}: is required")
+            continue
+
+        # An optional list without items (e.g. `account_assignments:`) is the same as no list
+        if value[field] is None and field_type is list and not required:
+            continue
+
+        # bool is a subclass of int, but a boolean isn't a number here
+        field_value = value[field]
+        if not isinstance(field_value, field_type) or (
+            field_type is int and isinstance(field_value, bool)
+        ):
+            errors.append(
+                f"{location}.{field}: expected {field_type.__name__},"
+                f" got {type(field_value).__name__}"
+            )
+
+    for field in value:
+        if field not in fields:
+            errors.append(f"{location}.{field}: unknown field")
+
+    return errors
+
+
+def valid_fields(value, fields: Dict[str, Tuple[type, bool]]) -> Dict:
+    """The fields of a mapping that have the expected type, for the cross-field checks"""
+
+    if not isinstance(value, dict):
+        return {}
+
+    return {
+        field: value[field]
+        for field, (field_type, _) in fields.items()
+        if isinstance(value.get(field), field_type)
+        and not (field_type is int and isinstance(value[field], bool))
+    }
+
+
+def validate_ou_path(path: str, location: str) -> List[str]:
+
+    if not path.startswith("/"):
+        return [f"{location}: OU path must start with a /: {path}"]
+
+    if path.endswith("/"):
+        return [f"{location}: OU path must not end with a /: {path}"]
+
+    segments = path.split("/")[1:]
+
+    if "" in segments:
+        return [f"{location}: OU path must not have empty segments: {path}"]
+
+    if any(ANY_SEGMENTS in segment and segment != ANY_SEGMENTS for segment in segments):
+        return [f"{location}: {ANY_SEGMENTS} must be a whole OU path segment: {path}"]
+
+    return []
+
+
+def validate_session_duration(session_duration: str, location: str) -> List[str]:
+
+    match = SESSION_DURATION_PATTERN.match(session_duration)
+    if match is None or not any(match.groups()):
+        return [f"{location}: must be an ISO-8601 duration of hours and minutes, e.g. PT04H"]
+
+    minutes = int(match.group(1) or 0) * 60 + int(match.group(2) or 0)
+    if not MIN_SESSION_DURATION_MINUTES <= minutes <= MAX_SESSION_DURATION_MINUTES:
+        return [f"{location}: must be between 1 and 12 hours: {session_duration}"]
+
+    return []
+
+
+def validate_permission_set(
+    permission_set: dict,
+    location: str,
+    env_name: str,
+    policy_loader: PolicyLoader,
+) -> List[str]:
+
+    errors = validate_fields(permission_set, PERMISSION_SET_FIELDS, location)
+    fields = valid_fields(permission_set, PERMISSION_SET_FIELDS)
+
+    name = fields.get("permission_set_name")
+    if name is not None:
+        if not PERMISSION_SET_NAME_PATTERN.match(name):
+            errors.append(f"{location}.permission_set_name: invalid characters: {name}")
+        elif env_name and len(f"{env_name}-{name}") > MAX_PERMISSION_SET_NAME_LENGTH:
+            errors.append(
+                f"{location}.permission_set_name: {env_name}-{name} is longer than"
+                f" {MAX_PERMISSION_SET_NAME_LENGTH} characters"
+            )
+
+    if len(fields.get("description", "")) > MAX_DESCRIPTION_LENGTH:
+        errors.append(f"{location}.description: is longer than {MAX_DESCRIPTION_LENGTH} characters")
+
+    if "session_duration" in fields:
+        errors += validate_session_duration(
+            fields["session_duration"], f"{location}.session_duration"
+        )
+
+    for index, policy_arn in enumerate(fields.get("aws_managed_policies", [])):
+        if not isinstance(policy_arn, str) or not MANAGED_POLICY_ARN_PATTERN.match(policy_arn):
+            errors.append(
+                f"{location}.aws_managed_policies[{index}]: not an AWS managed policy ARN:"
+                f" {policy_arn}"
+            )
+
+    if "inline_policy_document_file" in fields:
+        try:
+            policy_loader.load(fields["inline_policy_document_file"])
+        except (OSError, ValueError) as error:
+            errors.append(f"{location}.inline_policy_document_file: {error}")
+
+    for index, ou_assignment in enumerate(fields.get("ou_assignments", [])):
+        ou_location = f"{location}.ou_assignments[{index}]"
+        errors += validate_fields(ou_assignment, OU_ASSIGNMENT_FIELDS, ou_location)
+
+        ou_fields = valid_fields(ou_assignment, OU_ASSIGNMENT_FIELDS)
+        if "path" in ou_fields:
+            errors += validate_ou_path(ou_fields["path"], f"{ou_location}.path")
+
+        for exclude_index, exclude in enumerate(ou_fields.get("exclude", [])):
+            exclude_location = f"{ou_location}.exclude[{exclude_index}]"
+            if not isinstance(exclude, str):
+                errors.append(f"{exclude_location}: expected str, got {type(exclude).__name__}")
+            else:
+                errors += validate_ou_path(exclude, exclude_location)
+
+    for index, account_id in enumerate(fields.get("account_assignments", [])):
+        account_location = f"{location}.account_assignments[{index}]"
+        if not isinstance(account_id, str):
+            errors.append(f"{account_location}: account id {account_id} must be a quoted string")
+        elif not ACCOUNT_ID_PATTERN.match(account_id):
+            errors.append(f"{account_location}: account id must be 12 digits: {account_id}")
+
+    if "group_assignments" in fields and not fields["group_assignments"]:
+        errors.append(f"{location}.group_assignments: must not be empty")
+
+    for index, group_assignment in enumerate(fields.get("group_assignments", [])):
+        errors += validate_fields(
+            group_assignment, GROUP_ASSIGNMENT_FIELDS, f"{location}.group_assignments[{index}]"
+        )
+
+    return errors
+
+
+def validate_permission_sets_config(config, env_name: str = None) -> List[str]:
+    """Validate a permission sets configuration and return all errors, in file order.
+
+    Permission set names must be unique across all stages, as they share the environment's
+    name prefix in AWS SSO. With an env_name, the prefixed names are checked against the name
+    length limit.
+    """
+
+    if not isinstance(config, dict) or not isinstance(config.get("stages"), list):
+        return ["stages: is required and must be a list"]
+
+    if not config["stages"]:
+        return ["stages: must not be empty"]
+
+    errors = []
+    policy_loader = PolicyLoader()
+    stage_names = set()
+    stage_names_by_index = {}
+    stage_locations = {}
+    permission_set_locations = {}
+
+    for stage_index, stage in enumerate(config["stages"]):
+        location = f"stages[{stage_index}]"
+        errors += validate_fields(stage, STAGE_FIELDS, location)
+        fields = valid_fields(stage, STAGE_FIELDS)
+
+        name = fields.get("name")
+        if name is not None:
+            location = f"stages[{stage_index}]({name})"
+            if name in stage_names:
+                errors.append(f"{location}.name: duplicate stage name: {name}")
+            else:
+                stage_names_by_index[stage_index] = name
+        stage_locations[stage_index] = location
+
+        if "wave" in fields and "depends_on" in fields:
+            errors.append(f"{location}: can't have both a wave and depends_on")
+
+        for index, dependency in enumerate(fields.get("depends_on", [])):
+            if not isinstance(dependency, str):
+                errors.append(
+                    f"{location}.depends_on[{index}]: expected str, got {type(dependency).__name__}"
+                )
+            elif dependency not in stage_names:
+                errors.append(
+                    f"{location}.depends_on: {dependency} isn't a stage defined before it"
+                )
+
+        if fields.get("wave", 0) < 0:
+            errors.append(f"{location}.wave: must not be negative")
+
+        for field in [
+            "max_resources_per_stack",
+            "max_template_bytes_per_stack",
+            "deployment_wave_size",
+        ]:
+            if fields.get(field, 1) < 1:
+                errors.append(f"{location}.{field}: must be positive")
+
+        if name is not None:
+            stage_names.add(name)
+
+        if "permission_sets" in fields and not fields["permission_sets"]:
+            errors.append(f"{location}.permission_sets: must not be empty")
+
+        for index, permission_set in enumerate(fields.get("permission_sets", [])):
+            permission_set_location = f"{location}.permission_sets[{index}]"
+            errors += validate_permission_set(
+                permission_set, permission_set_location, env_name, policy_loader
+            )
+
+            permission_set_name = valid_fields(permission_set, PERMISSION_SET_FIELDS).get(
+                "permission_set_name"
+            )
+            if permission_set_name in permission_set_locations:
+                errors.append(
+                    f"{permission_set_location}.permission_set_name: duplicate permission set"
+                    f" name {permission_set_name}, also in"
+                    f" {permission_set_locations[permission_set_name]}"
+                )
+            elif permission_set_name is not None:
+                permission_set_locations[permission_set_name] = permission_set_location
+
+    # The stage names without their special characters must be unique in ids and stack names
+    for stage_index, other_index, stage_id in colliding_stage_ids(
+        stage_names_by_index, env_name or "env"
+    ):
+        errors.append(
+            f"{stage_locations[stage_index]}.name: the {stage_id} of the stage collides with"
+            f" {stage_locations[other_index]}"
+        )
+
+    return errors
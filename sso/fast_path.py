@@ -0,0 +1,263 @@
+"""Fast path reconciler that assigns the permission sets of a new Control Tower account directly,
+without waiting for the pipeline.
+
+The assignments it creates are recorded in the snapshot store, one record per assignment. Before each stage deploys, the
+pipeline releases (deletes) the recorded assignments the stage's synthesized templates create, so
+that CloudFormation can create and own them.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sso.account_structure import AccountStructure
+from sso.assignment_plan import Assignment, plan_assignments
+from sso.batched_assignments import decode_assignments
+from sso.group_mappings import GroupMappings, UnresolvedGroupsError
+from sso.sso_admin import (
+    account_assignment_exists,
+    create_account_assignment,
+    delete_account_assignment,
+    permission_set_arns_by_name,
+)
+from utility.aws_clients import ClientFactory, with_backoff
+from utility.snapshot_store import SnapshotStore, snapshot_store_from_url
+from utility.template_footprint import resource_permission_set
+
+FAST_PATH_SNAPSHOT_NAME = "fast-path-assignments"
+
+# Control Tower lifecycle event service event details of (re-)enrolled accounts
+ACCOUNT_EVENT_STATUS_KEYS = ["createManagedAccountStatus", "updateManagedAccountStatus"]
+
+
+def lifecycle_event_account(event: dict) -> Optional[Tuple[str, str]]:
+    """Get the account id and OU id of a succeeded Control Tower create/update managed account
+    lifecycle event, or None for other events
+    """
+
+    service_event_details = event.get("detail", {}).get("serviceEventDetails", {})
+
+    for status_key in ACCOUNT_EVENT_STATUS_KEYS:
+        status = service_event_details.get(status_key)
+        if status is not None and status.get("state") == "SUCCEEDED":
+            return (
+                status["account"]["accountId"],
+                status["organizationalUnit"]["organizationalUnitId"],
+            )
+
+    return None
+
+
+def ou_name_path(org_client, ou_id: str) -> str:
+    """Get the name path (e.g. /Root/Workloads/Prod) of an OU by walking up to the root"""
+
+    names = []
+
+    while not ou_id.startswith("r-"):
+        ou = with_backoff(org_client.describe_organizational_unit, OrganizationalUnitId=ou_id)
+        names.append(ou["OrganizationalUnit"]["Name"])
+        ou_id = with_backoff(org_client.list_parents, ChildId=ou_id)["Parents"][0]["Id"]
+
+    root = next(
+        root for root in with_backoff(org_client.list_roots)["Roots"] if root["Id"] == ou_id
+    )
+    names.append(root["Name"])
+
+    return "/" + "/".join(reversed(names))
+
+
+def plan_account_assignments(
+    stages: List[Dict], account_id: str, name_path: str, group_mappings: GroupMappings
+) -> List[Assignment]:
+    """Plan the assignments of all stages for a single account in an OU name path"""
+
+    account_structure = AccountStructure({"Accounts": [{"Id": account_id, "name_path": name_path}]})
+
+    assignments = set()
+
+    for stage in stages:
+        for permission_set in stage["permission_sets"]:
+            try:
+                planned = plan_assignments([permission_set], account_structure, group_mappings)
+            except UnresolvedGroupsError as error:
+                # Left to the pipeline, which fails on unresolved groups
+                print(f"Skipping {permission_set['permission_set_name']}: {error}", file=sys.stderr)
+                continue
+
+            assignments.update(
+                assignment for assignment in planned if assignment.account_id == account_id
+            )
+
+    return sorted(assignments)
+
+
+def fast_path_record_key(assignment: Assignment) -> str:
+    # Record keys are safe S3 object names, whatever the permission set name
+    return hashlib.sha256(json.dumps(assignment).encode("utf-8")).hexdigest()[:32]
+
+
+def record_fast_path_assignments(store: SnapshotStore, assignments: List[Assignment]):
+    for assignment in assignments:
+        store.put_record(
+            FAST_PATH_SNAPSHOT_NAME, fast_path_record_key(assignment), assignment._asdict()
+        )
+
+
+def recorded_fast_path_assignments(store: SnapshotStore) -> List[Assignment]:
+    return sorted(
+        Assignment(**record) for record in store.get_records(FAST_PATH_SNAPSHOT_NAME).values()
+    )
+
+
+def reconcile_account(
+    config: dict, account_id: str, ou_id: str, org_client, sso_admin_client, store: SnapshotStore
+) -> List[Assignment]:
+    """Create the missing assignments of an account and record them in the snapshot store.
+
+    Assignments of permission sets that aren't deployed yet are left to the pipeline.
+    """
+
+    name_path = ou_name_path(org_client, ou_id)
+
+    assignments = plan_account_assignments(
+        config["stages"],
+        account_id,
+        name_path,
+        GroupMappings(config["group_prefix"], config["group_mappings"]),
+    )
+
+    permission_set_arns = permission_set_arns_by_name(
+        sso_admin_client, config["sso_instance_arn"], config["env_name"]
+    )
+
+    created = []
+
+    for assignment in assignments:
+        permission_set_arn = permission_set_arns.get(assignment.permission_set_name)
+        if permission_set_arn is None or account_assignment_exists(
+            sso_admin_client, config["sso_instance_arn"], permission_set_arn, assignment
+        ):
+            continue
+
+        create_account_assignment(
+            sso_admin_client, config["sso_instance_arn"], permission_set_arn, assignment
+        )
+        created.append(assignment)
+
+        # Record each assignment as soon as it's created so that none is left unreleased
+        record_fast_path_assignments(store, [assignment])
+
+    print(f"Created {len(created)} assignment(s) for {account_id} in {name_path}", file=sys.stderr)
+
+    return created
+
+
+def permission_set_logical_id(permission_set_name: str) -> str:
+    # The permission sets are constructs in the root of their stack named by the permission set
+    return "".join(c for c in permission_set_name if c.isalnum())
+
+
+def synthesized_assignments(templates: Iterable[dict]) -> Set[Tuple[str, str, str]]:
+    """Get the (permission set logical id, account id, group id) of the assignments that the
+    synthesized templates create, with any of the assignment emitters
+    """
+
+    assignments = set()
+
+    for template in templates:
+        for resource_id, resource in template.get("Resources", {}).items():
+            properties = resource.get("Properties", {})
+            permission_set = resource_permission_set(resource_id, resource)
+
+            if resource["Type"] == "AWS::SSO::Assignment":
+                assignments.add((permission_set, properties["TargetId"], properties["PrincipalId"]))
+            elif resource["Type"] == "Custom::SSOAssignments":
+                assignments.update(
+                    (permission_set, account_id, group_id)
+                    for account_id, group_id in decode_assignments(properties)
+                )
+
+    return assignments
+
+
+def remove_fast_path_assignments(store: SnapshotStore, assignments: List[Assignment]):
+    """Remove assignments from the record, keeping those recorded in the meantime"""
+
+    for assignment in assignments:
+        store.delete_record(FAST_PATH_SNAPSHOT_NAME, fast_path_record_key(assignment))
+
+
+def release_fast_path_assignments(
+    sso_admin_client,
+    instance_arn: str,
+    env_name: str,
+    store: SnapshotStore,
+    templates: Iterable[dict],
+) -> List[Assignment]:
+    """Delete the recorded fast path assignments that the synthesized templates of a stage
+    create, so that CloudFormation can create them, and remove them from the record.
+
+    The assignments of other stages stay recorded until their stage deploys.
+    """
+
+    recorded = recorded_fast_path_assignments(store)
+    if not recorded:
+        return []
+
+    synthesized = synthesized_assignments(templates)
+    stage_assignments = [
+        assignment
+        for assignment in recorded
+        if (
+            permission_set_logical_id(assignment.permission_set_name),
+            assignment.account_id,
+            assignment.group_id,
+        )
+        in synthesized
+    ]
+    if not stage_assignments:
+        return []
+
+    permission_set_arns = permission_set_arns_by_name(sso_admin_client, instance_arn, env_name)
+
+    released = []
+
+    for assignment in stage_assignments:
+        permission_set_arn = permission_set_arns.get(assignment.permission_set_name)
+        if permission_set_arn is not None and account_assignment_exists(
+            sso_admin_client, instance_arn, permission_set_arn, assignment
+        ):
+            delete_account_assignment(
+                sso_admin_client, instance_arn, permission_set_arn, assignment
+            )
+            released.append(assignment)
+
+    # CloudFormation owns the stage's assignments from now on, including those deleted since
+    remove_fast_path_assignments(store, stage_assignments)
+
+    return released
+
+
+def lambda_handler(event, context):
+    account = lifecycle_event_account(event)
+    if account is None:
+        return {"assignments": []}
+
+    config = json.loads(
+        Path(os.environ.get("FAST_PATH_CONFIG", "fast_path_config.json")).read_text()
+    )
+
+    client_factory = ClientFactory(max_workers=1)
+
+    created = reconcile_account(
+        config,
+        *account,
+        org_client=client_factory.client("organizations", region_name="us-east-1"),
+        sso_admin_client=client_factory.client("sso-admin"),
+        store=snapshot_store_from_url(os.environ["SNAPSHOT_STORE"]),
+    )
+
+    return {"assignments": [assignment._asdict() for assignment in created]}
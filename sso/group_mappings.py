@@ -1,9 +1,34 @@
+from typing import Dict, Iterable
+
+
+class UnresolvedGroupsError(KeyError):
+    """Raised when one or more group names have no mapping in the identity store group mappings"""
+
+    def __init__(self, group_names: Iterable[str]):
+        self.group_names = sorted(set(group_names))
+        super().__init__(f"Unable to find group mappings for groups: {', '.join(self.group_names)}")
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
 class GroupMappings:
     def __init__(self, prefix: str, group_mappings: dict):
 
+        # An empty group mappings list is used to bootstrap the pipeline itself
+        if not group_mappings:
+            group_mappings = {"sso_group_mappings": []}
+
         self._group_mappings = group_mappings
         self._prefix = prefix
 
+        # Index mappings once by group name without the prefix
+        self._mappings_by_name = {
+            item["group_name"][len(prefix) :]: item
+            for item in self._group_mappings["sso_group_mappings"]
+            if item["group_name"].startswith(prefix)
+        }
+
     @property
     def group_mappings(self):
         return self._group_mappings["sso_group_mappings"]
@@ -13,8 +38,28 @@ class GroupMappings:
         return self._prefix
 
     def get_mapping_by_name(self, group_name) -> dict:
-        return next(
-            item
-            for item in self._group_mappings["sso_group_mappings"]
-            if item["group_name"] == self._prefix + group_name
-        )
+        mapping = self._mappings_by_name.get(group_name)
+        if mapping is None:
+            raise UnresolvedGroupsError([group_name])
+
+        return mapping
+
+    def resolve_many(self, group_names: Iterable[str]) -> Dict[str, dict]:
+        """Resolve group names (without prefix) to their mappings.
+
+        Raises UnresolvedGroupsError listing every group name that can't be resolved.
+        """
+        mappings = {}
+        unresolved = set()
+
+        for group_name in group_names:
+            mapping = self._mappings_by_name.get(group_name)
+            if mapping is None:
+                unresolved.add(group_name)
+            else:
+                mappings[group_name] = mapping
+
+        if unresolved:
+            raise UnresolvedGroupsError(unresolved)
+
+        return mappings
@@ -1,4 +1,56 @@
-from typing import List, Dict
+import re
+from typing import List, Dict, Tuple
+
+
+def sso_stage_ids(stage_index: int, stage: Dict, env_name: str) -> Tuple[str, str]:
+    """Get the unique construct id and stack name of a stage.
+
+    The first stage keeps the original ids so that its deployed stacks aren't replaced.
+    """
+    if stage_index == 0:
+        return "SSOStage", f"sso-permission-sets-{env_name}"
+
+    construct_name = re.sub(r"[^A-Za-z0-9]", "", stage["name"])
+    stack_name = re.sub(r"[^A-Za-z0-9-]", "-", stage["name"])
+
+    return f"SSOStage{construct_name}", f"sso-permission-sets-{env_name}-{stack_name}"
+
+
+def is_stage_stack_name(stage_stack_name: str, stack_name: str) -> bool:
+    """Whether a stack is the permission sets stack of a stage (by its stack name) or one of the
+    stage's further assignments stacks (<stack name>-<N>)
+    """
+    return re.fullmatch(rf"{re.escape(stage_stack_name)}(-\d+)?", stack_name) is not None
+
+
+def colliding_stage_ids(stage_names: Dict[int, str], env_name: str) -> List[Tuple[int, int, str]]:
+    """Find the stages (by stage index) whose construct id or stack names collide with those of an
+    earlier stage once sso_stage_ids has removed the special characters of their names, e.g.
+    Dev-Ops and DevOps, or a stage named 1 and the first further stack of the first stage.
+
+    Returns the stage index, the index of the earlier stage and the colliding id.
+    """
+
+    stage_ids = {}
+    collisions = []
+
+    for stage_index, name in sorted(stage_names.items()):
+        construct_id, stack_name = sso_stage_ids(stage_index, {"name": name}, env_name)
+
+        for other_index, (other_construct_id, other_stack_name) in stage_ids.items():
+            if construct_id == other_construct_id:
+                collisions.append((stage_index, other_index, f"construct id {construct_id}"))
+                break
+
+            if is_stage_stack_name(other_stack_name, stack_name) or is_stage_stack_name(
+                stack_name, other_stack_name
+            ):
+                collisions.append((stage_index, other_index, f"stack name {stack_name}"))
+                break
+
+        stage_ids[stage_index] = (construct_id, stack_name)
+
+    return collisions
 
 
 class PermissionSets:
@@ -10,3 +62,60 @@ class PermissionSets:
 
     def get_stages(self) -> List[Dict]:
         return self.__permission_sets["stages"]
+
+    def get_waves(self) -> List[List[Dict]]:
+        """Group the stages into waves of stages that can be deployed in parallel.
+
+        A stage is deployed in its explicit `wave` number or in the wave after the stages it
+        `depends_on` (which must be defined before it). Stages without either are deployed after
+        the previous stage, so that stages without hints are deployed in sequence.
+        """
+
+        levels = {}
+        previous_level = -1
+
+        for stage in self.get_stages():
+            name = stage["name"]
+
+            if name in levels:
+                raise ValueError(f"Duplicate stage name: {name}")
+
+            if "wave" in stage and stage.get("depends_on") is not None:
+                raise ValueError(f"Stage {name} can't have both a wave and depends_on")
+
+            if "wave" in stage:
+                level = int(stage["wave"])
+            elif stage.get("depends_on") is not None:
+                unknown = [
+                    dependency for dependency in stage["depends_on"] if dependency not in levels
+                ]
+                if unknown:
+                    raise ValueError(
+                        f"Stage {name} depends on stages that aren't defined before it: {unknown}"
+                    )
+                level = (
+                    max([levels[dependency] for dependency in stage["depends_on"]], default=-1) + 1
+                )
+            else:
+                level = previous_level + 1
+
+            levels[name] = level
+            previous_level = level
+
+        # The construct ids and stack names drop the special characters of the stage names
+        stages = self.get_stages()
+        collisions = colliding_stage_ids(
+            {stage_index: stage["name"] for stage_index, stage in enumerate(stages)}, "env"
+        )
+        if collisions:
+            stage_index, other_index, stage_id = collisions[0]
+            raise ValueError(
+                f"The {stage_id} of stage {stages[stage_index]['name']} collides with stage"
+                f" {stages[other_index]['name']}"
+            )
+
+        waves = {}
+        for stage in self.get_stages():
+            waves.setdefault(levels[stage["name"]], []).append(stage)
+
+        return [waves[level] for level in sorted(waves)]
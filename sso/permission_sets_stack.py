@@ -1,11 +1,37 @@
+import json
+
 import aws_cdk as cdk
 import aws_cdk.aws_sso as sso
+from typing import List
+
+from sso.assignment_plan import Assignment, plan_assignments, plan_hash
+from sso.assignments_stack import (
+    BATCHED_PROVIDER_RESOURCES,
+    BatchedAssignmentsProvider,
+    add_assignments,
+    add_plan_hash_output,
+    assignment_construct_ids,
+    logical_id,
+    permission_set_arn_export_name,
+    assignment_template_bytes,
+    batched_assignments_template_bytes,
+    create_batched_assignments,
+)
 from sso.permission_sets import PermissionSets
+from sso.sharding import (
+    DEFAULT_MAX_RESOURCES_PER_STACK,
+    DEFAULT_MAX_TEMPLATE_BYTES_PER_STACK,
+    plan_shards,
+)
 from utility.cfn_helpers import file_sub
+from utility.policy_loader import policy_loader
 from sso.account_structure import AccountStructure
 from sso.group_mappings import GroupMappings
 from sso.account_structure import AccountStructure
 
+# Estimated bytes of the output that exports a permission set ARN in the synthesized template
+PERMISSION_SET_EXPORT_TEMPLATE_BYTES = 250
+
 
 class PermissionSetsStack(cdk.Stack):
     """Generate AWS SSO Permission Sets and Account Assignments.
@@ -14,6 +40,15 @@ class PermissionSetsStack(cdk.Stack):
     the implementation generates a stack with SSO permission sets and SSO group & account assignments.
 
     Note that group names must be predictable as the identity store group lookup doesn't support wildcard searches.
+
+    Assignments that don't fit within the CloudFormation stack limits together with the permission sets
+    are left in assignments_by_shard[1:] for separate AssignmentsStack stacks.
+
+    The permission set ARNs are exported under stable names, which the assignments stacks import
+    with permission_set_arn_imports, so that the exports don't change with the shards.
+
+    With a deployment_wave_size, assignments are deployed in that many parallel dependency chains.
+    With the batched assignment emitter, all assignments of a permission set are one custom resource.
     """
 
     def __init__(
@@ -24,16 +59,29 @@ class PermissionSetsStack(cdk.Stack):
         account_structure: AccountStructure,
         group_mappings: GroupMappings,
         permission_sets: PermissionSets,
+        max_resources_per_stack: int = DEFAULT_MAX_RESOURCES_PER_STACK,
+        max_template_bytes_per_stack: int = DEFAULT_MAX_TEMPLATE_BYTES_PER_STACK,
+        deployment_wave_size: int = None,
         **kwargs,
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        self.permission_set_arns = {}
+        self.permission_set_arn_imports = {}
+
+        permission_sets_template_bytes = 0
+
         for permission_set in permission_sets:
 
             # Optionally attach an inline policy document to the SSO Permission Set
             if "inline_policy_document_file" in permission_set:
-                inline_policy_document = file_sub(
-                    f"{permission_set['inline_policy_document_file']}"
+                inline_policy_file = permission_set["inline_policy_document_file"]
+                inline_policy_document = file_sub(f"{inline_policy_file}")
+
+                policy_document = policy_loader.load(inline_policy_file)
+                cdk.Annotations.of(self).add_info(
+                    f"Inline policy {inline_policy_file}: {policy_document.document_bytes} bytes"
+                    f" minified, {policy_document.bytes_saved} bytes saved"
                 )
             else:
                 inline_policy_document = None
@@ -50,70 +98,176 @@ class PermissionSetsStack(cdk.Stack):
                 session_duration=permission_set.get("session_duration"),
             )
 
-            accounts_groups_mappings = []
-
-            # Add Permission Set OU assignments with account lookups (optionally recursive)
-            if "ou_assignments" in permission_set:
-                for ou_assignment in permission_set["ou_assignments"]:
-
-                    ou_path = ou_assignment["path"]
-                    ou_recursive = ou_assignment.get("recursive", False)
-
-                    if not ou_path.startswith("/"):
-                        raise ValueError(f"OU path must start with a /: {ou_path}")
-
-                    if ou_path.endswith("/"):
-                        raise ValueError(f"OU path must not end with a /: {ou_path}")
-
-                    for group_assignment in permission_set["group_assignments"]:
-
-                        for account in account_structure.accounts:
-
-                            # Match either exactly or with startswith with slash because
-                            # '/Root/Dev'(/...) would still otherwise match '/Root/Development' too
-                            if account["name_path"] == ou_path or (
-                                ou_recursive and account["name_path"].startswith(ou_path + "/")
-                            ):
-                                accounts_groups_mappings.append(
-                                    {
-                                        "account_id": account["Id"],
-                                        "group_name": group_assignment["name"],
-                                    }
-                                )
-
-            # Add Permission Set direct accounts assignments
-            if permission_set.get("account_assignments") is not None:
-                for account_assignment in permission_set["account_assignments"]:
-                    for group_assignment in permission_set["group_assignments"]:
-
-                        accounts_groups_mappings.append(
-                            {
-                                "account_id": account_assignment,
-                                "group_name": group_assignment["name"],
-                            }
-                        )
-
-            # De-duplicate accounts and group assignments as they can overlap
-            dedup = [dict(s) for s in set(frozenset(d.items()) for d in accounts_groups_mappings)]
-
-            # Now create SSO assignments by SSO permission set, AWS account and identity store group
-            for accounts_groups_mapping in dedup:
-
-                group_name_prefix = properties["env_name"]
-                group_name = accounts_groups_mapping["group_name"]
-                account_id = accounts_groups_mapping["account_id"]
-
-                group_mapping = group_mappings.get_mapping_by_name(group_name)
-                group_id = group_mapping["group_id"]
-
-                # Each SSO assignment resource name needs to be unique
-                sso_assignment = sso.CfnAssignment(
-                    self,
-                    f"{permission_set['permission_set_name']}-{account_id}-{group_name_prefix}{group_name}",
-                    instance_arn=properties["sso_instance_arn"],
-                    permission_set_arn=sso_permission_set.attr_permission_set_arn,
-                    principal_id=group_id,
-                    principal_type="GROUP",
-                    target_id=account_id,
-                    target_type="AWS_ACCOUNT",
+            self.permission_set_arns[permission_set["permission_set_name"]] = (
+                sso_permission_set.attr_permission_set_arn
+            )
+
+            export_name = permission_set_arn_export_name(
+                self.stack_name, permission_set["permission_set_name"]
+            )
+            cdk.CfnOutput(
+                self,
+                f"{logical_id(permission_set['permission_set_name'])}PermissionSetArn",
+                value=sso_permission_set.attr_permission_set_arn,
+                export_name=export_name,
+            )
+            self.permission_set_arn_imports[permission_set["permission_set_name"]] = (
+                cdk.Fn.import_value(export_name)
+            )
+
+            # Keep the exports that CDK generated for the references of assignments stacks
+            # deployed before the explicit exports, until those stacks import the new names
+            if properties.get("legacy_permission_set_exports"):
+                self.export_value(sso_permission_set.attr_permission_set_arn)
+
+            # The permission set and its ARN export
+            permission_sets_template_bytes += len(json.dumps(permission_set, indent=1))
+            permission_sets_template_bytes += PERMISSION_SET_EXPORT_TEMPLATE_BYTES
+            if "inline_policy_document_file" in permission_set:
+                permission_sets_template_bytes += policy_loader.load(
+                    permission_set["inline_policy_document_file"]
+                ).document_bytes
+
+        assignments = plan_assignments(permission_sets, account_structure, group_mappings)
+
+        # The pipeline compares the deployed plan hash to skip unchanged deployments
+        self.plan_hash = plan_hash(permission_sets, assignments, properties)
+        add_plan_hash_output(self, self.plan_hash)
+
+        if properties.get("assignment_emitter") == "batched":
+            self.__add_batched_assignments(
+                properties,
+                assignments,
+                base_resources=len(permission_sets),
+                base_template_bytes=permission_sets_template_bytes,
+                max_resources=max_resources_per_stack,
+                max_template_bytes=max_template_bytes_per_stack,
+            )
+            return
+
+        # Spread SSO assignments across as many stacks as needed to stay within the
+        # CloudFormation stack limits. This stack holds the permission sets and the first shard.
+        assignments_by_construct_id = dict(
+            assignment_construct_ids(
+                properties["env_name"],
+                assignments,
+                compact=properties.get("compact_logical_ids", False),
+                deployed_logical_ids=properties.get("deployed_logical_ids", frozenset()),
+            )
+        )
+
+        self.assignment_shards = plan_shards(
+            {
+                construct_id: assignment_template_bytes(
+                    construct_id,
+                    properties["sso_instance_arn"],
+                    assignment,
+                    depends_on=bool(deployment_wave_size),
                 )
+                for construct_id, assignment in assignments_by_construct_id.items()
+            },
+            base_resources=len(permission_sets),
+            base_template_bytes=permission_sets_template_bytes,
+            max_resources=max_resources_per_stack,
+            max_template_bytes=max_template_bytes_per_stack,
+        )
+
+        self.assignments_by_shard = [
+            [assignments_by_construct_id[construct_id] for construct_id in shard.keys]
+            for shard in self.assignment_shards
+        ]
+
+        for shard in self.assignment_shards:
+            cdk.Annotations.of(self).add_info(
+                f"Assignments shard {shard.index}: {shard.resources} resources,"
+                f" ~{shard.template_bytes} template bytes"
+            )
+
+        # Now create SSO assignments by SSO permission set, AWS account and identity store group
+        add_assignments(
+            self,
+            properties["sso_instance_arn"],
+            self.permission_set_arns,
+            [
+                (construct_id, assignments_by_construct_id[construct_id])
+                for construct_id in self.assignment_shards[0].keys
+            ],
+            deployment_wave_size,
+            emitter=properties.get("assignment_emitter", "construct"),
+        )
+
+    def __add_batched_assignments(
+        self,
+        properties: dict,
+        assignments: List[Assignment],
+        base_resources: int,
+        base_template_bytes: int,
+        max_resources: int,
+        max_template_bytes: int,
+    ):
+        """Create one custom resource with all assignments per permission set in this stack.
+
+        The resources aren't sharded, as a permission set's assignments moving between stacks
+        would be created by one stack and then deleted by the other.
+
+        Fails when the stage's stacks have deployed AWS::SSO::Assignment resources, as the batched
+        resources would replace them and the deletion of the replaced resources would remove the
+        assignments.
+        """
+        deployed_logical_ids = properties.get("deployed_logical_ids", frozenset())
+        if deployed_logical_ids:
+            raise ValueError(
+                f"{self.stack_name} has {len(deployed_logical_ids)} deployed AWS::SSO::Assignment"
+                f" resource(s), e.g. {sorted(deployed_logical_ids)[0]}, which the batched"
+                " assignment emitter would replace and remove. Only use it for new stages"
+            )
+
+        assignments_by_permission_set = {}
+        for assignment in assignments:
+            assignments_by_permission_set.setdefault(assignment.permission_set_name, []).append(
+                assignment
+            )
+
+        shards = plan_shards(
+            {
+                permission_set_name: batched_assignments_template_bytes(
+                    permission_set_name, properties["sso_instance_arn"], permission_set_assignments
+                )
+                for permission_set_name, permission_set_assignments in (
+                    assignments_by_permission_set.items()
+                )
+            },
+            base_resources=base_resources + BATCHED_PROVIDER_RESOURCES,
+            base_template_bytes=base_template_bytes,
+            max_resources=max_resources,
+            max_template_bytes=max_template_bytes,
+        )
+
+        if len(shards) > 1:
+            raise ValueError(
+                "The batched assignments don't fit in the permission sets stack,"
+                " split the permission sets across stages"
+            )
+
+        cdk.Annotations.of(self).add_info(
+            f"Batched assignments: {shards[0].resources} resources,"
+            f" ~{shards[0].template_bytes} template bytes"
+        )
+
+        self.assignment_shards = shards
+        self.assignments_by_shard = [assignments]
+
+        if not assignments:
+            return
+
+        provider = BatchedAssignmentsProvider(self, "BatchedAssignmentsProvider")
+
+        for permission_set_name in sorted(assignments_by_permission_set):
+            create_batched_assignments(
+                self,
+                f"{permission_set_name}Assignments",
+                provider.service_token,
+                properties["sso_instance_arn"],
+                self.permission_set_arns[permission_set_name],
+                assignments_by_permission_set[permission_set_name],
+            )
@@ -0,0 +1,96 @@
+import hashlib
+import math
+from typing import Dict, Hashable, List
+
+# CloudFormation allows 500 resources per stack and a template body of up to 1MB (via S3).
+# Some headroom is left for estimation errors and resources added by CDK.
+DEFAULT_MAX_RESOURCES_PER_STACK = 450
+DEFAULT_MAX_TEMPLATE_BYTES_PER_STACK = 900_000
+
+
+def jump_hash(key: int, num_buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach) of a 64-bit key into num_buckets buckets.
+
+    When the number of buckets grows from n to n+1 only 1/(n+1) of the keys move,
+    and they all move to the new bucket.
+    """
+    b, j = -1, 0
+
+    while j < num_buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+
+    return b
+
+
+def stable_key_hash(key: Hashable) -> int:
+    """A 64-bit hash of the key which, unlike hash(), is stable between Python processes"""
+    return int.from_bytes(hashlib.sha256(repr(key).encode("utf-8")).digest()[:8], "big")
+
+
+class Shard:
+    def __init__(self, index: int, resources: int = 0, template_bytes: int = 0):
+        self.index = index
+        self.resources = resources
+        self.template_bytes = template_bytes
+        self.keys = []
+
+    def __repr__(self) -> str:
+        return (
+            f"Shard(index={self.index}, resources={self.resources}, "
+            f"template_bytes={self.template_bytes})"
+        )
+
+
+def plan_shards(
+    resource_bytes: Dict[Hashable, int],
+    base_resources: int = 0,
+    base_template_bytes: int = 0,
+    max_resources: int = DEFAULT_MAX_RESOURCES_PER_STACK,
+    max_template_bytes: int = DEFAULT_MAX_TEMPLATE_BYTES_PER_STACK,
+) -> List[Shard]:
+    """Spread resources across as few stacks (shards) as fit within the resource and size limits.
+
+    resource_bytes maps each resource key to its estimated template size. Shard 0 also contains
+    the base resources. Each key is placed with a consistent hash of the key, so a key stays in
+    the same shard between runs and only few keys move when another shard is needed.
+    """
+    if base_resources >= max_resources or base_template_bytes >= max_template_bytes:
+        raise ValueError(
+            f"Base resources ({base_resources} resources, {base_template_bytes} bytes)"
+            f" exceed the stack limits"
+        )
+
+    if any(template_bytes > max_template_bytes for template_bytes in resource_bytes.values()):
+        raise ValueError(f"A resource exceeds the stack template size limit {max_template_bytes}")
+
+    total_resources = base_resources + len(resource_bytes)
+    total_bytes = base_template_bytes + sum(resource_bytes.values())
+
+    num_shards = max(
+        1,
+        math.ceil(total_resources / max_resources),
+        math.ceil(total_bytes / max_template_bytes),
+    )
+
+    key_hashes = {key: stable_key_hash(key) for key in resource_bytes}
+
+    while True:
+        shards = [Shard(index) for index in range(num_shards)]
+        shards[0].resources = base_resources
+        shards[0].template_bytes = base_template_bytes
+
+        for key in sorted(resource_bytes, key=repr):
+            shard = shards[jump_hash(key_hashes[key], num_shards)]
+            shard.keys.append(key)
+            shard.resources += 1
+            shard.template_bytes += resource_bytes[key]
+
+        if all(
+            shard.resources <= max_resources and shard.template_bytes <= max_template_bytes
+            for shard in shards
+        ):
+            return shards
+
+        num_shards += 1
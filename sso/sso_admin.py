@@ -0,0 +1,165 @@
+import time
+from typing import Dict, List
+
+from sso.assignment_plan import Assignment
+from utility.aws_clients import with_backoff
+
+# Seconds between polls of an account assignment creation or deletion request
+REQUEST_STATUS_POLL_SECONDS = 1.0
+
+# IAM actions needed to create or delete SSO account assignments (and their roles)
+ACCOUNT_ASSIGNMENT_IAM_ACTIONS = [
+    "iam:AttachRolePolicy",
+    "iam:CreateRole",
+    "iam:DeleteRole",
+    "iam:DeleteRolePolicy",
+    "iam:DetachRolePolicy",
+    "iam:GetRole",
+    "iam:ListAttachedRolePolicies",
+    "iam:ListRolePolicies",
+    "iam:PutRolePolicy",
+    "iam:UpdateRole",
+    "iam:GetSAMLProvider",
+    "iam:CreateSAMLProvider",
+    "iam:UpdateSAMLProvider",
+    "iam:DeleteSAMLProvider",
+]
+
+
+def permission_set_arns_by_name(
+    sso_admin_client, instance_arn: str, env_name: str
+) -> Dict[str, str]:
+    """Get the ARNs of the deployed permission sets of an environment by permission set name
+    (without the environment name prefix)
+    """
+
+    permission_set_arns = {}
+    name_prefix = f"{env_name}-"
+
+    paginator = sso_admin_client.get_paginator("list_permission_sets")
+    for page in paginator.paginate(InstanceArn=instance_arn):
+        for permission_set_arn in page["PermissionSets"]:
+            permission_set = with_backoff(
+                sso_admin_client.describe_permission_set,
+                InstanceArn=instance_arn,
+                PermissionSetArn=permission_set_arn,
+            )["PermissionSet"]
+
+            if permission_set["Name"].startswith(name_prefix):
+                permission_set_arns[permission_set["Name"][len(name_prefix) :]] = permission_set_arn
+
+    return permission_set_arns
+
+
+def account_assignment_exists(
+    sso_admin_client, instance_arn: str, permission_set_arn: str, assignment: Assignment
+) -> bool:
+    paginator = sso_admin_client.get_paginator("list_account_assignments")
+
+    for page in paginator.paginate(
+        InstanceArn=instance_arn,
+        AccountId=assignment.account_id,
+        PermissionSetArn=permission_set_arn,
+    ):
+        for account_assignment in page["AccountAssignments"]:
+            if (
+                account_assignment["PrincipalType"] == "GROUP"
+                and account_assignment["PrincipalId"] == assignment.group_id
+            ):
+                return True
+
+    return False
+
+
+def list_account_assignments(
+    sso_admin_client, instance_arn: str, permission_set_arn: str, account_id: str
+) -> List[dict]:
+    """List all assignments (of any principal type) of a permission set in an account"""
+
+    paginator = sso_admin_client.get_paginator("list_account_assignments")
+
+    return [
+        account_assignment
+        for page in paginator.paginate(
+            InstanceArn=instance_arn, AccountId=account_id, PermissionSetArn=permission_set_arn
+        )
+        for account_assignment in page["AccountAssignments"]
+    ]
+
+
+def provisioned_account_ids(
+    sso_admin_client, instance_arn: str, permission_set_arn: str
+) -> List[str]:
+    """List the accounts a permission set is provisioned to"""
+
+    paginator = sso_admin_client.get_paginator("list_accounts_for_provisioned_permission_set")
+
+    return [
+        account_id
+        for page in paginator.paginate(
+            InstanceArn=instance_arn, PermissionSetArn=permission_set_arn
+        )
+        for account_id in page["AccountIds"]
+    ]
+
+
+def wait_for_request(describe, request_id_key: str, status_key: str, request_id: str, **kwargs):
+    """Poll an asynchronous SSO Admin account assignment request until it's no longer in progress"""
+
+    while True:
+        status = with_backoff(describe, **{request_id_key: request_id}, **kwargs)[status_key]
+
+        if status["Status"] == "SUCCEEDED":
+            return status
+
+        if status["Status"] == "FAILED":
+            raise RuntimeError(
+                f"Account assignment request {request_id} failed: {status.get('FailureReason')}"
+            )
+
+        time.sleep(REQUEST_STATUS_POLL_SECONDS)
+
+
+def _assignment_parameters(instance_arn: str, permission_set_arn: str, assignment: Assignment):
+    return {
+        "InstanceArn": instance_arn,
+        "TargetId": assignment.account_id,
+        "TargetType": "AWS_ACCOUNT",
+        "PermissionSetArn": permission_set_arn,
+        "PrincipalType": "GROUP",
+        "PrincipalId": assignment.group_id,
+    }
+
+
+def create_account_assignment(
+    sso_admin_client, instance_arn: str, permission_set_arn: str, assignment: Assignment
+):
+    status = with_backoff(
+        sso_admin_client.create_account_assignment,
+        **_assignment_parameters(instance_arn, permission_set_arn, assignment),
+    )["AccountAssignmentCreationStatus"]
+
+    return wait_for_request(
+        sso_admin_client.describe_account_assignment_creation_status,
+        "AccountAssignmentCreationRequestId",
+        "AccountAssignmentCreationStatus",
+        status["RequestId"],
+        InstanceArn=instance_arn,
+    )
+
+
+def delete_account_assignment(
+    sso_admin_client, instance_arn: str, permission_set_arn: str, assignment: Assignment
+):
+    status = with_backoff(
+        sso_admin_client.delete_account_assignment,
+        **_assignment_parameters(instance_arn, permission_set_arn, assignment),
+    )["AccountAssignmentDeletionStatus"]
+
+    return wait_for_request(
+        sso_admin_client.describe_account_assignment_deletion_status,
+        "AccountAssignmentDeletionRequestId",
+        "AccountAssignmentDeletionStatus",
+        status["RequestId"],
+        InstanceArn=instance_arn,
+    )
@@ -0,0 +1,380 @@
+import importlib.util
+import threading
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[2] / "scripts"
+
+
+def load_script(script_name: str):
+    """Load a script from the scripts directory (which have non-importable names) as a module"""
+
+    module_name = script_name.replace("-", "_").removesuffix(".py")
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / script_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def throttling_error(operation_name: str) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": "TooManyRequestsException", "Message": "Rate exceeded"}},
+        operation_name,
+    )
+
+
+class StubPaginator:
+    def __init__(self, client, operation_name: str):
+        self._client = client
+        self._operation_name = operation_name
+
+    def paginate(self, **kwargs):
+        items_key, items = self._client.list_items(self._operation_name, **kwargs)
+
+        page_size = self._client.page_size
+        for start in range(0, max(len(items), 1), page_size):
+            self._client.record_call(self._operation_name)
+            yield {items_key: items[start : start + page_size]}
+
+
+class StubOrganizationsClient:
+    """In-memory stand-in for the AWS Organizations client.
+
+    The organization is given as a root and a map of OU/root ids to their accounts and sub-OUs.
+    """
+
+    def __init__(self, root: dict, children: dict, page_size: int = 2, throttles: int = 0):
+        self._root = root
+        self._children = children
+        self._lock = threading.Lock()
+        self.page_size = page_size
+        self.throttles = throttles
+        self.calls = {}
+
+    def record_call(self, operation_name: str):
+        with self._lock:
+            if self.throttles > 0:
+                self.throttles -= 1
+                raise throttling_error(operation_name)
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+
+    def get_paginator(self, operation_name: str) -> StubPaginator:
+        return StubPaginator(self, operation_name)
+
+    def list_items(self, operation_name: str, **kwargs):
+        if operation_name == "list_roots":
+            return "Roots", [self._root]
+        if operation_name == "list_accounts":
+            return "Accounts", [
+                dict(account)
+                for parent_id in self._children
+                for account in self._children[parent_id].get("Accounts", [])
+            ]
+        if operation_name == "list_accounts_for_parent":
+            return "Accounts", [
+                dict(account) for account in self._children[kwargs["ParentId"]].get("Accounts", [])
+            ]
+        if operation_name == "list_organizational_units_for_parent":
+            return "OrganizationalUnits", [
+                dict(ou) for ou in self._children[kwargs["ParentId"]].get("OrganizationalUnits", [])
+            ]
+
+        raise NotImplementedError(operation_name)
+
+    def list_roots(self):
+        self.record_call("list_roots")
+        return {"Roots": [self._root]}
+
+    def describe_organizational_unit(self, OrganizationalUnitId: str):
+        self.record_call("describe_organizational_unit")
+        return {
+            "OrganizationalUnit": next(
+                dict(ou)
+                for children in self._children.values()
+                for ou in children.get("OrganizationalUnits", [])
+                if ou["Id"] == OrganizationalUnitId
+            )
+        }
+
+    def list_parents(self, ChildId: str):
+        self.record_call("list_parents")
+        parent_id = next(
+            parent_id
+            for parent_id, children in self._children.items()
+            if ChildId
+            in [child["Id"] for child in children.get("OrganizationalUnits", [])]
+            + [child["Id"] for child in children.get("Accounts", [])]
+        )
+        return {
+            "Parents": [
+                {
+                    "Id": parent_id,
+                    "Type": "ROOT" if parent_id.startswith("r-") else "ORGANIZATIONAL_UNIT",
+                }
+            ]
+        }
+
+
+def stub_organization() -> StubOrganizationsClient:
+    """A small organization with nested OUs, an empty OU and paginated accounts"""
+
+    def account(account_id: str) -> dict:
+        return {
+            "Id": account_id,
+            "Arn": f"arn:aws:organizations::012345678901:account/o-g1h2nv345q/{account_id}",
+            "Email": f"aws{account_id}@example.com",
+            "Name": f"aws{account_id}@example.com",
+            "Status": "ACTIVE",
+        }
+
+    def ou(ou_id: str, name: str) -> dict:
+        return {
+            "Id": ou_id,
+            "Arn": f"arn:aws:organizations::012345678901:ou/o-g1h2nv345q/{ou_id}",
+            "Name": name,
+        }
+
+    root = {
+        "Id": "r-abcd",
+        "Arn": "arn:aws:organizations::012345678901:root/r-abcd",
+        "Name": "Root",
+    }
+
+    children = {
+        "r-abcd": {
+            "Accounts": [account("012345678901")],
+            "OrganizationalUnits": [
+                ou("ou-abcd-dev", "Development"),
+                ou("ou-abcd-prod", "Production"),
+                ou("ou-abcd-empty", "Empty"),
+            ],
+        },
+        "ou-abcd-dev": {
+            "Accounts": [account("123456789012"), account("123456789013")],
+            "OrganizationalUnits": [ou("ou-abcd-devsub", "SubPath")],
+        },
+        "ou-abcd-devsub": {
+            "Accounts": [account("234567890123")],
+        },
+        "ou-abcd-prod": {
+            "Accounts": [account("345678901232"), account("345678901233"), account("345678901234")],
+            "OrganizationalUnits": [ou("ou-abcd-prodsub", "SubPath")],
+        },
+        "ou-abcd-prodsub": {
+            "Accounts": [account("456789012323")],
+        },
+        "ou-abcd-empty": {},
+    }
+
+    return StubOrganizationsClient(root, children)
+
+
+class StubIdentityStoreClient:
+    """In-memory stand-in for the AWS Identity Store client with the given groups by display name"""
+
+    def __init__(self, groups: dict, page_size: int = 2):
+        self._groups = groups
+        self._lock = threading.Lock()
+        self.page_size = page_size
+        self.calls = {}
+
+    def record_call(self, operation_name: str):
+        with self._lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+
+    def get_paginator(self, operation_name: str) -> StubPaginator:
+        return StubPaginator(self, operation_name)
+
+    def list_items(self, operation_name: str, IdentityStoreId: str, Filters: list = None):
+        groups = [
+            {"GroupId": group_id, "DisplayName": display_name, "IdentityStoreId": IdentityStoreId}
+            for display_name, group_id in self._groups.items()
+            if not Filters or display_name == Filters[0]["AttributeValue"]
+        ]
+
+        return "Groups", groups
+
+    def list_groups(self, IdentityStoreId: str, Filters: list = None):
+        self.record_call("list_groups")
+
+        return {"Groups": self.list_items("list_groups", IdentityStoreId, Filters)[1]}
+
+
+class StubSSOAdminClient:
+    """In-memory stand-in for the AWS SSO Admin client with the given permission set ARNs by name.
+
+    Account assignment requests complete after one in progress status poll.
+    """
+
+    def __init__(self, permission_sets: dict, assignments: set = None, page_size: int = 2):
+        self._permission_sets = permission_sets
+        self._requests = {}
+        self._lock = threading.Lock()
+        self.page_size = page_size
+        # (account id, permission set ARN, group id)
+        self.assignments = set(assignments or [])
+        self.calls = {}
+
+    def record_call(self, operation_name: str):
+        with self._lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+
+    def get_paginator(self, operation_name: str) -> StubPaginator:
+        return StubPaginator(self, operation_name)
+
+    def list_items(self, operation_name: str, **kwargs):
+        if operation_name == "list_permission_sets":
+            return "PermissionSets", list(self._permission_sets.values())
+        if operation_name == "list_account_assignments":
+            return "AccountAssignments", [
+                {
+                    "AccountId": account_id,
+                    "PermissionSetArn": permission_set_arn,
+                    "PrincipalType": "GROUP",
+                    "PrincipalId": group_id,
+                }
+                for account_id, permission_set_arn, group_id in sorted(self.assignments)
+                if account_id == kwargs["AccountId"]
+                and permission_set_arn == kwargs["PermissionSetArn"]
+            ]
+        if operation_name == "list_account_assignments_for_principal":
+            return "AccountAssignments", [
+                {
+                    "AccountId": account_id,
+                    "PermissionSetArn": permission_set_arn,
+                    "PrincipalType": "GROUP",
+                    "PrincipalId": group_id,
+                }
+                for account_id, permission_set_arn, group_id in sorted(self.assignments)
+                if group_id == kwargs["PrincipalId"]
+            ]
+        if operation_name == "list_accounts_for_provisioned_permission_set":
+            return "AccountIds", sorted(
+                {
+                    account_id
+                    for account_id, permission_set_arn, _ in self.assignments
+                    if permission_set_arn == kwargs["PermissionSetArn"]
+                }
+            )
+
+        raise NotImplementedError(operation_name)
+
+    def describe_permission_set(self, InstanceArn: str, PermissionSetArn: str):
+        self.record_call("describe_permission_set")
+        name = next(name for name, arn in self._permission_sets.items() if arn == PermissionSetArn)
+        return {"PermissionSet": {"Name": name, "PermissionSetArn": PermissionSetArn}}
+
+    def __request(self, operation_name: str, create: bool, **kwargs) -> dict:
+        self.record_call(operation_name)
+
+        assignment = (kwargs["TargetId"], kwargs["PermissionSetArn"], kwargs["PrincipalId"])
+
+        with self._lock:
+            request_id = f"request-{len(self._requests)}"
+            self._requests[request_id] = (create, assignment, 0)
+
+        return {"RequestId": request_id, "Status": "IN_PROGRESS"}
+
+    def __request_status(self, operation_name: str, request_id: str) -> dict:
+        self.record_call(operation_name)
+
+        with self._lock:
+            create, assignment, polls = self._requests[request_id]
+            self._requests[request_id] = (create, assignment, polls + 1)
+
+            if polls == 0:
+                return {"RequestId": request_id, "Status": "IN_PROGRESS"}
+
+            if create:
+                self.assignments.add(assignment)
+            else:
+                self.assignments.discard(assignment)
+
+        return {"RequestId": request_id, "Status": "SUCCEEDED"}
+
+    def create_account_assignment(self, **kwargs):
+        return {
+            "AccountAssignmentCreationStatus": self.__request(
+                "create_account_assignment", True, **kwargs
+            )
+        }
+
+    def delete_account_assignment(self, **kwargs):
+        return {
+            "AccountAssignmentDeletionStatus": self.__request(
+                "delete_account_assignment", False, **kwargs
+            )
+        }
+
+    def describe_account_assignment_creation_status(
+        self, InstanceArn: str, AccountAssignmentCreationRequestId: str
+    ):
+        return {
+            "AccountAssignmentCreationStatus": self.__request_status(
+                "describe_account_assignment_creation_status", AccountAssignmentCreationRequestId
+            )
+        }
+
+    def describe_account_assignment_deletion_status(
+        self, InstanceArn: str, AccountAssignmentDeletionRequestId: str
+    ):
+        return {
+            "AccountAssignmentDeletionStatus": self.__request_status(
+                "describe_account_assignment_deletion_status", AccountAssignmentDeletionRequestId
+            )
+        }
+
+
+class StubSQSClient:
+    """In-memory stand-in for the Amazon SQS client with messages of (body, sent timestamp)"""
+
+    def __init__(self, messages: list = None, empty_short_polls: int = 0):
+        self.messages = {
+            str(index): {"Body": body, "SentTimestamp": str(int(sent * 1000)), "visible": True}
+            for index, (body, sent) in enumerate(messages or [])
+        }
+        # Short polls sample a subset of the SQS servers and may miss the queued messages
+        self.empty_short_polls = empty_short_polls
+
+    def receive_message(
+        self, QueueUrl, MaxNumberOfMessages, VisibilityTimeout, AttributeNames, WaitTimeSeconds=0
+    ):
+        if WaitTimeSeconds == 0 and self.empty_short_polls > 0:
+            self.empty_short_polls -= 1
+            return {}
+
+        received = []
+
+        for receipt_handle, message in self.messages.items():
+            if message["visible"] and len(received) < MaxNumberOfMessages:
+                message["visible"] = False
+                received.append(
+                    {
+                        "ReceiptHandle": receipt_handle,
+                        "Body": message["Body"],
+                        "Attributes": {"SentTimestamp": message["SentTimestamp"]},
+                    }
+                )
+
+        return {"Messages": received} if received else {}
+
+    def change_message_visibility_batch(self, QueueUrl, Entries):
+        assert len(Entries) <= 10
+        for entry in Entries:
+            self.messages[entry["ReceiptHandle"]]["visible"] = entry["VisibilityTimeout"] == 0
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        assert len(Entries) <= 10
+        for entry in Entries:
+            del self.messages[entry["ReceiptHandle"]]
+
+
+class StubCodePipelineClient:
+    def __init__(self):
+        self.executions = []
+
+    def start_pipeline_execution(self, name):
+        self.executions.append(name)
+        return {"pipelineExecutionId": f"execution-{len(self.executions)}"}
@@ -35,3 +35,94 @@ class TestAccountStructure:
             assert account["Id"] == "123456789012"
             assert account["name_path"] == "/Root/Development"
             assert account["id_path"] == "/r-abcd/ou-abcd-scf1ga23"
+
+    def test_accounts_under(self):
+
+        account_structure = AccountStructure(
+            {
+                "Accounts": [
+                    {"Id": "111111111111", "name_path": "/Root"},
+                    {"Id": "222222222222", "name_path": "/Root/Development"},
+                    {"Id": "333333333333", "name_path": "/Root/Development/SubPath"},
+                    {"Id": "444444444444", "name_path": "/Root/Dev"},
+                    {"Id": "555555555555", "name_path": "/Root/Development"},
+                ]
+            }
+        )
+
+        def ids(accounts):
+            return [account["Id"] for account in accounts]
+
+        assert ids(account_structure.accounts_under("/Root/Development")) == [
+            "222222222222",
+            "555555555555",
+        ]
+
+        # '/Root/Dev' must not match '/Root/Development'
+        assert ids(account_structure.accounts_under("/Root/Dev", recursive=True)) == [
+            "444444444444"
+        ]
+
+        assert ids(account_structure.accounts_under("/Root/Development", recursive=True)) == [
+            "222222222222",
+            "555555555555",
+            "333333333333",
+        ]
+
+        assert len(account_structure.accounts_under("/Root", recursive=True)) == 5
+        assert account_structure.accounts_under("/Root/Production", recursive=True) == []
+        assert account_structure.accounts_under("/Root/Production") == []
+
+    def test_accounts_matching_patterns(self):
+
+        account_structure = AccountStructure(
+            {
+                "Accounts": [
+                    {"Id": "111111111111", "name_path": "/Root/Workloads/TeamA/Prod"},
+                    {"Id": "222222222222", "name_path": "/Root/Workloads/TeamA/Dev"},
+                    {"Id": "333333333333", "name_path": "/Root/Workloads/TeamB/Prod"},
+                    {"Id": "444444444444", "name_path": "/Root/Workloads/Sandbox/Prod"},
+                    {"Id": "555555555555", "name_path": "/Root/Workloads/Sandbox/Prod/Team"},
+                    {"Id": "666666666666", "name_path": "/Root/Security/Prod"},
+                ]
+            }
+        )
+
+        def ids(accounts):
+            return sorted(account["Id"] for account in accounts)
+
+        assert account_structure.match_ou_paths("/Root/*/Prod") == ["/Root/Security/Prod"]
+        assert account_structure.match_ou_paths("/Root/Workloads/Team?") == [
+            "/Root/Workloads/TeamA",
+            "/Root/Workloads/TeamB",
+        ]
+        assert account_structure.match_ou_paths("/Root/**/Prod") == [
+            "/Root/Security/Prod",
+            "/Root/Workloads/Sandbox/Prod",
+            "/Root/Workloads/TeamA/Prod",
+            "/Root/Workloads/TeamB/Prod",
+        ]
+        assert account_structure.match_ou_paths("/Root/Missing/*") == []
+
+        # All Workloads OUs except Sandbox, an excluded OU excludes its sub-OUs too
+        assert ids(
+            account_structure.accounts_matching(
+                "/Root/Workloads/*", recursive=True, exclude=["/Root/Workloads/Sandbox"]
+            )
+        ) == ["111111111111", "222222222222", "333333333333"]
+
+        assert ids(
+            account_structure.accounts_matching("/Root/**/Prod", exclude=["/Root/Security"])
+        ) == ["111111111111", "333333333333", "444444444444"]
+
+        assert ids(
+            account_structure.accounts_matching(
+                "/Root", recursive=True, exclude=["/Root/*/Sandbox/Prod", "/Root/**/Dev"]
+            )
+        ) == ["111111111111", "333333333333", "666666666666"]
+
+        # Exact paths are unchanged, and overlapping matches return each account once
+        assert account_structure.accounts_matching(
+            "/Root/Security/Prod"
+        ) == account_structure.accounts_under("/Root/Security/Prod")
+        assert len(account_structure.accounts_matching("/Root/**", recursive=True)) == 6
@@ -0,0 +1,135 @@
+from sso.account_structure import AccountStructure
+from sso.assignment_audit import audit_assignments, plan_desired_assignments
+from sso.assignment_plan import Assignment
+from sso.group_mappings import GroupMappings
+from tests.unit.stubs import StubSSOAdminClient
+
+INSTANCE_ARN = "arn:aws:sso:::instance/ssoins-1234567890abcdef"
+
+account_structure = AccountStructure(
+    {
+        "Accounts": [
+            {"Id": f"{index:012d}", "name_path": "/Root/Development" if index % 2 else "/Root"}
+            for index in range(20)
+        ]
+    }
+)
+
+group_mappings = GroupMappings(
+    "PR_AWS_SSO_",
+    {
+        "sso_group_mappings": [
+            {"group_id": "view-group-id", "group_name": "PR_AWS_SSO_View"},
+            {"group_id": "power-group-id", "group_name": "PR_AWS_SSO_Power"},
+        ]
+    },
+)
+
+stages = [
+    {
+        "name": "General",
+        "permission_sets": [
+            {
+                "permission_set_name": "View",
+                "ou_assignments": [{"path": "/Root", "recursive": True}],
+                "group_assignments": [{"name": "View"}],
+            },
+            {
+                "permission_set_name": "Power",
+                "ou_assignments": [{"path": "/Root/Development"}],
+                "group_assignments": [{"name": "Power"}],
+            },
+        ],
+    },
+    {
+        "name": "Admin",
+        "permission_sets": [
+            {
+                "permission_set_name": "Admin",
+                "account_assignments": ["000000000000"],
+                "group_assignments": [{"name": "Power"}],
+            },
+        ],
+    },
+]
+
+permission_set_arns = {"View": "arn:view", "Power": "arn:power"}
+
+
+def live_assignments(desired):
+    return {
+        (
+            assignment.account_id,
+            permission_set_arns[assignment.permission_set_name],
+            assignment.group_id,
+        )
+        for assignment in desired
+        if assignment.permission_set_name in permission_set_arns
+    }
+
+
+def test_audit_assignments_in_sync():
+
+    desired = plan_desired_assignments(stages, account_structure, group_mappings)
+    assert len(desired) == 31
+
+    sso_admin_client = StubSSOAdminClient(
+        {"dev-View": "arn:view", "dev-Power": "arn:power", "prod-View": "arn:prod-view"},
+        assignments=live_assignments(desired),
+    )
+
+    audit = audit_assignments(
+        sso_admin_client, INSTANCE_ARN, "dev", desired, group_mappings, parallelism=4
+    )
+
+    assert audit["missing"] == [
+        Assignment("Admin", "000000000000", "Power", "power-group-id")._asdict()
+    ]
+    assert audit["unexpected"] == []
+    assert audit["permission_sets_not_deployed"] == ["Admin"]
+    assert audit["summary"] == {
+        "desired": 31,
+        "actual": 30,
+        "missing": 1,
+        "unexpected": 0,
+        "targets_checked": 30,
+    }
+
+
+def test_audit_assignments_drift():
+
+    desired = plan_desired_assignments(stages[:1], account_structure, group_mappings)
+
+    live = live_assignments(desired)
+    # Lost after a failed rollback
+    live.discard(("000000000001", "arn:power", "power-group-id"))
+    # Added by hand, also to an account without desired assignments of the permission set
+    live.add(("000000000002", "arn:view", "power-group-id"))
+    live.add(("000000000004", "arn:power", "unknown-group-id"))
+
+    sso_admin_client = StubSSOAdminClient(
+        {"dev-View": "arn:view", "dev-Power": "arn:power"}, assignments=live
+    )
+
+    audit = audit_assignments(sso_admin_client, INSTANCE_ARN, "dev", desired, group_mappings)
+
+    assert audit["missing"] == [
+        Assignment("Power", "000000000001", "Power", "power-group-id")._asdict()
+    ]
+    assert audit["unexpected"] == [
+        {
+            "permission_set_name": "Power",
+            "account_id": "000000000004",
+            "principal_type": "GROUP",
+            "principal_id": "unknown-group-id",
+            "group_name": None,
+        },
+        {
+            "permission_set_name": "View",
+            "account_id": "000000000002",
+            "principal_type": "GROUP",
+            "principal_id": "power-group-id",
+            "group_name": "Power",
+        },
+    ]
+    assert audit["summary"]["targets_checked"] == 31
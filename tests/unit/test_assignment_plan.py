@@ -0,0 +1,156 @@
+import pytest
+
+from sso.account_structure import AccountStructure
+from sso.assignment_plan import plan_assignments, plan_hash, resolve_permission_set_assignments
+from sso.group_mappings import GroupMappings, UnresolvedGroupsError
+
+account_structure = AccountStructure(
+    {
+        "Accounts": [
+            {"Id": "123456789012", "name_path": "/Root/Development"},
+            {"Id": "234567890123", "name_path": "/Root/Development/SubPath"},
+            {"Id": "345678901232", "name_path": "/Root/Production"},
+        ]
+    }
+)
+
+group_mappings = GroupMappings(
+    "PR_AWS_SSO_",
+    {
+        "sso_group_mappings": [
+            {"group_id": "development-group-id", "group_name": "PR_AWS_SSO_Development"},
+            {"group_id": "audit-group-id", "group_name": "PR_AWS_SSO_Audit"},
+        ]
+    },
+)
+
+
+def test_resolve_permission_set_assignments_deduplicates():
+
+    permission_set = {
+        "permission_set_name": "PermissionSetDevelopment",
+        "ou_assignments": [
+            {"path": "/Root/Development", "recursive": True},
+            {"path": "/Root/Development"},
+        ],
+        "account_assignments": ["123456789012", "345678901232"],
+        "group_assignments": [{"name": "Development"}],
+    }
+
+    assignments = resolve_permission_set_assignments(permission_set, account_structure)
+
+    assert assignments == [
+        ("123456789012", "Development"),
+        ("234567890123", "Development"),
+        ("345678901232", "Development"),
+    ]
+
+
+@pytest.mark.parametrize("path", ["Root/Development", "/Root/Development/"])
+def test_resolve_permission_set_assignments_invalid_path(path):
+
+    with pytest.raises(ValueError):
+        resolve_permission_set_assignments(
+            {
+                "permission_set_name": "PermissionSetDevelopment",
+                "ou_assignments": [{"path": path}],
+                "group_assignments": [{"name": "Development"}],
+            },
+            account_structure,
+        )
+
+
+def test_resolve_permission_set_assignments_patterns():
+
+    permission_set = {
+        "permission_set_name": "PermissionSetDevelopment",
+        "ou_assignments": [
+            {"path": "/Root/*", "recursive": True, "exclude": ["/Root/Development/SubPath"]}
+        ],
+        "group_assignments": [{"name": "Development"}],
+    }
+
+    assert resolve_permission_set_assignments(permission_set, account_structure) == [
+        ("123456789012", "Development"),
+        ("345678901232", "Development"),
+    ]
+
+
+def test_plan_assignments():
+
+    permission_sets = [
+        {
+            "permission_set_name": "PermissionSetDevelopment",
+            "ou_assignments": [{"path": "/Root/Development"}],
+            "group_assignments": [{"name": "Development"}, {"name": "Audit"}],
+        },
+        {
+            "permission_set_name": "PermissionSetAudit",
+            "ou_assignments": [{"path": "/Root", "recursive": True}],
+            "group_assignments": [{"name": "Audit"}],
+        },
+    ]
+
+    assignments = plan_assignments(permission_sets, account_structure, group_mappings)
+
+    # De-duplicated and sorted by account and group within permission set order
+    assert assignments == [
+        ("PermissionSetDevelopment", "123456789012", "Audit", "audit-group-id"),
+        ("PermissionSetDevelopment", "123456789012", "Development", "development-group-id"),
+        ("PermissionSetAudit", "123456789012", "Audit", "audit-group-id"),
+        ("PermissionSetAudit", "234567890123", "Audit", "audit-group-id"),
+        ("PermissionSetAudit", "345678901232", "Audit", "audit-group-id"),
+    ]
+    assert assignments[0].group_id == "audit-group-id"
+
+
+def test_plan_assignments_reports_all_unresolved_groups():
+
+    permission_sets = [
+        {
+            "permission_set_name": "PermissionSetDevelopment",
+            "ou_assignments": [{"path": "/Root/Development"}],
+            "group_assignments": [{"name": "Development"}, {"name": "Sandbox"}],
+        },
+        {
+            "permission_set_name": "PermissionSetAudit",
+            "account_assignments": ["345678901232"],
+            "group_assignments": [{"name": "Security"}, {"name": "Audit"}],
+        },
+    ]
+
+    with pytest.raises(UnresolvedGroupsError) as error:
+        plan_assignments(permission_sets, account_structure, group_mappings)
+
+    assert error.value.group_names == ["Sandbox", "Security"]
+
+
+def test_plan_hash():
+
+    properties = {"env_name": "dev", "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1"}
+
+    permission_sets = [
+        {
+            "permission_set_name": "PermissionSetDevelopment",
+            "ou_assignments": [{"path": "/Root/Development", "recursive": True}],
+            "group_assignments": [{"name": "Development"}],
+        }
+    ]
+
+    assignments = plan_assignments(permission_sets, account_structure, group_mappings)
+
+    assert plan_hash(permission_sets, assignments, properties) == plan_hash(
+        permission_sets, list(reversed(assignments)), properties
+    )
+    assert plan_hash(permission_sets, assignments, properties) != plan_hash(
+        permission_sets, assignments[:1], properties
+    )
+    assert plan_hash(permission_sets, assignments, properties) != plan_hash(
+        permission_sets, assignments, dict(properties, env_name="prod")
+    )
+    assert plan_hash(permission_sets, assignments, properties) == plan_hash(
+        permission_sets, assignments, dict(properties, assignment_emitter="template")
+    )
+    assert plan_hash(permission_sets, assignments, properties) != plan_hash(
+        permission_sets, assignments, dict(properties, assignment_emitter="batched")
+    )
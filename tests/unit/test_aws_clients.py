@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from botocore.exceptions import ClientError
+
+from utility import aws_clients
+from utility.aws_clients import ClientFactory, TokenBucket
+
+
+class StubOrganizationsHandler(BaseHTTPRequestHandler):
+    """Local AWS Organizations (JSON protocol) endpoint that throttles the first requests"""
+
+    throttles = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+
+        if StubOrganizationsHandler.throttles > 0:
+            StubOrganizationsHandler.throttles -= 1
+            status, body = 400, {"__type": "TooManyRequestsException", "Message": "Slow down"}
+        else:
+            status, body = 200, {
+                "Roots": [{"Id": "r-abcd", "Name": "Root", "Arn": "arn:aws:organizations::1:root"}]
+            }
+
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def organizations_endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOrganizationsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_token_bucket_waits_beyond_burst(monkeypatch):
+
+    sleeps = []
+    monkeypatch.setattr(aws_clients.time, "sleep", sleeps.append)
+
+    bucket = TokenBucket(rate=10.0, burst=2)
+
+    for _ in range(4):
+        bucket.acquire()
+
+    # The burst is taken immediately, the next requests wait for 1/rate second each
+    assert len(sleeps) == 2
+    assert sleeps[0] == pytest.approx(0.1, abs=0.01)
+    assert sleeps[1] == pytest.approx(0.2, abs=0.01)
+
+
+def test_client_factory_counts_calls_retries_and_throttles(organizations_endpoint, monkeypatch):
+
+    # Don't wait for the retry backoff
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    StubOrganizationsHandler.throttles = 2
+
+    factory = ClientFactory(max_workers=4, retry_mode="standard")
+
+    clients = [
+        factory.client(
+            "organizations",
+            region_name="us-east-1",
+            endpoint_url=organizations_endpoint,
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+        for _ in range(2)
+    ]
+
+    for client in clients:
+        assert client.list_roots()["Roots"][0]["Id"] == "r-abcd"
+
+    # Clients of the same service share their token bucket and metrics
+    assert len(factory.token_buckets) == 1
+    assert factory.metrics_summary() == {
+        "organizations": {"calls": 2, "retries": 2, "throttles": 2}
+    }
+
+
+@pytest.mark.parametrize("retry_mode", ["standard", "adaptive"])
+def test_with_backoff_does_not_retry_client_retries(
+    organizations_endpoint, monkeypatch, retry_mode
+):
+
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    StubOrganizationsHandler.throttles = 100
+
+    factory = ClientFactory(max_workers=1, retry_mode="standard", max_attempts=3)
+    client = factory.client(
+        "organizations",
+        region_name="us-east-1",
+        endpoint_url=organizations_endpoint,
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+
+    # The client's own retries (3 after the first attempt) are exhausted, so the throttling error
+    # isn't retried again
+    with pytest.raises(ClientError, match="TooManyRequestsException"):
+        aws_clients.with_backoff(client.list_roots)
+
+    assert factory.metrics_summary()["organizations"] == {
+        "calls": 1,
+        "retries": 3,
+        "throttles": 4,
+    }
+
+    StubOrganizationsHandler.throttles = 0
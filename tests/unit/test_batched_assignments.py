@@ -0,0 +1,146 @@
+import pytest
+
+from sso import batched_assignments, sso_admin
+from sso.assignment_plan import Assignment
+from tests.unit.stubs import StubSSOAdminClient
+
+INSTANCE_ARN = "arn:aws:sso:::instance/ssoins-1234567890abcdef"
+
+
+@pytest.fixture(autouse=True)
+def no_poll_sleep(monkeypatch):
+    monkeypatch.setattr(sso_admin.time, "sleep", lambda seconds: None)
+
+
+def properties(pairs, permission_set_arn="arn:view"):
+    return {
+        "ServiceToken": "arn:aws:lambda:eu-west-1:123456789012:function:provider",
+        "InstanceArn": INSTANCE_ARN,
+        "PermissionSetArn": permission_set_arn,
+        "Assignments": batched_assignments.encode_assignments(
+            Assignment("View", account_id, "", group_id) for account_id, group_id in pairs
+        ),
+    }
+
+
+def test_encode_decode_assignments():
+
+    pairs = {("200000000000", "group-b"), ("100000000000", "group-b"), ("100000000000", "group-a")}
+
+    assert properties(pairs)["Assignments"] == {
+        "group-a": "100000000000",
+        "group-b": "100000000000,200000000000",
+    }
+    assert batched_assignments.decode_assignments(properties(pairs)) == pairs
+    assert batched_assignments.decode_assignments(properties([])) == set()
+
+
+def apply_event(event: dict, sso_admin_client, **kwargs) -> dict:
+    """Apply an event like the provider framework: on_event and then the completion handler
+    until it's complete
+    """
+
+    response = batched_assignments.handle_event(event)
+    event = dict(event, **response)
+
+    for invocation in range(1, 100):
+        result = batched_assignments.handle_is_complete(event, sso_admin_client, **kwargs)
+        if result["IsComplete"]:
+            return dict(response, invocations=invocation, **result)
+
+
+def test_handle_event_applies_only_the_delta():
+
+    sso_admin_client = StubSSOAdminClient({"dev-View": "arn:view"})
+    old = {(f"{100000000000 + i}", "view-group-id") for i in range(50)}
+
+    response = apply_event(
+        {"RequestType": "Create", "ResourceProperties": properties(old)}, sso_admin_client
+    )
+
+    assert response["PhysicalResourceId"] == "arn:view/assignments"
+    assert response["Data"] == {"Assignments": "50"}
+    assert sso_admin_client.assignments == {(account, "arn:view", group) for account, group in old}
+
+    # Move 5 accounts to another group and add 3 accounts
+    new = (
+        {pair for pair in old if not pair[0].endswith(("0", "5"))}
+        | {(f"{100000000000 + i}", "power-group-id") for i in range(0, 50, 10)}
+        | {(f"{200000000000 + i}", "view-group-id") for i in range(3)}
+    )
+    sso_admin_client.calls = {}
+
+    apply_event(
+        {
+            "RequestType": "Update",
+            "PhysicalResourceId": response["PhysicalResourceId"],
+            "ResourceProperties": properties(new),
+            "OldResourceProperties": properties(old),
+        },
+        sso_admin_client,
+        parallelism=4,
+    )
+
+    assert sso_admin_client.assignments == {(account, "arn:view", group) for account, group in new}
+    assert sso_admin_client.calls["create_account_assignment"] == 5 + 3
+    assert sso_admin_client.calls["delete_account_assignment"] == 10
+
+    apply_event(
+        {
+            "RequestType": "Delete",
+            "PhysicalResourceId": response["PhysicalResourceId"],
+            "ResourceProperties": properties(new),
+        },
+        sso_admin_client,
+    )
+
+    assert sso_admin_client.assignments == set()
+
+
+def test_handle_is_complete_applies_in_batches():
+
+    sso_admin_client = StubSSOAdminClient({"dev-View": "arn:view"})
+    old = {(f"{100000000000 + i}", "view-group-id") for i in range(10)}
+    new = {(f"{200000000000 + i}", "view-group-id") for i in range(25)}
+
+    apply_event({"RequestType": "Create", "ResourceProperties": properties(old)}, sso_admin_client)
+    sso_admin_client.calls = {}
+
+    response = apply_event(
+        {
+            "RequestType": "Update",
+            "PhysicalResourceId": "arn:view/assignments",
+            "ResourceProperties": properties(new),
+            "OldResourceProperties": properties(old),
+        },
+        sso_admin_client,
+        max_requests=10,
+    )
+
+    # Three invocations create the 25 new assignments, then one deletes the 10 old ones
+    assert response["invocations"] == 4
+    assert sso_admin_client.assignments == {(account, "arn:view", group) for account, group in new}
+    assert sso_admin_client.calls["create_account_assignment"] == 25
+    assert sso_admin_client.calls["delete_account_assignment"] == 10
+
+
+def test_handle_event_replaced_permission_set():
+
+    pairs = {("100000000000", "view-group-id")}
+    sso_admin_client = StubSSOAdminClient(
+        {"dev-View": "arn:view-new"}, assignments={("100000000000", "arn:view", "view-group-id")}
+    )
+
+    response = apply_event(
+        {
+            "RequestType": "Update",
+            "ResourceProperties": properties(pairs, "arn:view-new"),
+            "OldResourceProperties": properties(pairs),
+        },
+        sso_admin_client,
+    )
+
+    # CloudFormation deletes the old physical resource (and its assignments) afterwards
+    assert response["PhysicalResourceId"] == "arn:view-new/assignments"
+    assert ("100000000000", "arn:view-new", "view-group-id") in sso_admin_client.assignments
+    assert "delete_account_assignment" not in sso_admin_client.calls
@@ -0,0 +1,182 @@
+from sso.config_validation import validate_permission_sets_config
+from utility.file_helpers import file_read_yaml
+
+
+def test_repository_config_is_valid():
+
+    config = file_read_yaml("config/sso-permission-sets.yaml")
+
+    assert validate_permission_sets_config(config, "dev") == []
+
+
+def test_reports_all_errors(tmp_path):
+
+    policy_file = tmp_path / "policy.json"
+    policy_file.write_text("{not json")
+
+    config = {
+        "stages": [
+            {
+                "name": "General",
+                "permission_sets": [
+                    {
+                        "permission_set_name": "ViewAccess",
+                        "session_duration": "4 hours",
+                        "aws_managed_policies": ["ViewOnlyAccess"],
+                        "inline_policy_document_file": str(policy_file),
+                        "ou_assignments": [{"path": "/Root/Development/", "recursve": True}],
+                        "account_assignments": [123456789012, "12345"],
+                    },
+                    {
+                        "permission_set_name": "ViewAccess",
+                        "inline_policy_document_file": str(tmp_path / "missing.json"),
+                        "ou_assignments": [{"path": "Root//Production", "recursive": "yes"}],
+                        "group_assignments": [{"name": "View"}, "Audit"],
+                    },
+                ],
+            },
+            {
+                "name": "General",
+                "depends_on": ["Admin"],
+                "deployment_wave_size": 0,
+                "permission_sets": [
+                    {
+                        "permission_set_name": "AdministratorAccessForAllAccounts",
+                        "session_duration": "PT13H",
+                        "group_assignments": [],
+                    }
+                ],
+            },
+        ]
+    }
+
+    errors = validate_permission_sets_config(config, "prod")
+    first = "stages[0](General).permission_sets[0]"
+    second = "stages[0](General).permission_sets[1]"
+
+    assert errors[:6] == [
+        f"{first}.group_assignments: is required",
+        f"{first}.session_duration: must be an ISO-8601 duration of hours and minutes,"
+        " e.g. PT04H",
+        f"{first}.aws_managed_policies[0]: not an AWS managed policy ARN: ViewOnlyAccess",
+        f"{first}.inline_policy_document_file: Policy document {policy_file} is not valid JSON:"
+        " Expecting property name enclosed in double quotes: line 1 column 2 (char 1)",
+        f"{first}.ou_assignments[0].recursve: unknown field",
+        f"{first}.ou_assignments[0].path: OU path must not end with a /: /Root/Development/",
+    ]
+    assert errors[6:8] == [
+        f"{first}.account_assignments[0]: account id 123456789012 must be a quoted string",
+        f"{first}.account_assignments[1]: account id must be 12 digits: 12345",
+    ]
+    assert errors[8].startswith(f"{second}.inline_policy_document_file: [Errno 2]")
+    assert errors[9:] == [
+        f"{second}.ou_assignments[0].recursive: expected bool, got str",
+        f"{second}.ou_assignments[0].path: OU path must start with a /: Root//Production",
+        f"{second}.group_assignments[1]: must be a mapping",
+        f"{second}.permission_set_name: duplicate permission set name ViewAccess, also in {first}",
+        "stages[1](General).name: duplicate stage name: General",
+        "stages[1](General).depends_on: Admin isn't a stage defined before it",
+        "stages[1](General).deployment_wave_size: must be positive",
+        "stages[1](General).permission_sets[0].permission_set_name:"
+        " prod-AdministratorAccessForAllAccounts is longer than 32 characters",
+        "stages[1](General).permission_sets[0].session_duration:"
+        " must be between 1 and 12 hours: PT13H",
+        "stages[1](General).permission_sets[0].group_assignments: must not be empty",
+    ]
+
+
+def test_invalid_structure():
+
+    assert validate_permission_sets_config(None) == ["stages: is required and must be a list"]
+    assert validate_permission_sets_config({"stages": []}) == ["stages: must not be empty"]
+    assert validate_permission_sets_config({"stages": [{"name": 1, "wave": True}]}) == [
+        "stages[0].name: expected str, got int",
+        "stages[0].permission_sets: is required",
+        "stages[0].wave: expected int, got bool",
+    ]
+    assert validate_permission_sets_config(
+        {"stages": [{"name": "General", "permission_sets": [], "depends_on": [["Admin"], 1]}]}
+    ) == [
+        "stages[0](General).depends_on[0]: expected str, got list",
+        "stages[0](General).depends_on[1]: expected str, got int",
+        "stages[0](General).permission_sets: must not be empty",
+    ]
+
+
+def test_empty_optional_lists():
+
+    # An empty YAML key, e.g. `account_assignments:`, is loaded as None
+    config = {
+        "stages": [
+            {
+                "name": "General",
+                "depends_on": None,
+                "permission_sets": [
+                    {
+                        "permission_set_name": "View",
+                        "aws_managed_policies": None,
+                        "ou_assignments": [{"path": "/Root", "exclude": None}],
+                        "account_assignments": None,
+                        "group_assignments": [{"name": "View"}],
+                    }
+                ],
+            }
+        ]
+    }
+
+    assert validate_permission_sets_config(config, "dev") == []
+    assert validate_permission_sets_config(
+        {"stages": [{"name": "General", "permission_sets": None}]}
+    ) == ["stages[0].permission_sets: expected list, got NoneType"]
+
+
+def test_ou_path_patterns():
+
+    def ou_assignment_errors(ou_assignment):
+        return validate_permission_sets_config(
+            {
+                "stages": [
+                    {
+                        "name": "General",
+                        "permission_sets": [
+                            {
+                                "permission_set_name": "View",
+                                "ou_assignments": [ou_assignment],
+                                "group_assignments": [{"name": "View"}],
+                            }
+                        ],
+                    }
+                ]
+            }
+        )
+
+    location = "stages[0](General).permission_sets[0].ou_assignments[0]"
+
+    assert ou_assignment_errors({"path": "/Root/**/Prod*", "exclude": ["/Root/*/Sandbox"]}) == []
+    assert ou_assignment_errors({"path": "/Root/Work**", "exclude": ["Sandbox", 1]}) == [
+        f"{location}.path: ** must be a whole OU path segment: /Root/Work**",
+        f"{location}.exclude[0]: OU path must start with a /: Sandbox",
+        f"{location}.exclude[1]: expected str, got int",
+    ]
+
+
+def test_stage_names_collide_without_special_characters():
+
+    def stage(name):
+        return {
+            "name": name,
+            "permission_sets": [
+                {"permission_set_name": name, "group_assignments": [{"name": "V"}]}
+            ],
+        }
+
+    config = {"stages": [stage(name) for name in ["General", "Dev-Ops", "DevOps", "Dev_Ops", "1"]]}
+
+    assert validate_permission_sets_config(config, "dev") == [
+        "stages[2](DevOps).name: the construct id SSOStageDevOps of the stage collides with"
+        " stages[1](Dev-Ops)",
+        "stages[3](Dev_Ops).name: the construct id SSOStageDevOps of the stage collides with"
+        " stages[1](Dev-Ops)",
+        "stages[4](1).name: the stack name sso-permission-sets-dev-1 of the stage collides with"
+        " stages[0](General)",
+    ]
@@ -0,0 +1,152 @@
+import json
+
+from tests.unit.stubs import StubCodePipelineClient, StubSQSClient
+from utility import event_coalescer
+from utility.snapshot_store import LocalSnapshotStore
+
+NOW = 1_700_000_000.0
+
+
+def register_ou_event(ou_id: str) -> dict:
+    return {
+        "source": "aws.controltower",
+        "detail-type": "AWS Service Event via CloudTrail",
+        "detail": {
+            "eventName": "RegisterOrganizationalUnit",
+            "serviceEventDetails": {
+                "registerOrganizationalUnitStatus": {
+                    "organizationalUnit": {"organizationalUnitId": ou_id},
+                    "state": "SUCCEEDED",
+                }
+            },
+        },
+    }
+
+
+def create_account_event(account_id: str, ou_id: str) -> dict:
+    return {
+        "source": "aws.controltower",
+        "detail-type": "AWS Service Event via CloudTrail",
+        "detail": {
+            "eventName": "CreateManagedAccount",
+            "serviceEventDetails": {
+                "createManagedAccountStatus": {
+                    "organizationalUnit": {"organizationalUnitId": ou_id},
+                    "account": {"accountId": account_id},
+                    "state": "SUCCEEDED",
+                }
+            },
+        },
+    }
+
+
+def burst(count: int, last_sent: float) -> list:
+    """A burst of account creation events, one per second up to last_sent"""
+
+    return [
+        (
+            json.dumps(create_account_event(f"{index:012d}", f"ou-abcd-{index % 3}")),
+            last_sent - count + 1 + index,
+        )
+        for index in range(count)
+    ]
+
+
+def coalesce(sqs_client, cp_client, store, now=NOW):
+    return event_coalescer.coalesce_events(
+        sqs_client,
+        "queue-url",
+        cp_client,
+        "pipeline",
+        store,
+        quiet_window_seconds=300,
+        max_wait_seconds=1800,
+        now=now,
+    )
+
+
+def test_affected_accounts_and_ous():
+
+    assert event_coalescer.affected_accounts_and_ous(
+        [
+            create_account_event("123456789012", "ou-abcd-dev"),
+            create_account_event("123456789012", "ou-abcd-dev"),
+            register_ou_event("ou-abcd-prod"),
+            {"detail": {}},
+        ]
+    ) == {"accounts": ["123456789012"], "ous": ["ou-abcd-dev", "ou-abcd-prod"]}
+
+
+def test_coalesce_events_waits_for_quiet_window(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+    sqs_client = StubSQSClient(burst(25, last_sent=NOW - 60))
+    cp_client = StubCodePipelineClient()
+
+    # The last event is only a minute old, so the events stay queued
+    assert coalesce(sqs_client, cp_client, store) is None
+    assert cp_client.executions == []
+    assert len(sqs_client.messages) == 25
+    assert all(message["visible"] for message in sqs_client.messages.values())
+
+    # Once quiet, the whole burst starts a single execution
+    affected = coalesce(sqs_client, cp_client, store, now=NOW + 300)
+
+    assert cp_client.executions == ["pipeline"]
+    assert affected["ous"] == ["ou-abcd-0", "ou-abcd-1", "ou-abcd-2"]
+    assert len(affected["accounts"]) == 25
+    assert sqs_client.messages == {}
+
+    pending = event_coalescer.pending_lifecycle_events(store, "org")
+    assert len(pending.events) == 25
+
+    # Nothing left to coalesce
+    assert coalesce(sqs_client, cp_client, store, now=NOW + 360) is None
+    assert cp_client.executions == ["pipeline"]
+
+
+def test_receive_all_messages_long_polls():
+
+    sqs_client = StubSQSClient(burst(3, last_sent=NOW - 60), empty_short_polls=1)
+
+    assert len(event_coalescer.receive_all_messages(sqs_client, "queue")) == 3
+
+
+def test_coalesce_events_max_wait(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+    cp_client = StubCodePipelineClient()
+
+    # A continuous burst still triggers once its oldest event waited for the maximum
+    sqs_client = StubSQSClient(burst(3, last_sent=NOW - 10) + [("{}", NOW - 1800)])
+
+    assert coalesce(sqs_client, cp_client, store) is not None
+    assert cp_client.executions == ["pipeline"]
+
+
+def test_pending_lifecycle_events(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+    name = event_coalescer.LIFECYCLE_EVENTS_SNAPSHOT_NAME
+
+    assert event_coalescer.pending_lifecycle_events(store, "org") == ([], [])
+
+    first = store.append(name, {"events": [register_ou_event("ou-abcd-dev")]})
+    store.put("org", {"ous": {}})
+
+    # A second burst before the first batch is consumed doesn't replace it
+    second = store.append(name, {"events": [register_ou_event("ou-abcd-prod")]})
+
+    pending = event_coalescer.pending_lifecycle_events(store, "org")
+    assert pending.events == [register_ou_event("ou-abcd-dev"), register_ou_event("ou-abcd-prod")]
+    assert pending.batch_versions == [first.version, second.version]
+
+    # Storing the org snapshot without the consumed batches (e.g. a run with an event file)
+    # doesn't consume them, whatever its creation time
+    store.put("org", {"ous": {}, "full_refresh": "later"})
+    assert len(event_coalescer.pending_lifecycle_events(store, "org").events) == 2
+
+    store.put("org", {"ous": {}, event_coalescer.CONSUMED_EVENT_BATCHES_KEY: [first.version]})
+    assert event_coalescer.pending_lifecycle_events(store, "org").events == [
+        register_ou_event("ou-abcd-prod")
+    ]
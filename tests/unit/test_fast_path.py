@@ -0,0 +1,229 @@
+import pytest
+
+from sso import fast_path, sso_admin
+from sso.assignment_plan import Assignment
+from sso.group_mappings import GroupMappings
+from tests.unit.stubs import StubSSOAdminClient, stub_organization
+from utility.snapshot_store import LocalSnapshotStore
+
+INSTANCE_ARN = "arn:aws:sso:::instance/ssoins-1234567890abcdef"
+
+config = {
+    "env_name": "dev",
+    "sso_instance_arn": INSTANCE_ARN,
+    "group_prefix": "PR_AWS_SSO_",
+    "group_mappings": {
+        "sso_group_mappings": [
+            {"group_id": "view-group-id", "group_name": "PR_AWS_SSO_View"},
+            {"group_id": "power-group-id", "group_name": "PR_AWS_SSO_Power"},
+        ]
+    },
+    "stages": [
+        {
+            "name": "General",
+            "permission_sets": [
+                {
+                    "permission_set_name": "View",
+                    "ou_assignments": [{"path": "/Root", "recursive": True}],
+                    "group_assignments": [{"name": "View"}],
+                },
+                {
+                    "permission_set_name": "Power",
+                    "ou_assignments": [{"path": "/Root/Development"}],
+                    "group_assignments": [{"name": "Power"}],
+                },
+                {
+                    "permission_set_name": "Production",
+                    "ou_assignments": [{"path": "/Root/Production", "recursive": True}],
+                    "group_assignments": [{"name": "Power"}],
+                },
+            ],
+        }
+    ],
+}
+
+
+def create_managed_account_event(account_id: str, ou_id: str, state: str = "SUCCEEDED") -> dict:
+    return {
+        "source": "aws.controltower",
+        "detail-type": "AWS Service Event via CloudTrail",
+        "detail": {
+            "eventName": "CreateManagedAccount",
+            "serviceEventDetails": {
+                "createManagedAccountStatus": {
+                    "organizationalUnit": {
+                        "organizationalUnitName": "SubPath",
+                        "organizationalUnitId": ou_id,
+                    },
+                    "account": {"accountName": "New", "accountId": account_id},
+                    "state": state,
+                }
+            },
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def no_poll_sleep(monkeypatch):
+    monkeypatch.setattr(sso_admin.time, "sleep", lambda seconds: None)
+
+
+def test_lifecycle_event_account():
+
+    assert fast_path.lifecycle_event_account(
+        create_managed_account_event("999999999999", "ou-abcd-devsub")
+    ) == ("999999999999", "ou-abcd-devsub")
+
+    assert (
+        fast_path.lifecycle_event_account(
+            create_managed_account_event("999999999999", "ou-abcd-devsub", state="FAILED")
+        )
+        is None
+    )
+    assert fast_path.lifecycle_event_account({"detail": {}}) is None
+
+
+def test_ou_name_path():
+
+    assert (
+        fast_path.ou_name_path(stub_organization(), "ou-abcd-devsub") == "/Root/Development/SubPath"
+    )
+    assert fast_path.ou_name_path(stub_organization(), "r-abcd") == "/Root"
+
+
+def test_reconcile_account_creates_records_and_releases(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+
+    # The View assignment exists already and Production isn't deployed yet
+    sso_admin_client = StubSSOAdminClient(
+        {"dev-View": "arn:view", "dev-Power": "arn:power", "other-View": "arn:other"},
+        assignments={("123456789012", "arn:view", "view-group-id")},
+    )
+
+    created = fast_path.reconcile_account(
+        config,
+        "123456789012",
+        "ou-abcd-dev",
+        org_client=stub_organization(),
+        sso_admin_client=sso_admin_client,
+        store=store,
+    )
+
+    assert created == [Assignment("Power", "123456789012", "Power", "power-group-id")]
+    assert ("123456789012", "arn:power", "power-group-id") in sso_admin_client.assignments
+
+    recorded = fast_path.recorded_fast_path_assignments(store)
+    assert recorded == created
+
+    # Another stage doesn't create the assignment
+    assert (
+        fast_path.release_fast_path_assignments(
+            sso_admin_client, INSTANCE_ARN, "dev", store, [stage_template("View", "view-group-id")]
+        )
+        == []
+    )
+    assert fast_path.recorded_fast_path_assignments(store) == recorded
+
+    released = fast_path.release_fast_path_assignments(
+        sso_admin_client, INSTANCE_ARN, "dev", store, [stage_template("Power", "power-group-id")]
+    )
+
+    assert released == created
+    assert sso_admin_client.assignments == {("123456789012", "arn:view", "view-group-id")}
+    assert fast_path.recorded_fast_path_assignments(store) == []
+
+
+def stage_template(permission_set_name: str, group_id: str) -> dict:
+    return {
+        "Resources": {
+            permission_set_name: {"Type": "AWS::SSO::PermissionSet"},
+            f"{permission_set_name}123456789012": {
+                "Type": "AWS::SSO::Assignment",
+                "Properties": {
+                    "PermissionSetArn": {"Fn::GetAtt": [permission_set_name, "PermissionSetArn"]},
+                    "PrincipalId": group_id,
+                    "TargetId": "123456789012",
+                },
+            },
+        }
+    }
+
+
+def test_release_keeps_other_and_concurrently_recorded_assignments(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+    view = Assignment("View", "123456789012", "View", "view-group-id")
+    power = Assignment("Power", "210987654321", "Power", "power-group-id")
+    fast_path.record_fast_path_assignments(store, [view, power])
+
+    sso_admin_client = StubSSOAdminClient(
+        {"dev-View": "arn:view", "dev-Power": "arn:power"},
+        assignments={
+            ("123456789012", "arn:view", "view-group-id"),
+            ("210987654321", "arn:power", "power-group-id"),
+        },
+    )
+
+    # The reconciler records an assignment while the stage's assignments are released
+    created = Assignment("View", "345678901234", "View", "view-group-id")
+    delete_account_assignment = fast_path.delete_account_assignment
+
+    def delete_and_record(*args):
+        delete_account_assignment(*args)
+        fast_path.record_fast_path_assignments(store, [created])
+
+    templates = [
+        {
+            "Resources": {
+                "ViewAssignments": {
+                    "Type": "Custom::SSOAssignments",
+                    "Properties": {
+                        "PermissionSetArn": {
+                            "Fn::ImportValue": "sso-permission-sets-dev:ExportsOutputFnGetAtt"
+                            "ViewPermissionSetArn0A1B2C3D"
+                        },
+                        "Assignments": {"view-group-id": "123456789012,345678901234"},
+                    },
+                }
+            }
+        }
+    ]
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(fast_path, "delete_account_assignment", delete_and_record)
+        released = fast_path.release_fast_path_assignments(
+            sso_admin_client, INSTANCE_ARN, "dev", store, templates
+        )
+
+    assert released == [view]
+    assert fast_path.recorded_fast_path_assignments(store) == [power, created]
+
+
+def test_plan_account_assignments_skips_unresolved_groups():
+
+    stages = [
+        {
+            "name": "General",
+            "permission_sets": config["stages"][0]["permission_sets"]
+            + [
+                {
+                    "permission_set_name": "Admin",
+                    "ou_assignments": [{"path": "/Root", "recursive": True}],
+                    "group_assignments": [{"name": "Admin"}],
+                }
+            ],
+        }
+    ]
+
+    assignments = fast_path.plan_account_assignments(
+        stages,
+        "456789012323",
+        "/Root/Production/SubPath",
+        GroupMappings(config["group_prefix"], config["group_mappings"]),
+    )
+
+    assert assignments == [
+        Assignment("Production", "456789012323", "Power", "power-group-id"),
+        Assignment("View", "456789012323", "View", "view-group-id"),
+    ]
@@ -0,0 +1,70 @@
+import io
+import json
+
+from utility.file_helpers import (
+    ACCOUNT_FIELDS,
+    file_read_ndjson,
+    file_read_records,
+    file_read_yaml,
+    write_ndjson,
+)
+
+accounts = {
+    "Accounts": [
+        {
+            "Id": "123456789012",
+            "Name": "Development",
+            "Status": "ACTIVE",
+            "name_path": "/Root/Development",
+            "id_path": "/r-abcd/ou-abcd-12345678",
+        },
+        {
+            "Id": "234567890123",
+            "Name": "Production",
+            "Status": "SUSPENDED",
+            "name_path": "/Root/Production",
+            "id_path": "/r-abcd/ou-abcd-23456789",
+        },
+    ]
+}
+
+
+def test_file_read_yaml_json_and_yaml(tmp_path):
+
+    json_file = tmp_path / "accounts.yaml"
+    json_file.write_text(json.dumps(accounts, indent=2))
+
+    yaml_file = tmp_path / "permission-sets.yaml"
+    yaml_file.write_text("stages:\n  - name: PermissionSets\n")
+
+    flow_file = tmp_path / "flow.yaml"
+    flow_file.write_text("{stages: []}\n")
+
+    assert file_read_yaml(str(json_file)) == accounts
+    assert file_read_yaml(str(yaml_file)) == {"stages": [{"name": "PermissionSets"}]}
+    assert file_read_yaml(str(flow_file)) == {"stages": []}
+
+
+def test_ndjson_records(tmp_path):
+
+    stream = io.StringIO()
+    write_ndjson(accounts["Accounts"], ACCOUNT_FIELDS, stream)
+
+    ndjson_file = tmp_path / "accounts.ndjson"
+    ndjson_file.write_text(stream.getvalue())
+
+    assert len(stream.getvalue().splitlines()) == 2
+
+    records = file_read_ndjson(str(ndjson_file))
+    assert next(records) == {
+        "Id": "123456789012",
+        "name_path": "/Root/Development",
+        "Status": "ACTIVE",
+    }
+
+    assert file_read_records(str(ndjson_file), "Accounts") == {
+        "Accounts": [
+            {"Id": account["Id"], "name_path": account["name_path"], "Status": account["Status"]}
+            for account in accounts["Accounts"]
+        ]
+    }
@@ -0,0 +1,224 @@
+import json
+
+import pytest
+
+from tests.unit.stubs import load_script, stub_organization
+from utility import aws_clients
+from utility.event_coalescer import LIFECYCLE_EVENTS_SNAPSHOT_NAME, pending_lifecycle_events
+from utility.snapshot_store import LocalSnapshotStore
+
+get_org_hierarchy = load_script("get-org-hierarchy.py")
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(aws_clients.time, "sleep", lambda seconds: None)
+
+
+def org_with_client(client):
+    return get_org_hierarchy.Org(client)
+
+
+class TestOrg:
+    def test_get_org_hierarchy(self):
+
+        org = org_with_client(stub_organization())
+
+        accounts = org.get_org_hierarchy()["Accounts"]
+
+        assert [(account["Id"], account["name_path"]) for account in accounts] == [
+            ("012345678901", "/Root"),
+            ("123456789012", "/Root/Development"),
+            ("123456789013", "/Root/Development"),
+            ("234567890123", "/Root/Development/SubPath"),
+            ("345678901232", "/Root/Production"),
+            ("345678901233", "/Root/Production"),
+            ("345678901234", "/Root/Production"),
+            ("456789012323", "/Root/Production/SubPath"),
+        ]
+        assert accounts[3]["id_path"] == "/r-abcd/ou-abcd-dev/ou-abcd-devsub"
+
+    @pytest.mark.parametrize("parallelism", [1, 4])
+    def test_get_org_hierarchy_concurrent_matches_serial(self, parallelism):
+
+        serial = org_with_client(stub_organization()).get_org_hierarchy()
+
+        client = stub_organization()
+        org = org_with_client(client)
+        concurrent = org.get_org_hierarchy_concurrent(parallelism=parallelism)
+
+        assert json.dumps(concurrent, indent=2, default=str) == json.dumps(
+            serial, indent=2, default=str
+        )
+        assert org.api_calls == sum(client.calls.values())
+
+    def test_iter_org_accounts_streams_serial_accounts(self):
+
+        serial = org_with_client(stub_organization()).get_org_hierarchy()["Accounts"]
+
+        org = org_with_client(stub_organization())
+        accounts = org.iter_org_accounts(parallelism=4)
+
+        # The root accounts are yielded before any sub-OU is listed
+        assert next(accounts)["name_path"] == "/Root"
+        assert org.api_calls < 5
+
+        streamed = [serial[0]] + list(accounts)
+
+        key = lambda account: (account["Id"], account["name_path"], account["id_path"])
+        assert sorted(map(key, streamed)) == sorted(map(key, serial))
+
+    def test_iter_ous_bounds_listed_ous(self):
+
+        org = org_with_client(stub_organization())
+        list_ous = org.list_organizational_units_for_parent
+        listed = []
+
+        def list_organizational_units_for_parent(parent_id):
+            listed.append(parent_id)
+            return list_ous(parent_id)
+
+        org.list_organizational_units_for_parent = list_organizational_units_for_parent
+
+        yielded = []
+        for ou, accounts, sub_ous in org.iter_ous(
+            [{"Id": "r-abcd", "name_path": "/Root", "id_path": "/r-abcd"}], parallelism=2
+        ):
+            # No further OU is listed before the listed OUs are yielded
+            assert len(listed) <= len(yielded) + 2
+            yielded.append(ou["Id"])
+            assert all(sub_ou["id_path"] == f"{ou['id_path']}/{sub_ou['Id']}" for sub_ou in sub_ous)
+
+        assert sorted(yielded) == sorted(listed)
+        assert yielded[0] == "r-abcd"
+
+    def test_get_org_hierarchy_concurrent_backs_off_when_throttled(self):
+
+        client = stub_organization()
+        client.throttles = 3
+
+        org = org_with_client(client)
+
+        accounts = org.get_org_hierarchy_concurrent(parallelism=4)["Accounts"]
+
+        assert len(accounts) == 8
+        assert client.throttles == 0
+
+    def test_get_org_table_from_snapshot_refreshes_event_ous(self, tmp_path):
+
+        store = LocalSnapshotStore(str(tmp_path))
+
+        client = stub_organization()
+        get_org_hierarchy.get_org_table_from_snapshot(
+            org_with_client(client), store, [], full_refresh_seconds=3600
+        )
+        assert client.calls["list_roots"] == 1
+
+        # Move a production account into the development sub-OU
+        moved = client._children["ou-abcd-prod"]["Accounts"].pop()
+        client._children["ou-abcd-devsub"]["Accounts"].append(moved)
+
+        event = {
+            "detail": {
+                "serviceEventDetails": {
+                    "updateManagedAccountStatus": {
+                        "organizationalUnit": {"organizationalUnitId": "ou-abcd-devsub"},
+                        "account": {"accountId": moved["Id"]},
+                    }
+                }
+            }
+        }
+
+        client.calls = {}
+        org = org_with_client(client)
+        org_table = get_org_hierarchy.get_org_table_from_snapshot(
+            org, store, [event], full_refresh_seconds=3600
+        )
+
+        # Only the event's OU subtree is listed again
+        assert "list_roots" not in client.calls
+        assert org.api_calls == 2
+
+        refreshed = org.org_from_table(org_table)
+        expected = org_with_client(client).get_org_hierarchy()
+
+        assert json.dumps(refreshed, default=str) == json.dumps(expected, default=str)
+
+    def test_get_org_table_from_snapshot_full_refresh(self, tmp_path):
+
+        store = LocalSnapshotStore(str(tmp_path))
+
+        get_org_hierarchy.get_org_table_from_snapshot(
+            org_with_client(stub_organization()), store, [], full_refresh_seconds=3600
+        )
+
+        # Events without an OU and stale snapshots walk the whole organization
+        for events, full_refresh_seconds in [([{"detail": {}}], 3600), ([], 0)]:
+            client = stub_organization()
+            get_org_hierarchy.get_org_table_from_snapshot(
+                org_with_client(client), store, events, full_refresh_seconds=full_refresh_seconds
+            )
+            assert client.calls["list_roots"] == 1
+
+    def test_get_org_table_from_snapshot_without_events_walks_organization(self, tmp_path):
+
+        store = LocalSnapshotStore(str(tmp_path))
+
+        client = stub_organization()
+        get_org_hierarchy.get_org_table_from_snapshot(
+            org_with_client(client), store, [], full_refresh_seconds=3600
+        )
+
+        # A new account while the snapshot is fresh, e.g. a pipeline run started by Control Tower
+        # without coalesced events
+        new_account = dict(client._children["ou-abcd-devsub"]["Accounts"][0], Id="567890123456")
+        client._children["ou-abcd-devsub"]["Accounts"].append(new_account)
+
+        client.calls = {}
+        org = org_with_client(client)
+        org_table = get_org_hierarchy.get_org_table_from_snapshot(
+            org, store, [], full_refresh_seconds=3600
+        )
+
+        assert client.calls["list_roots"] == 1
+        assert "567890123456" in [
+            account["Id"] for account in org.org_from_table(org_table)["Accounts"]
+        ]
+
+    def test_get_org_table_from_snapshot_consumes_event_batches(self, tmp_path):
+
+        store = LocalSnapshotStore(str(tmp_path))
+        org = org_with_client(stub_organization())
+        event = {
+            "detail": {
+                "serviceEventDetails": {
+                    "registerOrganizationalUnitStatus": {
+                        "organizationalUnit": {"organizationalUnitId": "ou-abcd-devsub"}
+                    }
+                }
+            }
+        }
+
+        # Two bursts coalesced before the pipeline's org lookup
+        store.append(LIFECYCLE_EVENTS_SNAPSHOT_NAME, {"events": [event]})
+        store.append(LIFECYCLE_EVENTS_SNAPSHOT_NAME, {"events": [event]})
+
+        events, batch_versions = pending_lifecycle_events(
+            store, get_org_hierarchy.ORG_SNAPSHOT_NAME
+        )
+        assert len(events) == 2
+
+        get_org_hierarchy.get_org_table_from_snapshot(
+            org, store, events, full_refresh_seconds=3600, consumed_event_batches=batch_versions
+        )
+        assert pending_lifecycle_events(store, get_org_hierarchy.ORG_SNAPSHOT_NAME).events == []
+
+        # A run with an event file keeps the consumed batches, a new burst is still pending
+        get_org_hierarchy.get_org_table_from_snapshot(
+            org, store, [event], full_refresh_seconds=3600
+        )
+        store.append(LIFECYCLE_EVENTS_SNAPSHOT_NAME, {"events": [event]})
+
+        assert pending_lifecycle_events(store, get_org_hierarchy.ORG_SNAPSHOT_NAME).events == [
+            event
+        ]
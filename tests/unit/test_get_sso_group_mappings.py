@@ -0,0 +1,114 @@
+import pytest
+
+from sso.group_mappings import UnresolvedGroupsError
+from sso.permission_sets import PermissionSets
+from tests.unit.stubs import StubIdentityStoreClient, load_script
+from utility.snapshot_store import LocalSnapshotStore
+
+get_sso_group_mappings = load_script("get-sso-group-mappings.py")
+
+permission_sets = PermissionSets(
+    {
+        "stages": [
+            {
+                "name": "PermissionSets",
+                "permission_sets": [
+                    {
+                        "permission_set_name": "PermissionSetDevelopment",
+                        "group_assignments": [{"name": "Development"}],
+                    },
+                    {
+                        "permission_set_name": "PermissionSetProduction",
+                        "group_assignments": [{"name": "Production"}, {"name": "Development"}],
+                    },
+                ],
+            }
+        ]
+    }
+)
+
+groups = {
+    "PR_AWS_SSO_Development": "1234567890-12345678-1230-1230-1230-123456789012",
+    "PR_AWS_SSO_Production": "2345678911-12345678-1230-1230-1230-123456789012",
+}
+
+
+def test_get_sso_group_mappings():
+
+    is_client = StubIdentityStoreClient(groups)
+
+    group_mappings = get_sso_group_mappings.get_sso_group_mappings(
+        is_client, "PR_AWS_SSO_", "d-1234567890", permission_sets
+    )
+
+    assert group_mappings["sso_group_mappings"] == [
+        {"group_id": group_id, "group_name": group_name}
+        for group_name, group_id in sorted(groups.items())
+    ]
+
+
+def test_get_sso_group_mappings_from_snapshot(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+
+    is_client = StubIdentityStoreClient(groups)
+    first = get_sso_group_mappings.get_sso_group_mappings_from_snapshot(
+        is_client, "PR_AWS_SSO_", "d-1234567890", permission_sets, store, 3600
+    )
+    assert is_client.calls["list_groups"] == 2
+
+    # Groups in the snapshot are not looked up again
+    is_client = StubIdentityStoreClient(groups)
+    second = get_sso_group_mappings.get_sso_group_mappings_from_snapshot(
+        is_client, "PR_AWS_SSO_", "d-1234567890", permission_sets, store, 3600
+    )
+    assert is_client.calls == {}
+    assert sorted(second["sso_group_mappings"], key=lambda m: m["group_name"]) == sorted(
+        first["sso_group_mappings"], key=lambda m: m["group_name"]
+    )
+
+    # A stale snapshot looks up every group
+    is_client = StubIdentityStoreClient(groups)
+    get_sso_group_mappings.get_sso_group_mappings_from_snapshot(
+        is_client, "PR_AWS_SSO_", "d-1234567890", permission_sets, store, 0
+    )
+    assert is_client.calls["list_groups"] == 2
+
+
+def test_resolve_identitystore_groups_strategies():
+
+    all_groups = dict(groups)
+    all_groups["OTHER_Development"] = "3456789112-12345678-1230-1230-1230-123456789012"
+    all_groups["PR_AWS_SSO_Audit"] = "4567891123-12345678-1230-1230-1230-123456789012"
+
+    # Concurrent lookups by display name
+    is_client = StubIdentityStoreClient(all_groups)
+    looked_up = get_sso_group_mappings.resolve_identitystore_groups(
+        is_client, "d-1234567890", "PR_AWS_SSO_", ["Production", "Development"], sweep_threshold=2
+    )
+    assert is_client.calls == {"list_groups": 2}
+
+    # One listing of all groups in the identity store
+    is_client = StubIdentityStoreClient(all_groups)
+    swept = get_sso_group_mappings.resolve_identitystore_groups(
+        is_client, "d-1234567890", "PR_AWS_SSO_", ["Production", "Development"], sweep_threshold=1
+    )
+    assert is_client.calls == {"list_groups": 2}  # 4 groups in pages of 2
+
+    assert looked_up == swept
+    assert looked_up["Development"]["GroupId"] == groups["PR_AWS_SSO_Development"]
+
+
+@pytest.mark.parametrize("sweep_threshold", [0, 50])
+def test_resolve_identitystore_groups_reports_all_missing_groups(sweep_threshold):
+
+    with pytest.raises(UnresolvedGroupsError) as error:
+        get_sso_group_mappings.resolve_identitystore_groups(
+            StubIdentityStoreClient(groups),
+            "d-1234567890",
+            "PR_AWS_SSO_",
+            ["Development", "Sandbox", "Audit"],
+            sweep_threshold=sweep_threshold,
+        )
+
+    assert error.value.group_names == ["Audit", "Sandbox"]
@@ -1,4 +1,6 @@
-from sso.group_mappings import GroupMappings
+import pytest
+
+from sso.group_mappings import GroupMappings, UnresolvedGroupsError
 
 
 def test_group_mappings():
@@ -27,3 +29,43 @@ def test_group_mappings():
         "group_id": "1234567890-12345678-1230-1230-1230-123456789012",
         "group_name": group_prefix + "Development",
     }
+
+
+def test_group_mappings_resolve_many():
+
+    group_prefix = "PR_AWS_SSO_"
+
+    group_mappings_raw = {
+        "sso_group_mappings": [
+            {
+                "group_id": "1234567890-12345678-1230-1230-1230-123456789012",
+                "group_name": "PR_AWS_SSO_Development",
+            },
+            {
+                "group_id": "2345678911-12345678-1230-1230-1230-123456789012",
+                "group_name": "PR_AWS_SSO_Production",
+            },
+        ]
+    }
+
+    group_mappings = GroupMappings(group_prefix, group_mappings_raw)
+
+    mappings = group_mappings.resolve_many(["Production", "Development", "Production"])
+    assert mappings["Development"]["group_id"] == "1234567890-12345678-1230-1230-1230-123456789012"
+    assert mappings["Production"]["group_id"] == "2345678911-12345678-1230-1230-1230-123456789012"
+
+    with pytest.raises(UnresolvedGroupsError) as error:
+        group_mappings.resolve_many(["Development", "Sandbox", "Audit"])
+
+    assert error.value.group_names == ["Audit", "Sandbox"]
+
+    with pytest.raises(UnresolvedGroupsError):
+        group_mappings.get_mapping_by_name("PR_AWS_SSO_Development")
+
+
+def test_group_mappings_empty():
+
+    group_mappings = GroupMappings("PR_AWS_SSO_", [])
+
+    assert group_mappings.group_mappings == []
+    assert group_mappings.resolve_many([]) == {}
@@ -0,0 +1,51 @@
+import pytest
+
+from sso.permission_sets import PermissionSets
+
+
+def stage_names(waves):
+    return [[stage["name"] for stage in wave] for wave in waves]
+
+
+def test_get_waves_sequential_without_hints():
+
+    permission_sets = PermissionSets({"stages": [{"name": "General"}, {"name": "Admin"}]})
+
+    assert stage_names(permission_sets.get_waves()) == [["General"], ["Admin"]]
+
+
+def test_get_waves_groups_independent_stages():
+
+    permission_sets = PermissionSets(
+        {
+            "stages": [
+                {"name": "General"},
+                {"name": "Development", "depends_on": ["General"]},
+                {"name": "Production", "depends_on": ["General"]},
+                {"name": "Audit", "depends_on": []},
+                {"name": "BreakGlass", "wave": 2},
+            ]
+        }
+    )
+
+    assert stage_names(permission_sets.get_waves()) == [
+        ["General", "Audit"],
+        ["Development", "Production"],
+        ["BreakGlass"],
+    ]
+
+
+@pytest.mark.parametrize(
+    "stages",
+    [
+        [{"name": "General"}, {"name": "General"}],
+        [{"name": "General", "depends_on": ["Admin"]}, {"name": "Admin"}],
+        [{"name": "General", "wave": 0, "depends_on": []}],
+        [{"name": "General"}, {"name": "Dev-Ops"}, {"name": "DevOps"}],
+        [{"name": "General"}, {"name": "1"}],
+    ],
+)
+def test_get_waves_invalid(stages):
+
+    with pytest.raises(ValueError):
+        PermissionSets({"stages": stages}).get_waves()
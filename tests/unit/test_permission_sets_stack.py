@@ -1,5 +1,11 @@
+import json
+
+import pytest
+
 import aws_cdk as cdk
 import aws_cdk.assertions as assertions
+from pipeline.stage import SSOStage
+from sso.assignments_stack import BATCHED_PROVIDER_RESOURCES
 from sso.account_structure import AccountStructure
 from sso.group_mappings import GroupMappings
 from sso.permission_sets import PermissionSets
@@ -207,3 +213,337 @@ class TestPermissionSetsStack:
                 "TargetType": "AWS_ACCOUNT",
             },
         )
+
+    def test_assignments_sharded_across_stacks(self):
+
+        app = cdk.App()
+
+        permission_sets = [
+            {
+                "permission_set_name": "PermissionSetView",
+                "ou_assignments": [{"path": "/Root", "recursive": True}],
+                "group_assignments": [{"name": "View"}, {"name": "Audit"}],
+            },
+        ]
+
+        group_prefix = "PR_AWS_SSO_"
+
+        group_mappings = GroupMappings(
+            group_prefix,
+            {
+                "sso_group_mappings": [
+                    {"group_id": "view-group-id", "group_name": group_prefix + "View"},
+                    {"group_id": "audit-group-id", "group_name": group_prefix + "Audit"},
+                ]
+            },
+        )
+
+        account_structure = AccountStructure(
+            {
+                "Accounts": [
+                    {"Id": f"{100000000000 + i}", "name_path": f"/Root/OU{i % 3}"}
+                    for i in range(50)
+                ]
+            }
+        )
+
+        properties = {
+            "env_name": "dev",
+            "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1234567890abcdef",
+        }
+
+        stage = SSOStage(
+            app,
+            "SSOStage",
+            properties=properties,
+            account_structure=account_structure,
+            group_mappings=group_mappings,
+            permission_sets=permission_sets,
+            max_resources_per_stack=40,
+        )
+
+        stacks = [child for child in stage.node.children if isinstance(child, cdk.Stack)]
+
+        assert len(stacks) == 3
+
+        assignment_counts = []
+        for stack in stacks:
+            template = assertions.Template.from_stack(stack)
+            resources = template.to_json()["Resources"]
+            assert len(resources) <= 40
+            assignment_counts.append(len(template.find_resources("AWS::SSO::Assignment")))
+
+        assert sum(assignment_counts) == 100
+
+        # Assignments in other stacks import the permission set ARN by its stable export name
+        export_name = "sso-permission-sets-dev:PermissionSetViewPermissionSetArn"
+        assertions.Template.from_stack(stacks[0]).has_output(
+            "PermissionSetViewPermissionSetArn", {"Export": {"Name": export_name}}
+        )
+        for previous_stack, stack in zip(stacks, stacks[1:]):
+            template = assertions.Template.from_stack(stack)
+            template.all_resources_properties(
+                "AWS::SSO::Assignment", {"PermissionSetArn": {"Fn::ImportValue": export_name}}
+            )
+
+            # The assignments stacks are deployed one after the other
+            assert stack.dependencies == [previous_stack]
+
+    def test_templates_independent_of_input_order(self):
+
+        group_prefix = "PR_AWS_SSO_"
+
+        group_mappings = GroupMappings(
+            group_prefix,
+            {
+                "sso_group_mappings": [
+                    {"group_id": "view-group-id", "group_name": group_prefix + "View"},
+                    {"group_id": "audit-group-id", "group_name": group_prefix + "Audit"},
+                ]
+            },
+        )
+
+        accounts = [
+            {"Id": f"{100000000000 + i}", "name_path": f"/Root/OU{i % 3}"} for i in range(20)
+        ]
+
+        properties = {
+            "env_name": "dev",
+            "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1234567890abcdef",
+        }
+
+        def synth_templates(accounts):
+            stage = SSOStage(
+                cdk.App(),
+                "SSOStage",
+                properties=properties,
+                account_structure=AccountStructure({"Accounts": accounts}),
+                group_mappings=group_mappings,
+                permission_sets=[
+                    {
+                        "permission_set_name": "PermissionSetView",
+                        "ou_assignments": [{"path": "/Root", "recursive": True}],
+                        "account_assignments": ["100000000000"],
+                        "group_assignments": [{"name": "View"}, {"name": "Audit"}],
+                    },
+                ],
+                max_resources_per_stack=20,
+            )
+
+            return [
+                json.dumps(assertions.Template.from_stack(child).to_json())
+                for child in stage.node.children
+                if isinstance(child, cdk.Stack)
+            ]
+
+        assert synth_templates(accounts) == synth_templates(list(reversed(accounts)))
+
+    def test_assignments_deployed_in_waves(self):
+
+        group_prefix = "PR_AWS_SSO_"
+
+        stage = SSOStage(
+            cdk.App(),
+            "SSOStage",
+            properties={
+                "env_name": "dev",
+                "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1234567890abcdef",
+            },
+            account_structure=AccountStructure(
+                {
+                    "Accounts": [
+                        {"Id": f"{100000000000 + i}", "name_path": "/Root/Workloads"}
+                        for i in range(30)
+                    ]
+                }
+            ),
+            group_mappings=GroupMappings(
+                group_prefix,
+                {
+                    "sso_group_mappings": [
+                        {"group_id": "view-group-id", "group_name": group_prefix + "View"}
+                    ]
+                },
+            ),
+            permission_sets=[
+                {
+                    "permission_set_name": "PermissionSetView",
+                    "ou_assignments": [{"path": "/Root/Workloads"}],
+                    "group_assignments": [{"name": "View"}],
+                },
+            ],
+            max_resources_per_stack=20,
+            deployment_wave_size=4,
+        )
+
+        stacks = [child for child in stage.node.children if isinstance(child, cdk.Stack)]
+
+        assert len(stacks) == 2
+        assert stacks[0] in stacks[1].dependencies
+
+        for stack in stacks:
+            assignments = assertions.Template.from_stack(stack).find_resources(
+                "AWS::SSO::Assignment"
+            )
+
+            # All but the first wave depend on exactly one assignment of the previous wave
+            depends_on = [resource.get("DependsOn", []) for resource in assignments.values()]
+            assert sum(1 for dependencies in depends_on if not dependencies) == 4
+            assert all(len(dependencies) <= 1 for dependencies in depends_on)
+
+    def test_template_emitter_equivalent_to_constructs(self):
+
+        group_prefix = "PR_AWS_SSO_"
+
+        def synth_templates(emitter):
+            stage = SSOStage(
+                cdk.App(context={"aws:cdk:enable-path-metadata": True}),
+                "SSOStage",
+                properties={
+                    "env_name": "dev",
+                    "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1234567890abcdef",
+                    "assignment_emitter": emitter,
+                },
+                account_structure=AccountStructure(
+                    {
+                        "Accounts": [
+                            {"Id": f"{100000000000 + i}", "name_path": f"/Root/OU{i % 3}"}
+                            for i in range(30)
+                        ]
+                    }
+                ),
+                group_mappings=GroupMappings(
+                    group_prefix,
+                    {
+                        "sso_group_mappings": [
+                            {"group_id": "view-group-id", "group_name": group_prefix + "View"},
+                            {"group_id": "audit-group-id", "group_name": group_prefix + "Audit"},
+                        ]
+                    },
+                ),
+                permission_sets=[
+                    {
+                        "permission_set_name": "PermissionSetView",
+                        "ou_assignments": [{"path": "/Root", "recursive": True}],
+                        "group_assignments": [{"name": "View"}, {"name": "Audit"}],
+                    },
+                    {
+                        "permission_set_name": "PermissionSet-Audit",
+                        "ou_assignments": [{"path": "/Root/OU1"}],
+                        "group_assignments": [{"name": "Audit"}],
+                    },
+                ],
+                max_resources_per_stack=25,
+                deployment_wave_size=3,
+            )
+
+            return [
+                assertions.Template.from_stack(child).to_json()
+                for child in stage.node.children
+                if isinstance(child, cdk.Stack)
+            ]
+
+        construct_templates = synth_templates("construct")
+
+        assert len(construct_templates) == 4
+        assert synth_templates("template") == construct_templates
+
+    def test_batched_assignments_per_permission_set(self):
+
+        group_prefix = "PR_AWS_SSO_"
+
+        stage = SSOStage(
+            cdk.App(),
+            "SSOStage",
+            properties={
+                "env_name": "dev",
+                "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1234567890abcdef",
+                "assignment_emitter": "batched",
+            },
+            account_structure=AccountStructure(
+                {
+                    "Accounts": [
+                        {"Id": f"{100000000000 + i}", "name_path": f"/Root/OU{i % 3}"}
+                        for i in range(600)
+                    ]
+                }
+            ),
+            group_mappings=GroupMappings(
+                group_prefix,
+                {
+                    "sso_group_mappings": [
+                        {"group_id": "view-group-id", "group_name": group_prefix + "View"},
+                        {"group_id": "audit-group-id", "group_name": group_prefix + "Audit"},
+                    ]
+                },
+            ),
+            permission_sets=[
+                {
+                    "permission_set_name": "PermissionSetView",
+                    "ou_assignments": [{"path": "/Root", "recursive": True}],
+                    "group_assignments": [{"name": "View"}, {"name": "Audit"}],
+                },
+                {
+                    "permission_set_name": "PermissionSetAudit",
+                    "ou_assignments": [{"path": "/Root/OU1"}],
+                    "group_assignments": [{"name": "Audit"}],
+                },
+            ],
+        )
+
+        # 1,400 assignments in one stack instead of 4
+        stacks = [child for child in stage.node.children if isinstance(child, cdk.Stack)]
+        assert len(stacks) == 1
+
+        template = assertions.Template.from_stack(stacks[0])
+        template.resource_count_is("AWS::SSO::Assignment", 0)
+        template.resource_count_is("Custom::SSOAssignments", 2)
+
+        batched = template.find_resources("Custom::SSOAssignments")
+        view = batched["PermissionSetViewAssignments"]["Properties"]
+        assert view["PermissionSetArn"] == {"Fn::GetAtt": ["PermissionSetView", "PermissionSetArn"]}
+        assert len(view["Assignments"]["view-group-id"].split(",")) == 600
+
+        # The estimate of the provider's resources is the actual number
+        resources = template.to_json()["Resources"]
+        assert len(resources) == 2 + 2 + BATCHED_PROVIDER_RESOURCES
+
+    def test_batched_assignments_fail_with_deployed_assignments(self):
+
+        def synth_stage(deployed_logical_ids):
+            return SSOStage(
+                cdk.App(),
+                "SSOStage",
+                properties={
+                    "env_name": "dev",
+                    "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1234567890abcdef",
+                    "assignment_emitter": "batched",
+                    "deployed_logical_ids": deployed_logical_ids,
+                },
+                account_structure=AccountStructure(
+                    {"Accounts": [{"Id": "100000000000", "name_path": "/Root"}]}
+                ),
+                group_mappings=GroupMappings(
+                    "PR_AWS_SSO_",
+                    {
+                        "sso_group_mappings": [
+                            {"group_id": "view-group-id", "group_name": "PR_AWS_SSO_View"}
+                        ]
+                    },
+                ),
+                permission_sets=[
+                    {
+                        "permission_set_name": "PermissionSetView",
+                        "ou_assignments": [{"path": "/Root"}],
+                        "group_assignments": [{"name": "View"}],
+                    }
+                ],
+            )
+
+        deployed = frozenset(["PermissionSetView100000000000devView"])
+
+        # The assignments deployed in the stacks of another stage don't matter
+        synth_stage({"sso-permission-sets-dev-Other": deployed})
+
+        with pytest.raises(ValueError, match="1 deployed AWS::SSO::Assignment"):
+            synth_stage({"sso-permission-sets-dev-1": deployed})
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from utility.policy_loader import PolicyLoader
+
+
+def test_policy_loader_minifies_and_caches(tmp_path):
+
+    policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {"Effect": "Allow", "Action": "s3:*", "Resource": "arn:aws:s3:::${AWS::AccountId}"}
+        ],
+    }
+
+    first_file = tmp_path / "first.json"
+    second_file = tmp_path / "second.json"
+    first_file.write_text(json.dumps(policy, indent=4))
+    second_file.write_text(json.dumps(policy, indent=4))
+
+    loader = PolicyLoader()
+    first = loader.load(str(first_file))
+
+    assert json.loads(first.document) == policy
+    assert "\n" not in first.document
+    assert first.bytes_saved > 0
+
+    # Cached by path and shared by content hash
+    assert loader.load(str(first_file)) is first
+    assert loader.load(str(second_file)) is first
+    assert len(loader.report()) == 1
+
+    # A changed file is re-read
+    first_file.write_text(json.dumps({"Version": "2012-10-17", "Statement": []}))
+    os.utime(first_file, ns=(0, 0))
+    assert loader.load(str(first_file)) is not first
+
+
+def test_policy_loader_rejects_oversized_and_invalid_policies(tmp_path):
+
+    policy_file = tmp_path / "policy.json"
+    policy_file.write_text(json.dumps({"Statement": [{"Action": "s3:GetObject"}] * 100}))
+
+    with pytest.raises(ValueError, match="exceeds the inline policy limit of 1000"):
+        PolicyLoader(max_bytes=1000).load(str(policy_file))
+
+    policy_file.write_text("{")
+
+    with pytest.raises(ValueError, match="not valid JSON"):
+        PolicyLoader().load(str(policy_file))
@@ -0,0 +1,55 @@
+import pytest
+
+from sso.sharding import jump_hash, plan_shards, stable_key_hash
+
+
+def test_jump_hash_moves_few_keys():
+
+    keys = [stable_key_hash(("PermissionSet", f"{i:012d}", "Group")) for i in range(1000)]
+
+    before = [jump_hash(key, 4) for key in keys]
+    after = [jump_hash(key, 5) for key in keys]
+
+    assert set(before) == {0, 1, 2, 3}
+
+    moved = [(b, a) for b, a in zip(before, after) if b != a]
+
+    # Keys only move to the new bucket and roughly 1/5 of them do
+    assert all(a == 4 for _, a in moved)
+    assert 100 < len(moved) < 300
+
+
+def test_plan_shards_single_shard():
+
+    shards = plan_shards({f"Assignment{i}": 300 for i in range(10)}, base_resources=2)
+
+    assert len(shards) == 1
+    assert shards[0].resources == 12
+    assert shards[0].template_bytes == 3000
+
+
+def test_plan_shards_respects_limits_and_is_stable():
+
+    resource_bytes = {f"Assignment{i}": 300 for i in range(1000)}
+
+    shards = plan_shards(resource_bytes, base_resources=5, max_resources=200)
+
+    assert len(shards) > 5
+    assert all(shard.resources <= 200 for shard in shards)
+    assert sum(len(shard.keys) for shard in shards) == 1000
+
+    # Same input gives the same placement regardless of input order
+    reversed_shards = plan_shards(
+        dict(reversed(list(resource_bytes.items()))), base_resources=5, max_resources=200
+    )
+    assert [shard.keys for shard in shards] == [shard.keys for shard in reversed_shards]
+
+    # Template size limits also cause more shards
+    shards = plan_shards(resource_bytes, max_template_bytes=30_000)
+    assert all(shard.template_bytes <= 30_000 for shard in shards)
+
+
+def test_plan_shards_base_exceeds_limits():
+
+    with pytest.raises(ValueError):
+        plan_shards({}, base_resources=500, max_resources=450)
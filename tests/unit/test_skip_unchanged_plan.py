@@ -0,0 +1,155 @@
+import aws_cdk as cdk
+import pytest
+from botocore.exceptions import ClientError
+
+from pipeline.stage import SSOStage
+from sso.account_structure import AccountStructure
+from sso.group_mappings import GroupMappings
+from tests.unit.stubs import load_script
+
+skip_unchanged_plan = load_script("skip-unchanged-plan.py")
+
+
+class StubCloudFormationClient:
+    def __init__(self, plan_hashes: dict):
+        self._plan_hashes = plan_hashes
+
+    def describe_stacks(self, StackName: str):
+        if StackName not in self._plan_hashes:
+            raise ClientError(
+                {"Error": {"Code": "ValidationError", "Message": "Stack does not exist"}},
+                "DescribeStacks",
+            )
+
+        return {
+            "Stacks": [
+                {
+                    "Outputs": [
+                        {"OutputKey": "PlanHash", "OutputValue": self._plan_hashes[StackName]}
+                    ]
+                }
+            ]
+        }
+
+
+class StubCodePipelineClient:
+    def __init__(self, revision: str, last_succeeded_revision: str):
+        self._revision = revision
+        self._last_succeeded_revision = last_succeeded_revision
+        self.stopped = []
+
+    def get_pipeline_execution(self, pipelineName: str, pipelineExecutionId: str):
+        return {
+            "pipelineExecution": {
+                "pipelineExecutionId": pipelineExecutionId,
+                "artifactRevisions": [{"revisionId": self._revision}],
+            }
+        }
+
+    def get_paginator(self, operation_name: str):
+        client = self
+
+        class Paginator:
+            def paginate(self, pipelineName: str):
+                yield {
+                    "pipelineExecutionSummaries": [
+                        {"status": "InProgress", "sourceRevisions": [{"revisionId": "x"}]},
+                        {
+                            "status": "Succeeded",
+                            "sourceRevisions": [{"revisionId": client._last_succeeded_revision}],
+                        },
+                    ]
+                }
+
+        return Paginator()
+
+    def stop_pipeline_execution(self, **kwargs):
+        self.stopped.append(kwargs)
+
+
+@pytest.fixture(scope="module")
+def cdk_out(tmp_path_factory):
+
+    outdir = tmp_path_factory.mktemp("cdk.out")
+
+    app = cdk.App(outdir=str(outdir))
+
+    SSOStage(
+        app,
+        "SSOStage",
+        properties={"env_name": "dev", "sso_instance_arn": "arn:aws:sso:::instance/ssoins-1"},
+        account_structure=AccountStructure(
+            {"Accounts": [{"Id": f"{123456789012 + i}", "name_path": "/Root"} for i in range(3)]}
+        ),
+        group_mappings=GroupMappings(
+            "PR_AWS_SSO_",
+            {"sso_group_mappings": [{"group_id": "view-id", "group_name": "PR_AWS_SSO_View"}]},
+        ),
+        permission_sets=[
+            {
+                "permission_set_name": "PermissionSetView",
+                "ou_assignments": [{"path": "/Root"}],
+                "group_assignments": [{"name": "View"}],
+            }
+        ],
+        # The assignments are spread across further stacks
+        max_resources_per_stack=2,
+    )
+
+    app.synth()
+
+    return str(outdir)
+
+
+def test_synthesized_plan_hashes(cdk_out):
+
+    plan_hashes = skip_unchanged_plan.synthesized_plan_hashes(cdk_out)
+
+    # Each stack of the stage outputs the stage's plan hash
+    assert list(plan_hashes)[:2] == ["sso-permission-sets-dev", "sso-permission-sets-dev-1"]
+    assert len(plan_hashes["sso-permission-sets-dev"]) == 64
+    assert set(plan_hashes.values()) == {plan_hashes["sso-permission-sets-dev"]}
+
+
+def test_skip_unchanged_plan(cdk_out):
+
+    plan_hashes = skip_unchanged_plan.synthesized_plan_hashes(cdk_out)
+    cfn_client = StubCloudFormationClient(plan_hashes)
+
+    cp_client = StubCodePipelineClient("abc123", "abc123")
+    assert skip_unchanged_plan.skip_unchanged_plan(
+        cfn_client, cp_client, "SSOPipeline", "current", cdk_out
+    )
+    assert cp_client.stopped[0]["pipelineExecutionId"] == "current"
+
+    # Source changes are always deployed
+    cp_client = StubCodePipelineClient("def456", "abc123")
+    assert not skip_unchanged_plan.skip_unchanged_plan(
+        cfn_client, cp_client, "SSOPipeline", "current", cdk_out
+    )
+    assert cp_client.stopped == []
+
+
+@pytest.mark.parametrize("deployed", [{}, {"sso-permission-sets-dev": "0" * 64}])
+def test_skip_unchanged_plan_changed(cdk_out, deployed):
+
+    cp_client = StubCodePipelineClient("abc123", "abc123")
+
+    assert not skip_unchanged_plan.skip_unchanged_plan(
+        StubCloudFormationClient(deployed), cp_client, "SSOPipeline", "current", cdk_out
+    )
+    assert cp_client.stopped == []
+
+
+def test_skip_unchanged_plan_failed_further_stack(cdk_out):
+
+    plan_hashes = skip_unchanged_plan.synthesized_plan_hashes(cdk_out)
+    cp_client = StubCodePipelineClient("abc123", "abc123")
+
+    # The permission sets stack deployed, but the further stack failed and kept its old plan hash
+    deployed = dict(plan_hashes, **{"sso-permission-sets-dev-1": "0" * 64})
+
+    assert not skip_unchanged_plan.skip_unchanged_plan(
+        StubCloudFormationClient(deployed), cp_client, "SSOPipeline", "current", cdk_out
+    )
+    assert cp_client.stopped == []
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utility.snapshot_store import LocalSnapshotStore, SnapshotStore, snapshot_store_from_url
+
+
+def test_local_snapshot_store(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+
+    assert store.get_latest("org") is None
+
+    now = datetime(2022, 10, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+    first = store.put("org", {"ous": {"r-abcd": {"name_path": "/Root"}}}, now=now)
+    latest = store.get_latest("org")
+
+    assert latest.version == first.version
+    assert latest.created == now
+    assert latest.data == {"ous": {"r-abcd": {"name_path": "/Root"}}}
+
+    # Unchanged content keeps its version
+    unchanged = store.put(
+        "org", {"ous": {"r-abcd": {"name_path": "/Root"}}}, now=now + timedelta(hours=1)
+    )
+    assert unchanged.version == first.version
+    assert store.get_latest("org").created == now + timedelta(hours=1)
+
+    changed = store.put("org", {"ous": {}}, now=now + timedelta(hours=2))
+    assert changed.version != first.version
+    assert store.get_latest("org").data == {"ous": {}}
+
+    # Previous versions are kept
+    assert (tmp_path / "org" / f"{first.version}.json").is_file()
+
+
+def test_local_snapshot_store_records(tmp_path):
+
+    store = LocalSnapshotStore(str(tmp_path))
+
+    assert store.get_records("assignments") == {}
+
+    store.put_record("assignments", "b", {"account_id": "210987654321"})
+    store.put_record("assignments", "a", {"account_id": "123456789012"})
+    store.delete_record("assignments", "b")
+
+    # Deleting a missing record is a no-op
+    store.delete_record("assignments", "c")
+
+    assert store.get_records("assignments") == {"a": {"account_id": "123456789012"}}
+    assert store.get_latest("assignments") is None
+
+
+def test_snapshot_store_from_url(tmp_path):
+
+    assert isinstance(snapshot_store_from_url(str(tmp_path)), LocalSnapshotStore)
+
+    # The store backends must implement reading and writing keys
+    with pytest.raises(TypeError):
+        SnapshotStore()
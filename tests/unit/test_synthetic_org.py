@@ -0,0 +1,32 @@
+from benchmarks.synthetic_org import generate_org, generate_ou_paths
+from sso.account_structure import AccountStructure
+from sso.assignment_plan import plan_assignments
+from sso.group_mappings import GroupMappings
+
+
+def test_generate_ou_paths():
+
+    ou_paths = generate_ou_paths(depth=2, fan_out=3)
+
+    assert len(ou_paths) == 1 + 3 + 9
+    assert ou_paths[0] == "/Root"
+    assert "/Root/OU1x2/OU2x0" in ou_paths
+
+
+def test_generate_org_is_deterministic_and_resolvable():
+
+    parameters = {"seed": 7, "accounts": 200, "depth": 2, "fan_out": 3, "permission_sets": 5}
+
+    org = generate_org(**parameters)
+
+    assert org == generate_org(**parameters)
+    assert org != generate_org(**dict(parameters, seed=8))
+    assert len(org["accounts"]["Accounts"]) == 200
+
+    assignments = plan_assignments(
+        org["permission_sets"]["stages"][0]["permission_sets"],
+        AccountStructure(org["accounts"]),
+        GroupMappings(org["group_prefix"], org["group_mappings"]),
+    )
+
+    assert len(assignments) > 0
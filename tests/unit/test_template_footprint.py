@@ -0,0 +1,171 @@
+import os
+
+import aws_cdk as cdk
+
+from pipeline.stage import SSOStage
+from sso.account_structure import AccountStructure
+from sso.group_mappings import GroupMappings
+from sso.permission_sets import PermissionSets
+from tests.unit.stubs import load_script
+from utility.template_footprint import (
+    assembly_footprints,
+    footprint_warnings,
+    iter_assembly_templates,
+)
+
+get_deployed_logical_ids = load_script("get-deployed-logical-ids.py")
+
+
+class StubCloudFormationClient:
+    """In-memory stand-in for the AWS CloudFormation client with the given templates by stack"""
+
+    def __init__(self, templates: dict):
+        self.templates = templates
+
+    def get_paginator(self, operation_name: str):
+        templates = self.templates
+
+        class Paginator:
+            def paginate(self, StackName: str = None):
+                if operation_name == "describe_stacks":
+                    names = list(templates) + [
+                        "sso-permission-sets-devtest",
+                        "sso-permission-sets-dev-Other",
+                        "other",
+                    ]
+                    yield {"Stacks": [{"StackName": name} for name in names]}
+                else:
+                    yield {
+                        "StackResourceSummaries": [
+                            {"LogicalResourceId": logical_id, "ResourceType": resource["Type"]}
+                            for logical_id, resource in templates[StackName]["Resources"].items()
+                        ]
+                    }
+
+        return Paginator()
+
+
+def synth_stage(outdir: str, accounts: int, properties: dict = {}) -> str:
+
+    app = cdk.App(outdir=outdir)
+
+    SSOStage(
+        app,
+        "SSOStage",
+        properties=dict(
+            properties, env_name="dev", sso_instance_arn="arn:aws:sso:::instance/ssoins-1"
+        ),
+        account_structure=AccountStructure(
+            {
+                "Accounts": [
+                    {"Id": f"{100000000000 + i}", "name_path": "/Root"} for i in range(accounts)
+                ]
+            }
+        ),
+        group_mappings=GroupMappings(
+            "PR_AWS_SSO_",
+            {"sso_group_mappings": [{"group_id": "view-id", "group_name": "PR_AWS_SSO_View"}]},
+        ),
+        permission_sets=[
+            {
+                "permission_set_name": "PermissionSetView",
+                "ou_assignments": [{"path": "/Root"}],
+                "group_assignments": [{"name": "View"}],
+            }
+        ],
+    )
+
+    app.synth()
+
+    return outdir
+
+
+def test_assembly_footprints(tmp_path):
+
+    cdk_out = synth_stage(str(tmp_path), accounts=600)
+    footprints = assembly_footprints(cdk_out)
+
+    assert list(footprints) == ["sso-permission-sets-dev", "sso-permission-sets-dev-1"]
+
+    # The assignments of the second shard reference the permission set by an import
+    assert (
+        sum(
+            footprint["by_permission_set"]["PermissionSetView"]["resources"]
+            for footprint in footprints.values()
+        )
+        == 1 + 600
+    )
+    assert (
+        footprints["sso-permission-sets-dev"]["by_resource_type"]["AWS::SSO::PermissionSet"][
+            "resources"
+        ]
+        == 1
+    )
+
+    # The measured bytes are the bytes of the synthesized templates
+    template_bytes = os.path.getsize(
+        os.path.join(
+            cdk_out, "assembly-SSOStage", "SSOStageAssignmentsStack12C3E0196.template.json"
+        )
+    )
+    assert footprints["sso-permission-sets-dev-1"]["template_bytes"] == template_bytes
+
+    assert "sso-permission-sets-dev-1" in footprint_warnings(footprints, template_bytes - 1)
+    assert footprint_warnings(footprints, 1_000_000) == {}
+
+
+def test_compact_logical_ids_keep_deployed_assignments(tmp_path):
+
+    deployed = dict(iter_assembly_templates(synth_stage(str(tmp_path / "deployed"), accounts=300)))
+    deployed_logical_ids = get_deployed_logical_ids.deployed_assignment_logical_ids(
+        StubCloudFormationClient(deployed),
+        "dev",
+        PermissionSets({"stages": [{"name": "General"}, {"name": "Prod"}]}),
+    )
+    assert list(deployed_logical_ids) == ["sso-permission-sets-dev"]
+    assert len(deployed_logical_ids["sso-permission-sets-dev"]) == 300
+
+    legacy = assembly_footprints(synth_stage(str(tmp_path / "legacy"), accounts=400))
+    compact_out = synth_stage(
+        str(tmp_path / "compact"),
+        accounts=400,
+        properties={
+            "compact_logical_ids": True,
+            "deployed_logical_ids": deployed_logical_ids,
+        },
+    )
+
+    logical_ids = {
+        logical_id
+        for _, template in iter_assembly_templates(compact_out)
+        for logical_id, resource in template["Resources"].items()
+        if resource["Type"] == "AWS::SSO::Assignment"
+    }
+
+    # The deployed assignments aren't replaced, only the new assignments have compact ids
+    deployed_ids = set(deployed_logical_ids["sso-permission-sets-dev"])
+    assert deployed_ids <= logical_ids
+    new_logical_ids = logical_ids - deployed_ids
+    assert len(new_logical_ids) == 100
+    assert all(len(logical_id) == 13 for logical_id in new_logical_ids)
+
+    # The ids deployed in the stacks of other stages don't apply
+    other_stage_out = synth_stage(
+        str(tmp_path / "other-stage"),
+        accounts=300,
+        properties={
+            "compact_logical_ids": True,
+            "deployed_logical_ids": {"sso-permission-sets-dev-Prod": deployed_ids},
+        },
+    )
+    assert all(
+        len(logical_id) == 13
+        for _, template in iter_assembly_templates(other_stage_out)
+        for logical_id, resource in template["Resources"].items()
+        if resource["Type"] == "AWS::SSO::Assignment"
+    )
+
+    compact = assembly_footprints(compact_out)
+    assert sum(footprint["template_bytes"] for footprint in compact.values()) < sum(
+        footprint["template_bytes"] for footprint in legacy.values()
+    )
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from typing import Dict, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Error codes returned by AWS services when requests are throttled
+THROTTLING_ERROR_CODES = ["TooManyRequestsException", "ThrottlingException", "Throttling"]
+
+# Client side request rate (requests per second) and burst by service, kept below the
+# AWS Organizations, Identity Store and SSO Admin API quotas
+SERVICE_RATE_LIMITS = {
+    "organizations": (5.0, 10),
+    "identitystore": (20.0, 20),
+    "sso-admin": (20.0, 20),
+}
+
+# Rate and burst of services without a specific rate limit
+DEFAULT_RATE_LIMIT = (10.0, 10)
+
+
+def with_backoff(func, *args, max_attempts: int = 8, base_delay: float = 0.5, **kwargs):
+    """Call func and retry with exponential backoff and jitter when throttled.
+
+    Throttling errors that the client already retried (the clients of ClientFactory retry them
+    with botocore's retry mode) are raised as is, so that the retries don't multiply.
+    """
+
+    for attempt in range(max_attempts):
+        try:
+            return func(*args, **kwargs)
+        except ClientError as error:
+            if (
+                error.response["Error"]["Code"] not in THROTTLING_ERROR_CODES
+                or error.response.get("ResponseMetadata", {}).get("MaxAttemptsReached")
+                or attempt == max_attempts - 1
+            ):
+                raise
+
+            time.sleep(min(base_delay * 2**attempt, 20.0) * random.uniform(0.5, 1.0))
+
+
+class TokenBucket:
+    """Thread safe token bucket that makes callers wait for their turn at a sustained rate"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+
+            # Take the token now (possibly going into debt) and wait until it's been refilled
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ClientMetrics:
+    """Thread safe counters of the API calls, retried attempts and throttled attempts of a service"""
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.throttles = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def retries(self) -> int:
+        return self.attempts - self.calls
+
+    def count(self, calls: int = 0, attempts: int = 0, throttles: int = 0):
+        with self.__lock:
+            self.calls += calls
+            self.attempts += attempts
+            self.throttles += throttles
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"calls": self.calls, "retries": self.retries, "throttles": self.throttles}
+
+
+class ClientFactory:
+    """Create boto3 clients with adaptive retries, a connection pool sized to the number of
+    workers and a token bucket and metrics shared by all clients of the same service
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        rate_limits: Dict[str, Tuple[float, int]] = None,
+        retry_mode: str = "adaptive",
+        max_attempts: int = 10,
+        session: boto3.session.Session = None,
+    ):
+        self.max_workers = max_workers
+        self.rate_limits = dict(SERVICE_RATE_LIMITS, **(rate_limits or {}))
+        self.retry_mode = retry_mode
+        self.max_attempts = max_attempts
+        self.session = session or boto3.session.Session()
+        self.token_buckets = {}
+        self.metrics = {}
+        self.__lock = threading.Lock()
+
+    def __service_state(self, service_name: str) -> Tuple[TokenBucket, ClientMetrics]:
+        with self.__lock:
+            if service_name not in self.token_buckets:
+                self.token_buckets[service_name] = TokenBucket(
+                    *self.rate_limits.get(service_name, DEFAULT_RATE_LIMIT)
+                )
+                self.metrics[service_name] = ClientMetrics()
+
+            return self.token_buckets[service_name], self.metrics[service_name]
+
+    def metrics_summary(self) -> Dict[str, Dict[str, int]]:
+        return {service_name: metrics.as_dict() for service_name, metrics in self.metrics.items()}
+
+    def client(self, service_name: str, region_name: str = None, **kwargs):
+        config = Config(
+            retries={"mode": self.retry_mode, "max_attempts": self.max_attempts},
+            max_pool_connections=max(self.max_workers, 10),
+        )
+
+        client = self.session.client(
+            service_name=service_name, region_name=region_name, config=config, **kwargs
+        )
+
+        token_bucket, metrics = self.__service_state(service_name)
+        event_name = client.meta.service_model.service_id.hyphenize()
+
+        def before_call(**_):
+            metrics.count(calls=1)
+
+        def before_send(**_):
+            # Every HTTP attempt, including retries, waits for a token
+            token_bucket.acquire()
+            metrics.count(attempts=1)
+
+        def needs_retry(response=None, **_):
+            if response is not None:
+                error_code = response[1].get("Error", {}).get("Code")
+                if error_code in THROTTLING_ERROR_CODES:
+                    metrics.count(throttles=1)
+
+        # Registered first so that they run before handlers that return a response
+        client.meta.events.register_first(f"before-call.{event_name}", before_call)
+        client.meta.events.register_first(f"before-send.{event_name}", before_send)
+        client.meta.events.register_first(f"needs-retry.{event_name}", needs_retry)
+
+        return client
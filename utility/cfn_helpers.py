@@ -1,9 +1,38 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
 import aws_cdk as cdk
 
+from utility.policy_loader import policy_loader
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+
+# Packages of the Lambda function code (the fast path reconciler, event coalescer and batched
+# assignments handlers)
+FUNCTION_PACKAGES = ["sso", "utility"]
+
 
 def file_sub(file_name: str, variables: dict = None) -> str:
+    """Substitute variables in a (minified) JSON policy document file"""
+
+    return cdk.Fn.sub(policy_loader.load(file_name).document, variables)
+
+
+def stage_function_code(config: dict = None) -> str:
+    """Copy the Lambda function packages and its (synth time) configuration to an asset directory"""
+
+    asset_dir = Path(tempfile.mkdtemp(prefix="function-"))
+
+    for package in FUNCTION_PACKAGES:
+        shutil.copytree(
+            PROJECT_DIR / package,
+            asset_dir / package,
+            ignore=shutil.ignore_patterns("__pycache__", "*.pyc"),
+        )
 
-    with open(file_name, "r") as file:
-        data = cdk.Fn.sub(file.read(), variables)
+    if config is not None:
+        (asset_dir / "fast_path_config.json").write_text(json.dumps(config, sort_keys=True))
 
-    return data
+    return str(asset_dir)
@@ -0,0 +1,194 @@
+"""Coalesce bursts of Control Tower lifecycle events into a single pipeline execution.
+
+The lifecycle event rule sends the events to an SQS queue, which a scheduled Lambda function
+drains. Once no event arrived for the quiet window (or the oldest event waited for the maximum
+wait), the events are appended to the snapshot store as a batch and one pipeline execution is
+started. The pipeline's org lookup then only re-walks the OUs affected by the pending batches,
+and records the batches it consumed in the org snapshot.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from utility.aws_clients import ClientFactory, with_backoff
+from utility.snapshot_store import SnapshotStore, snapshot_store_from_url
+
+LIFECYCLE_EVENTS_SNAPSHOT_NAME = "lifecycle-events"
+
+# Key of a snapshot (e.g. the org snapshot) with the lifecycle event batches it consumed
+CONSUMED_EVENT_BATCHES_KEY = "consumed_event_batches"
+
+# Control Tower lifecycle event service event details that identify the affected OU (and account)
+LIFECYCLE_EVENT_STATUS_KEYS = [
+    "createManagedAccountStatus",
+    "updateManagedAccountStatus",
+    "registerOrganizationalUnitStatus",
+    "deregisterOrganizationalUnitStatus",
+]
+
+# SQS batch operations take at most 10 messages
+SQS_BATCH_SIZE = 10
+
+# Long polling waits for the messages on all SQS servers, where short polling may return none of
+# the few queued messages
+RECEIVE_WAIT_SECONDS = 2
+
+
+def affected_accounts_and_ous(events: List[Dict]) -> Dict[str, List[str]]:
+    """Get the ids of the accounts and OUs affected by Control Tower lifecycle events"""
+
+    accounts = set()
+    ous = set()
+
+    for event in events:
+        service_event_details = event.get("detail", {}).get("serviceEventDetails", {})
+
+        for status_key in LIFECYCLE_EVENT_STATUS_KEYS:
+            status = service_event_details.get(status_key, {})
+            if "account" in status:
+                accounts.add(status["account"]["accountId"])
+            if "organizationalUnit" in status:
+                ous.add(status["organizationalUnit"]["organizationalUnitId"])
+
+    return {"accounts": sorted(accounts), "ous": sorted(ous)}
+
+
+def receive_all_messages(sqs_client, queue_url: str, visibility_timeout: int = 60) -> List[Dict]:
+    """Receive every message in the queue, which stay invisible for visibility_timeout seconds.
+
+    Only a long poll without messages means that the queue has been drained.
+    """
+
+    messages = []
+
+    while True:
+        response = with_backoff(
+            sqs_client.receive_message,
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=SQS_BATCH_SIZE,
+            VisibilityTimeout=visibility_timeout,
+            WaitTimeSeconds=RECEIVE_WAIT_SECONDS,
+            AttributeNames=["SentTimestamp"],
+        )
+
+        if not response.get("Messages"):
+            return messages
+
+        messages.extend(response["Messages"])
+
+
+def _batches(messages: List[Dict]):
+    for start in range(0, len(messages), SQS_BATCH_SIZE):
+        yield messages[start : start + SQS_BATCH_SIZE]
+
+
+def coalesce_events(
+    sqs_client,
+    queue_url: str,
+    cp_client,
+    pipeline_name: str,
+    store: SnapshotStore,
+    quiet_window_seconds: float,
+    max_wait_seconds: float,
+    now: float = None,
+) -> Optional[Dict]:
+    """Start one pipeline execution for the queued events once the queue has been quiet for the
+    quiet window. Returns the affected accounts and OUs when the pipeline was started.
+    """
+
+    now = now if now is not None else time.time()
+
+    messages = receive_all_messages(sqs_client, queue_url)
+    if not messages:
+        return None
+
+    sent = [int(message["Attributes"]["SentTimestamp"]) / 1000 for message in messages]
+
+    if now - max(sent) < quiet_window_seconds and now - min(sent) < max_wait_seconds:
+        # Still in a burst, make the events visible again for the next run
+        for batch in _batches(messages):
+            with_backoff(
+                sqs_client.change_message_visibility_batch,
+                QueueUrl=queue_url,
+                Entries=[
+                    {
+                        "Id": str(index),
+                        "ReceiptHandle": message["ReceiptHandle"],
+                        "VisibilityTimeout": 0,
+                    }
+                    for index, message in enumerate(batch)
+                ],
+            )
+        return None
+
+    events = [json.loads(message["Body"]) for message in messages]
+    affected = affected_accounts_and_ous(events)
+
+    # A new batch, so that events of a batch that isn't consumed yet aren't replaced
+    store.append(LIFECYCLE_EVENTS_SNAPSHOT_NAME, dict(affected, events=events))
+
+    execution = with_backoff(cp_client.start_pipeline_execution, name=pipeline_name)
+
+    for batch in _batches(messages):
+        with_backoff(
+            sqs_client.delete_message_batch,
+            QueueUrl=queue_url,
+            Entries=[
+                {"Id": str(index), "ReceiptHandle": message["ReceiptHandle"]}
+                for index, message in enumerate(batch)
+            ],
+        )
+
+    print(
+        f"Started pipeline execution {execution['pipelineExecutionId']} for {len(events)} events"
+        f" affecting {len(affected['accounts'])} accounts and {len(affected['ous'])} OUs",
+        file=sys.stderr,
+    )
+
+    return affected
+
+
+class PendingLifecycleEvents(NamedTuple):
+    """The events of the batches a snapshot hasn't consumed, and all batch versions, which the
+    snapshot has consumed once it's stored with them
+    """
+
+    events: List[Dict]
+    batch_versions: List[str]
+
+
+def pending_lifecycle_events(store: SnapshotStore, snapshot_name: str) -> PendingLifecycleEvents:
+    """Get the events of the lifecycle event batches that the named snapshot hasn't consumed"""
+
+    snapshot = store.get_latest(snapshot_name)
+    consumed = set(snapshot.data.get(CONSUMED_EVENT_BATCHES_KEY, [])) if snapshot else set()
+
+    batch_versions = store.batch_versions(LIFECYCLE_EVENTS_SNAPSHOT_NAME)
+
+    events = [
+        event
+        for version in batch_versions
+        if version not in consumed
+        for event in store.get_batch(LIFECYCLE_EVENTS_SNAPSHOT_NAME, version).data["events"]
+    ]
+
+    return PendingLifecycleEvents(events, batch_versions)
+
+
+def lambda_handler(event, context):
+    client_factory = ClientFactory(max_workers=1)
+
+    affected = coalesce_events(
+        client_factory.client("sqs"),
+        os.environ["QUEUE_URL"],
+        client_factory.client("codepipeline"),
+        os.environ["PIPELINE_NAME"],
+        snapshot_store_from_url(os.environ["SNAPSHOT_STORE"]),
+        quiet_window_seconds=float(os.environ["QUIET_WINDOW_SECONDS"]),
+        max_wait_seconds=float(os.environ["MAX_WAIT_SECONDS"]),
+    )
+
+    return {"started": affected is not None, "affected": affected}
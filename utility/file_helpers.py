@@ -1,6 +1,22 @@
+import json
+import sys
 from pathlib import Path
+from typing import Iterable, Iterator, List, TextIO
+
 import yaml
 
+# Use the C (libyaml) loader when PyYAML is built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+NDJSON_SUFFIX = ".ndjson"
+
+# Fields of the compact NDJSON records, the only fields the CDK app needs
+ACCOUNT_FIELDS = ["Id", "name_path", "Status"]
+GROUP_MAPPING_FIELDS = ["group_id", "group_name"]
+
 
 def file_exists(file_name: str) -> bool:
 
@@ -12,6 +28,60 @@ def file_exists(file_name: str) -> bool:
 def file_read_yaml(file_name: str) -> dict:
 
     with open(file_name, "r") as stream:
-        data = yaml.safe_load(stream)
+        content = stream.read()
+
+    # The lookup scripts write JSON, a subset of YAML that the json parser reads much faster
+    if content.lstrip()[:1] in ("{", "["):
+        try:
+            return json.loads(content)
+        except ValueError:
+            pass
+
+    return yaml.load(content, Loader=SafeLoader)
+
+
+def stream_read_ndjson(stream: TextIO) -> Iterator[dict]:
+    """Lazily read the records of a newline delimited JSON stream as they're written"""
+
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def file_read_ndjson(file_name: str) -> Iterator[dict]:
+    """Lazily read the records of a newline delimited JSON file, or standard input for -"""
+
+    if file_name == "-":
+        yield from stream_read_ndjson(sys.stdin)
+        return
+
+    with open(file_name, "r") as stream:
+        yield from stream_read_ndjson(stream)
+
+
+def file_read_records(file_name: str, records_key: str) -> dict:
+    """Read a YAML or JSON document, or an NDJSON file of the records under records_key"""
+
+    if file_name.endswith(NDJSON_SUFFIX):
+        return {records_key: list(file_read_ndjson(file_name))}
+
+    return file_read_yaml(file_name)
+
+
+def write_ndjson(
+    records: Iterable[dict], fields: List[str], stream: TextIO = None, flush: bool = False
+):
+    """Write the fields of each record as one compact JSON object per line, optionally flushing
+    each line so that a reader can consume the records while they're written
+    """
+
+    stream = stream or sys.stdout
+
+    for record in records:
+        stream.write(
+            json.dumps({field: record.get(field) for field in fields}, separators=(",", ":"))
+        )
+        stream.write("\n")
 
-    return data
+        if flush:
+            stream.flush()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List
+
+# Maximum size of an AWS SSO permission set inline policy
+INLINE_POLICY_MAX_BYTES = 32768
+
+
+class PolicyDocument:
+    def __init__(self, file_name: str, content_hash: str, original_bytes: int, document: str):
+        self.file_name = file_name
+        self.content_hash = content_hash
+        self.original_bytes = original_bytes
+        self.document = document
+
+    @property
+    def document_bytes(self) -> int:
+        return len(self.document.encode("utf-8"))
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.document_bytes
+
+
+class PolicyLoader:
+    """Load JSON policy documents minified, once per file (by path and content hash),
+    and validate them against the inline policy size limit
+    """
+
+    def __init__(self, max_bytes: int = INLINE_POLICY_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._by_path = {}
+        self._by_hash = {}
+
+    def load(self, file_name: str) -> PolicyDocument:
+        path = os.path.abspath(file_name)
+        stat = os.stat(path)
+
+        with self._lock:
+            cached = self._by_path.get(path)
+            if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+                return cached[1]
+
+            with open(path, "rb") as file:
+                content = file.read()
+
+            content_hash = hashlib.sha256(content).hexdigest()
+
+            policy_document = self._by_hash.get(content_hash)
+            if policy_document is None:
+                try:
+                    document = json.dumps(json.loads(content), separators=(",", ":"))
+                except ValueError as error:
+                    raise ValueError(f"Policy document {file_name} is not valid JSON: {error}")
+
+                policy_document = PolicyDocument(file_name, content_hash, len(content), document)
+
+                if policy_document.document_bytes > self._max_bytes:
+                    raise ValueError(
+                        f"Policy document {file_name} is {policy_document.document_bytes} bytes"
+                        f" minified, which exceeds the inline policy limit of {self._max_bytes}"
+                    )
+
+                self._by_hash[content_hash] = policy_document
+
+            self._by_path[path] = ((stat.st_mtime_ns, stat.st_size), policy_document)
+
+            return policy_document
+
+    def report(self) -> List[Dict]:
+        """Sizes of the loaded policy documents and bytes saved by minifying them"""
+
+        with self._lock:
+            return [
+                {
+                    "file_name": policy_document.file_name,
+                    "original_bytes": policy_document.original_bytes,
+                    "document_bytes": policy_document.document_bytes,
+                    "bytes_saved": policy_document.bytes_saved,
+                }
+                for policy_document in self._by_hash.values()
+            ]
+
+
+policy_loader = PolicyLoader()
@@ -0,0 +1,216 @@
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+
+class Snapshot:
+    """A versioned snapshot of a named document (e.g. the org hierarchy or group mappings)"""
+
+    def __init__(self, name: str, version: str, created: datetime, data: dict):
+        self.name = name
+        self.version = version
+        self.created = created
+        self.data = data
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "name": self.name,
+                "version": self.version,
+                "created": self.created.isoformat(),
+                "data": self.data,
+            },
+            default=str,
+        )
+
+    @staticmethod
+    def from_json(content: str) -> "Snapshot":
+        snapshot = json.loads(content)
+        return Snapshot(
+            snapshot["name"],
+            snapshot["version"],
+            datetime.fromisoformat(snapshot["created"]),
+            snapshot["data"],
+        )
+
+
+class SnapshotStore(ABC):
+    """Stores versions of named snapshots and a pointer to the latest version of each.
+
+    Versions are named by creation time and content hash, so an unchanged document
+    doesn't create a new version.
+
+    Named batches (e.g. of events) are appended under unique versions instead, so that a batch
+    never replaces another one.
+
+    Named records (e.g. of assignments) are kept in one object per record key, so that concurrent
+    writers of different records don't overwrite each other.
+    """
+
+    LATEST = "LATEST"
+    BATCHES = "batches"
+    RECORDS = "records"
+
+    def get_latest(self, name: str) -> Optional[Snapshot]:
+        version = self._read(f"{name}/{self.LATEST}")
+        if version is None:
+            return None
+
+        return Snapshot.from_json(self._read(f"{name}/{version.strip()}.json"))
+
+    def put(self, name: str, data: dict, now: datetime = None) -> Snapshot:
+        now = now or datetime.now(timezone.utc)
+
+        content_hash = hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:12]
+
+        latest = self.get_latest(name)
+        if latest is not None and latest.version.endswith(content_hash):
+            # Refresh the creation time of the unchanged content
+            snapshot = Snapshot(name, latest.version, now, latest.data)
+        else:
+            snapshot = Snapshot(name, f"{now.strftime('%Y%m%dT%H%M%SZ')}-{content_hash}", now, data)
+
+        self._write(f"{name}/{snapshot.version}.json", snapshot.to_json())
+        self._write(f"{name}/{self.LATEST}", snapshot.version)
+
+        return snapshot
+
+    def append(self, name: str, data: dict, now: datetime = None) -> Snapshot:
+        now = now or datetime.now(timezone.utc)
+
+        snapshot = Snapshot(
+            name, f"{now.strftime('%Y%m%dT%H%M%S%fZ')}-{uuid4().hex[:12]}", now, data
+        )
+        self._write(f"{name}/{self.BATCHES}/{snapshot.version}.json", snapshot.to_json())
+
+        return snapshot
+
+    def batch_versions(self, name: str) -> List[str]:
+        """The versions of the appended batches, oldest first"""
+
+        prefix = f"{name}/{self.BATCHES}/"
+
+        return sorted(
+            key[len(prefix) : -len(".json")] for key in self._list(prefix) if key.endswith(".json")
+        )
+
+    def get_batch(self, name: str, version: str) -> Snapshot:
+        return Snapshot.from_json(self._read(f"{name}/{self.BATCHES}/{version}.json"))
+
+    def put_record(self, name: str, record_key: str, data: dict):
+        self._write(f"{name}/{self.RECORDS}/{record_key}.json", json.dumps(data, default=str))
+
+    def delete_record(self, name: str, record_key: str):
+        self._delete(f"{name}/{self.RECORDS}/{record_key}.json")
+
+    def get_records(self, name: str) -> Dict[str, dict]:
+        """The records by record key"""
+
+        prefix = f"{name}/{self.RECORDS}/"
+        records = {}
+
+        for key in sorted(self._list(prefix)):
+            content = self._read(key) if key.endswith(".json") else None
+            # A record deleted since the listing is skipped
+            if content is not None:
+                records[key[len(prefix) : -len(".json")]] = json.loads(content)
+
+        return records
+
+    @abstractmethod
+    def _read(self, key: str) -> Optional[str]:
+        """Read the content of a key, or None if it doesn't exist"""
+
+    @abstractmethod
+    def _write(self, key: str, content: str):
+        """Write the content of a key"""
+
+    @abstractmethod
+    def _delete(self, key: str):
+        """Delete a key, if it exists"""
+
+    @abstractmethod
+    def _list(self, prefix: str) -> List[str]:
+        """List the keys that start with a prefix"""
+
+
+class LocalSnapshotStore(SnapshotStore):
+    def __init__(self, directory: str):
+        self._directory = Path(directory)
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._directory / key
+        if not path.is_file():
+            return None
+
+        return path.read_text()
+
+    def _write(self, key: str, content: str):
+        path = self._directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def _delete(self, key: str):
+        (self._directory / key).unlink(missing_ok=True)
+
+    def _list(self, prefix: str) -> List[str]:
+        directory = self._directory / prefix
+        if not directory.is_dir():
+            return []
+
+        return [f"{prefix}{path.name}" for path in directory.iterdir() if path.is_file()]
+
+
+class S3SnapshotStore(SnapshotStore):
+    def __init__(self, s3_client, bucket: str, prefix: str = ""):
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._prefix = prefix.strip("/")
+
+    def __key(self, key: str) -> str:
+        return f"{self._prefix}/{key}" if self._prefix else key
+
+    def _read(self, key: str) -> Optional[str]:
+        try:
+            response = self._s3_client.get_object(Bucket=self._bucket, Key=self.__key(key))
+        except self._s3_client.exceptions.NoSuchKey:
+            return None
+
+        return response["Body"].read().decode("utf-8")
+
+    def _write(self, key: str, content: str):
+        self._s3_client.put_object(
+            Bucket=self._bucket, Key=self.__key(key), Body=content.encode("utf-8")
+        )
+
+    def _delete(self, key: str):
+        self._s3_client.delete_object(Bucket=self._bucket, Key=self.__key(key))
+
+    def _list(self, prefix: str) -> List[str]:
+        full_prefix = self.__key(prefix)
+        keys = []
+
+        paginator = self._s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self._bucket, Prefix=full_prefix):
+            for content in page.get("Contents", []):
+                keys.append(prefix + content["Key"][len(full_prefix) :])
+
+        return keys
+
+
+def snapshot_store_from_url(url: str) -> SnapshotStore:
+    """Create a snapshot store from an s3://bucket/prefix URL or a local directory"""
+
+    if url.startswith("s3://"):
+        import boto3
+
+        bucket, _, prefix = url[len("s3://") :].partition("/")
+        return S3SnapshotStore(boto3.client("s3"), bucket, prefix)
+
+    return LocalSnapshotStore(url)
@@ -0,0 +1,131 @@
+"""Template size footprint of the synthesized stacks, by resource type and permission set"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+# CloudFormation templates (uploaded via S3) are limited to 1MB, warn well before
+DEFAULT_WARN_TEMPLATE_BYTES = 800_000
+
+# Export name of a permission set ARN imported by another stack, as exported by the permission sets
+# stack (<stack name>:<permission set>PermissionSetArn) or as generated by CDK for a reference
+PERMISSION_SET_EXPORT_PATTERN = re.compile(
+    r":(?:ExportsOutputFnGetAtt)?(\w+?)PermissionSetArn(?:[0-9A-F]{8})?$"
+)
+
+
+def iter_assembly_templates(cdk_out: str) -> Iterator[Tuple[str, dict]]:
+    """Iterate the stack names and templates of a cloud assembly, including the stacks of nested
+    (stage) cloud assemblies
+    """
+
+    assembly_dirs = [Path(cdk_out)]
+
+    while assembly_dirs:
+        assembly_dir = assembly_dirs.pop()
+
+        with open(assembly_dir / "manifest.json", "r") as file:
+            manifest = json.load(file)
+
+        for artifact in manifest.get("artifacts", {}).values():
+            artifact_properties = artifact.get("properties", {})
+
+            if artifact["type"] == "cdk:cloud-assembly":
+                assembly_dirs.append(assembly_dir / artifact_properties["directoryName"])
+
+            elif artifact["type"] == "aws:cloudformation:stack":
+                with open(assembly_dir / artifact_properties["templateFile"], "r") as file:
+                    yield artifact_properties["stackName"], json.load(file)
+
+
+def resource_permission_set(logical_id: str, resource: dict) -> Optional[str]:
+    """Get the logical id of the permission set of a permission set or assignment resource"""
+
+    if resource["Type"] == "AWS::SSO::PermissionSet":
+        return logical_id
+
+    permission_set_arn = resource.get("Properties", {}).get("PermissionSetArn")
+    if not isinstance(permission_set_arn, dict):
+        return None
+
+    if "Fn::GetAtt" in permission_set_arn:
+        return permission_set_arn["Fn::GetAtt"][0]
+
+    if "Fn::ImportValue" in permission_set_arn:
+        match = PERMISSION_SET_EXPORT_PATTERN.search(permission_set_arn["Fn::ImportValue"])
+        if match is not None:
+            return match.group(1)
+
+    return None
+
+
+def template_footprint(template: dict) -> dict:
+    """Measure the bytes of a template as synthesized (indented by one space) and of its
+    resources by resource type and permission set
+    """
+
+    by_resource_type = {}
+    by_permission_set = {}
+
+    for logical_id, resource in template.get("Resources", {}).items():
+        resource_bytes = len(json.dumps({logical_id: resource}, indent=1))
+
+        for breakdown, key in [
+            (by_resource_type, resource["Type"]),
+            (by_permission_set, resource_permission_set(logical_id, resource)),
+        ]:
+            if key is None:
+                continue
+            totals = breakdown.setdefault(key, {"resources": 0, "bytes": 0})
+            totals["resources"] += 1
+            totals["bytes"] += resource_bytes
+
+    return {
+        "template_bytes": len(json.dumps(template, indent=1)),
+        "resources": len(template.get("Resources", {})),
+        "by_resource_type": dict(sorted(by_resource_type.items())),
+        "by_permission_set": dict(sorted(by_permission_set.items())),
+    }
+
+
+def assembly_footprints(cdk_out: str) -> Dict[str, dict]:
+    return {
+        stack_name: template_footprint(template)
+        for stack_name, template in sorted(iter_assembly_templates(cdk_out))
+    }
+
+
+def format_footprint_report(footprints: Dict[str, dict], top: int = 10) -> str:
+    """Format the footprints of the stacks with the largest resource types and permission sets"""
+
+    lines = []
+
+    for stack_name, footprint in footprints.items():
+        lines.append(
+            f"{stack_name}: {footprint['template_bytes']:,} bytes,"
+            f" {footprint['resources']} resources"
+        )
+
+        for title, breakdown in [
+            ("resource type", footprint["by_resource_type"]),
+            ("permission set", footprint["by_permission_set"]),
+        ]:
+            largest = sorted(breakdown.items(), key=lambda item: -item[1]["bytes"])[:top]
+            for key, totals in largest:
+                lines.append(
+                    f"  {title:15} {key:50} {totals['bytes']:>10,} bytes"
+                    f" {totals['resources']:>6} resources"
+                )
+
+    return "\n".join(lines)
+
+
+def footprint_warnings(footprints: Dict[str, dict], warn_bytes: int) -> Dict[str, int]:
+    """Get the template bytes of the stacks that exceed warn_bytes"""
+
+    return {
+        stack_name: footprint["template_bytes"]
+        for stack_name, footprint in footprints.items()
+        if footprint["template_bytes"] > warn_bytes
+    }